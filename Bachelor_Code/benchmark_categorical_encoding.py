@@ -0,0 +1,101 @@
+# benchmark_categorical_encoding.py
+"""
+One-hot versus native categorical handling.
+
+Trains every candidate on the same split once with the dense one-hot
+preprocessing and once with integer category codes (LightGBM / XGBoost
+category dtype, CatBoost cat_features) and reports per encoding and model:
+feature width and matrix memory, preprocessing and training time, macro F1
+and single-row / batch serving cost (serving_benchmark):
+
+    python benchmark_categorical_encoding.py
+    python benchmark_categorical_encoding.py --dataset synthetic_SHC_dataset.parquet
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder
+
+import train_connection_classifier as training
+from dataset_schema import deduplicate, read_dataset
+from serving_benchmark import benchmark_candidate
+
+ENCODINGS = ("onehot", "native")
+
+
+def _matrix_mb(X) -> float:
+    if isinstance(X, pd.DataFrame):
+        return float(X.memory_usage(deep=True).sum()) / 1e6
+    return X.nbytes / 1e6
+
+
+def run(dataset_path: Path):
+    df, _ = deduplicate(read_dataset(dataset_path))
+    df, _, _ = training.clean_dataset(df)
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    y = LabelEncoder().fit_transform(df["label"].astype(str))
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[features], y, test_size=0.2, stratify=y, random_state=42
+    )
+
+    rows = []
+    for encoding in ENCODINGS:
+        start = time.perf_counter()
+        preprocessor = training._build_preprocessor(encoding)
+        Xt_train = preprocessor.fit_transform(X_train)
+        Xt_test = preprocessor.transform(X_test)
+        preprocess_s = time.perf_counter() - start
+
+        for name, model in training._build_models(encoding).items():
+            start = time.perf_counter()
+            model.fit(Xt_train, y_train)
+            fit_s = time.perf_counter() - start
+            f1 = f1_score(y_test, model.predict(Xt_test), average="macro", zero_division=0)
+            bench = benchmark_candidate(Pipeline([("preprocess", preprocessor), ("model", model)]), X_test)
+            rows.append({
+                "encoding": encoding,
+                "model": name,
+                "width": Xt_train.shape[1],
+                "matrix_mb": _matrix_mb(Xt_train),
+                "preprocess_s": preprocess_s,
+                "fit_s": fit_s,
+                "f1_macro": f1,
+                "p50_ms": bench["single_row_p50_ms"],
+                "p99_ms": bench["single_row_p99_ms"],
+                "batch_rows_s": bench["batch_rows_per_second"],
+                "size_mb": bench["serialized_mb"],
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=training.DATASET_PATH,
+                        help="CSV file, compact .parquet file or Parquet part directory")
+    args = parser.parse_args()
+
+    table = run(args.dataset)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(table.round(3).to_string(index=False))
+
+    # Native relative to one-hot per model (< 1 = native is smaller / faster)
+    pivot = table.set_index(["model", "encoding"])
+    ratios = {
+        col: pivot[col].xs("native", level="encoding") / pivot[col].xs("onehot", level="encoding")
+        for col in ("matrix_mb", "fit_s", "p50_ms", "size_mb")
+    }
+    print("\nnative / onehot:")
+    print(pd.DataFrame(ratios).round(2).to_string())
+    print(f"\nwidth: {int(table[table.encoding == 'onehot'].width.iloc[0])} one-hot columns -> "
+          f"{int(table[table.encoding == 'native'].width.iloc[0])} native columns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmark_import_time.py
+"""
+Import-time budget for the API (cold start on scale-to-zero hosts).
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for
+each checked module, reports the cumulative import time and the slowest
+top-level imports, and verifies that heavy libraries stay out of the import
+graph. Exits with status 1 when a budget or a forbidden import is violated,
+so it can run as a check in CI (tests/test_import_time.py runs the same checks):
+
+    python benchmark_import_time.py
+    python benchmark_import_time.py --budget-ms main=500 make_prediction=150
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Default budgets in milliseconds (cumulative import time of the module itself)
+DEFAULT_BUDGETS_MS = {
+    "main": 800.0,
+    "make_prediction": 250.0,
+    "model_service": 250.0,
+}
+
+# Libraries that must not be imported by the module (loaded lazily instead)
+FORBIDDEN_IMPORTS = {
+    "main": ["pandas", "joblib", "sklearn", "xgboost", "lightgbm", "catboost"],
+    "make_prediction": ["fastapi", "pandas", "joblib", "sklearn"],
+    "model_service": ["pandas", "joblib", "sklearn", "xgboost", "lightgbm", "catboost"],
+}
+
+
+def run_importtime(module: str) -> List[Tuple[str, int, int]]:
+    """Return (name, nesting level, cumulative_us) for every import of a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), level, int(cumulative_us)))
+    return entries
+
+
+def check_module(module: str, budget_ms: float, top: int) -> bool:
+    entries = run_importtime(module)
+    imported = {name for name, _, _ in entries}
+    idx = next(i for i, (name, level, _) in enumerate(entries) if name == module and level == 0)
+    total_ms = entries[idx][2] / 1000.0
+
+    ok = total_ms <= budget_ms
+    status = "OK" if ok else "OVER BUDGET"
+    print(f"\nimport {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms) {status}")
+
+    # Direct imports of the module: -X importtime prints children before their parent
+    children = []
+    for name, level, cum in reversed(entries[:idx]):
+        if level == 0:
+            break
+        if level == 1:
+            children.append((name, cum))
+    for name, cum in sorted(children, key=lambda x: -x[1])[:top]:
+        print(f"  {cum / 1000.0:8.1f} ms  {name}")
+
+    for lib in FORBIDDEN_IMPORTS.get(module, []):
+        if lib in imported:
+            print(f"  FORBIDDEN: importing {module} loads '{lib}'")
+            ok = False
+    return ok
+
+
+def _parse_budgets(items: List[str]) -> Dict[str, float]:
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for item in items:
+        module, _, value = item.partition("=")
+        budgets[module] = float(value)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", nargs="*", default=[], metavar="MODULE=MS",
+                        help="override the import budget of a module")
+    parser.add_argument("--top", type=int, default=8, help="number of slowest imports to list")
+    args = parser.parse_args()
+
+    budgets = _parse_budgets(args.budget_ms)
+    results = [check_module(module, budget, args.top) for module, budget in budgets.items()]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmark_inference_threads.py
+"""
+Throughput of single-row ML inference versus request concurrency.
+
+Runs ``model_service.predict_connection`` from a thread pool (as the API
+workers do) and reports requests/second for each concurrency level. Run it
+once with the default thread budget and once with the libraries' own
+defaults to see the effect of oversubscription:
+
+    python benchmark_inference_threads.py
+    python benchmark_inference_threads.py --single-threads -1
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import model_service
+
+SAMPLE_FEATURES = {
+    "shaft_diameter": 40.0,
+    "hub_length": 45.0,
+    "has_bending": 1.0,
+    "safety_factor": 1.5,
+    "hub_outer_diameter": 90.0,
+    "shaft_inner_diameter": 0.0,
+    "required_torque": 250000.0,
+    "pref_ease": 0.5,
+    "pref_movement": 0.3,
+    "pref_cost": 0.7,
+    "pref_vibration": 0.5,
+    "pref_speed": 0.4,
+    "pref_bidirectional": 0.6,
+    "pref_maintenance": 0.5,
+    "pref_durability": 0.8,
+    "shaft_type": "solid",
+    "shaft_material": "Steel C45",
+    "surface_condition": "dry",
+}
+
+
+def measure_throughput(concurrency: int, n_requests: int) -> float:
+    """Return requests per second for n_requests spread over `concurrency` threads."""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: model_service.predict_connection(SAMPLE_FEATURES), range(n_requests)))
+        elapsed = time.perf_counter() - start
+    if any(r is None for r in results):
+        raise RuntimeError("Prediction failed during benchmark (see log output above)")
+    return n_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400, help="requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--single-threads", type=int, default=None,
+                        help="override the single-row thread budget (-1 = library default, all cores)")
+    args = parser.parse_args()
+
+    if args.single_threads is not None:
+        model_service.SINGLE_ROW_THREADS = args.single_threads
+
+    # Warm-up: load the model and touch every code path once
+    model_service.predict_connection(SAMPLE_FEATURES)
+
+    print(f"single-row threads: {model_service.SINGLE_ROW_THREADS}, batch threads: {model_service.BATCH_THREADS}")
+    print(f"{'concurrency':>12} {'req/s':>10}")
+    for concurrency in args.concurrency:
+        rps = measure_throughput(concurrency, args.requests)
+        print(f"{concurrency:>12} {rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
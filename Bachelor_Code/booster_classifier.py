@@ -0,0 +1,75 @@
+# booster_classifier.py
+"""
+Classifier interface around a trained XGBoost or LightGBM booster
+
+Models trained out of core (out_of_core_training.py) are native boosters, not
+XGBClassifier / LGBMClassifier instances. This thin wrapper gives them the
+predict / predict_proba / n_jobs interface the Pipeline and model_service
+expect, and fit() retrains (or, given init_model, continues) the booster
+in memory with the parameters it was trained with, which incremental
+training uses for warm starts. It lives in its own module so unpickling a
+served model does not import the training code.
+"""
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+
+class BoosterClassifier(ClassifierMixin, BaseEstimator):
+    """Classifier interface (predict / predict_proba) around a trained XGBoost or LightGBM booster."""
+
+    def __init__(self, booster=None, n_classes: int = None, n_jobs: int = None,
+                 params: dict = None, num_boost_round: int = None):
+        self.booster = booster
+        self.n_classes = n_classes
+        self.n_jobs = n_jobs
+        self.params = params
+        self.num_boost_round = num_boost_round
+
+    def _is_xgboost(self) -> bool:
+        # XGBoost objectives are namespaced ("multi:softprob"), LightGBM's are not ("multiclass")
+        return ":" in self.params["objective"]
+
+    @property
+    def classes_(self):
+        return np.arange(self.n_classes)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        threads = self.n_jobs if self.n_jobs and self.n_jobs > 0 else None
+        if type(self.booster).__module__.startswith("xgboost"):
+            if threads:
+                self.booster.set_param({"nthread": threads})
+            return self.booster.inplace_predict(X)
+        return self.booster.predict(X, num_threads=threads or 0)
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_proba(X).argmax(axis=1)
+
+    def fit(self, X, y, init_model=None):
+        """Train num_boost_round rounds with `params` on (X, y), continuing from init_model if given."""
+        if not self.params or not self.num_boost_round:
+            raise ValueError("BoosterClassifier.fit needs the training params and num_boost_round")
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y)
+        params = dict(self.params)
+        threads = self.n_jobs if self.n_jobs and self.n_jobs > 0 else None
+        if self._is_xgboost():
+            import xgboost as xgb
+
+            if threads:
+                params["nthread"] = threads
+            self.booster = xgb.train(params, xgb.DMatrix(X, label=y), num_boost_round=self.num_boost_round,
+                                     xgb_model=init_model)
+        else:
+            import lightgbm as lgb
+
+            if threads:
+                params["num_threads"] = threads
+            self.booster = lgb.train(params, lgb.Dataset(X, label=y, params=params),
+                                     num_boost_round=self.num_boost_round, init_model=init_model)
+        self.n_classes = int(params["num_class"])
+        return self
+
+    def __sklearn_is_fitted__(self):
+        return self.booster is not None
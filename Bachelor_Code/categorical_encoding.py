@@ -0,0 +1,51 @@
+# categorical_encoding.py
+"""
+Integer category codes for the tree libraries' native categorical support
+
+One-hot encoding widens the matrix by one dense column per material / shaft
+type / surface condition. CategoricalCodes instead keeps one column per
+categorical feature, holding pandas category codes 0..k-1 for the categories
+seen in fit and k for unknown or missing values (CatBoost rejects NaN in
+categorical columns). LightGBM and XGBoost (enable_categorical) pick the
+columns up from the category dtype, CatBoost through cat_features; Random
+Forest sees the codes as ordinal numbers.
+
+Kept free of training imports so model_service can unpickle pipelines that
+contain it.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class CategoricalCodes(TransformerMixin, BaseEstimator):
+    """Map string categories to category-dtype integer codes (last code = unknown)."""
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = X.shape[1]
+        self.categories_ = [np.asarray(sorted(X[col].dropna().astype(str).unique()), dtype=object)
+                            for col in X.columns]
+        return self
+
+    def transform(self, X):
+        X = pd.DataFrame(X)
+        dtypes = self.output_dtypes()
+        out = {}
+        for col, categories in zip(self.feature_names_in_, self.categories_):
+            codes = pd.Index(categories).get_indexer(np.asarray(X[col], dtype=object))
+            codes[codes < 0] = len(categories)
+            out[col] = pd.Categorical.from_codes(codes, dtype=dtypes[col])
+        return pd.DataFrame(out, index=X.index)
+
+    def output_dtypes(self):
+        """{column: category dtype of its codes}; restores frames that lost it (e.g. via Parquet)."""
+        return {
+            col: pd.CategoricalDtype(pd.RangeIndex(len(categories) + 1))
+            for col, categories in zip(self.feature_names_in_, self.categories_)
+        }
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_in_, dtype=object)
@@ -0,0 +1,171 @@
+# cross_validation.py
+"""
+Stratified k-fold cross-validation with cached out-of-fold predictions
+
+A single 80/20 split is a noisy basis for choosing among the candidates. This
+module fits every candidate on k stratified folds of the training split, all
+folds of all models in one process pool with per-fit CPU budgets (see
+training_scheduler), and collects the out-of-fold (OOF) class probabilities:
+every training row is predicted by the model that did not see it.
+
+OOF probabilities are cached per model under the cache directory, keyed by the
+preprocessing cache key of the training matrix (dataset hash, test split,
+feature lists and encoding) plus the subset of it the candidates are fitted
+on, the fold setup and the model configuration, so reruns (or runs that only
+change the ensemble weighting) reuse them instead of refitting.
+Ensemble weights, calibration metrics and the CV report are all computed from
+the cached OOF matrix.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score, log_loss
+from sklearn.model_selection import StratifiedKFold
+
+from training_scheduler import _fit_with_budget, cpu_budgets
+
+# Parameters that change speed, not predictions, so they are not part of the cache key
+_RUNTIME_PARAMS = {"n_jobs", "thread_count", "verbose", "verbosity", "silent"}
+
+
+def oof_cache_key(preprocess_key: str, estimator, n_splits: int, random_state: int) -> str:
+    """Key of a model's OOF predictions: training matrix (preprocessing key), folds and model configuration."""
+    params = {k: v for k, v in estimator.get_params().items() if k not in _RUNTIME_PARAMS}
+    config = {
+        "preprocess_key": preprocess_key,
+        "n_splits": n_splits,
+        "random_state": random_state,
+        "model": type(estimator).__name__,
+        "params": repr(sorted(params.items())),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def fold_indices(y: np.ndarray, n_splits: int, random_state: int) -> np.ndarray:
+    """Fold number of every row (stratified, shuffled)."""
+    folds = np.empty(len(y), dtype=np.int8)
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    for fold, (_, val_idx) in enumerate(skf.split(np.zeros(len(y)), y)):
+        folds[val_idx] = fold
+    return folds
+
+
+def _fit_fold(estimator, X, y, folds, fold, n_threads):
+    """Fit on all other folds and predict probabilities for `fold` (runs in a worker)."""
+    train = folds != fold
+    fit = _fit_with_budget(estimator, X[train], y[train], n_threads)
+    return fit.estimator.predict_proba(X[~train]), fit.wall_seconds
+
+
+def expected_calibration_error(y: np.ndarray, proba: np.ndarray, n_bins: int = 10) -> float:
+    """Top-label ECE: |accuracy - confidence| averaged over confidence bins, weighted by bin size."""
+    confidence = proba.max(axis=1)
+    correct = proba.argmax(axis=1) == y
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    ece = 0.0
+    for b in range(n_bins):
+        mask = bins == b
+        if mask.any():
+            ece += mask.mean() * abs(correct[mask].mean() - confidence[mask].mean())
+    return float(ece)
+
+
+def oof_report(y: np.ndarray, proba: np.ndarray, folds: np.ndarray) -> Dict[str, Any]:
+    """CV metrics from OOF probabilities: per-fold macro F1, pooled log loss and calibration."""
+    labels = np.arange(proba.shape[1])
+    pred = proba.argmax(axis=1)
+    per_fold = [
+        float(f1_score(y[folds == k], pred[folds == k], average="macro", zero_division=0))
+        for k in np.unique(folds)
+    ]
+    return {
+        "cv_f1_macro_mean": float(np.mean(per_fold)),
+        "cv_f1_macro_std": float(np.std(per_fold)),
+        "cv_f1_macro_per_fold": per_fold,
+        "oof_f1_macro": float(f1_score(y, pred, average="macro", zero_division=0)),
+        "oof_log_loss": float(log_loss(y, proba, labels=labels)),
+        "oof_expected_calibration_error": expected_calibration_error(y, proba),
+    }
+
+
+def cross_val_oof(
+    models: Dict[str, Any],
+    X: np.ndarray,
+    y: np.ndarray,
+    preprocess_key: str,
+    cache_dir: Path,
+    n_splits: int = 5,
+    random_state: int = 42,
+    total_cpus: Optional[int] = None,
+    logger=None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    OOF probabilities of every model, from the cache or by k-fold fitting.
+
+    All folds of all uncached models run in one loky pool, each fit within its
+    share of total_cpus. Returns {name: {"proba": (n_rows, n_classes) array,
+    "folds": fold per row, "cached": bool, "fit_seconds": summed fold fit time}}.
+    """
+    cache_dir = Path(cache_dir) / "oof"
+    folds = fold_indices(y, n_splits, random_state)
+    out = {}
+    todo = []
+    for name, estimator in models.items():
+        path = cache_dir / f"{oof_cache_key(preprocess_key, estimator, n_splits, random_state)[:16]}.npy"
+        proba = np.load(path) if path.exists() else None
+        if proba is not None and len(proba) == len(y):
+            out[name] = {"proba": proba, "folds": folds, "cached": True, "fit_seconds": 0.0}
+            if logger:
+                logger.info(f"{name}: loaded cached out-of-fold predictions from {path}")
+        else:
+            if proba is not None and logger:
+                logger.warning(f"{name}: cached out-of-fold predictions in {path} have {len(proba)} rows, "
+                               f"expected {len(y)}; refitting")
+            todo.append((name, estimator, path))
+
+    if todo:
+        tasks = [(name, fold) for name, _, _ in todo for fold in range(n_splits)]
+        total_cpus = total_cpus or os.cpu_count() or 1
+        budgets = cpu_budgets(tasks, total_cpus)
+        n_parallel = max(1, min(len(tasks), total_cpus))
+        estimators = {name: estimator for name, estimator, _ in todo}
+        calls = [
+            (clone(estimators[name]), X, y, folds, fold, budgets[(name, fold)])
+            for name, fold in tasks
+        ]
+        start = time.perf_counter()
+        if n_parallel == 1:
+            fitted = [_fit_fold(*call) for call in calls]
+        else:
+            from joblib import Parallel, delayed
+
+            fitted = Parallel(n_jobs=n_parallel, backend="loky")(delayed(_fit_fold)(*call) for call in calls)
+        if logger:
+            logger.info(f"Fitted {len(tasks)} folds ({len(todo)} models x {n_splits}) in "
+                        f"{time.perf_counter() - start:.2f} seconds wall time")
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        results = dict(zip(tasks, fitted))
+        for name, _, path in todo:
+            proba = None
+            for fold in range(n_splits):
+                fold_proba, _ = results[(name, fold)]
+                if proba is None:
+                    proba = np.zeros((len(y), fold_proba.shape[1]))
+                proba[folds == fold] = fold_proba
+            np.save(path, proba)
+            out[name] = {
+                "proba": proba,
+                "folds": folds,
+                "cached": False,
+                "fit_seconds": float(sum(results[(name, fold)][1] for fold in range(n_splits))),
+            }
+
+    return {name: out[name] for name in models}
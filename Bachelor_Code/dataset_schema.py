@@ -0,0 +1,199 @@
+# dataset_schema.py
+"""
+Dtype schema and compact on-disk format of the synthetic SHC dataset
+
+pd.read_csv infers float64 for every number and object strings for the
+categorical columns. This module pins the dtypes instead:
+    - fixed-category columns (shaft type, material, surface condition, labels)
+    - float32 numerics, float64 where values exceed float32's exact range
+    - bool flags
+
+read_dataset applies the schema to CSV files, Parquet files and Parquet part
+directories alike. deduplicate drops exact duplicate rows (likely with the
+0.1-step preference grid and the discrete diameters) and content_hash gives a
+SHA-256 of the rows that later stages use as cache key.
+
+Convert a generated CSV into the compact format (single Parquet file plus a
+.meta.json with the content hash):
+
+    python dataset_schema.py synthetic_SHC_dataset.csv synthetic_SHC_dataset.parquet
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from make_prediction import materials
+
+LABELS = ["press", "key", "spline", "none"]
+
+# Fixed categories so every file / part has the same schema
+CATEGORY_DTYPES = {
+    "shaft_type": pd.CategoricalDtype(["solid", "hollow"]),
+    "shaft_material": pd.CategoricalDtype(list(materials.keys())),
+    "surface_condition": pd.CategoricalDtype(["dry", "oiled", "greased"]),
+    "label": pd.CategoricalDtype(LABELS),
+    "analytical_label": pd.CategoricalDtype(LABELS),
+}
+# Torques and capacities of large shafts exceed float32's exact integer range (2**24)
+FLOAT64_COLUMNS = {"required_torque", "M_design_Nmm", "cap_press", "cap_key", "cap_spline"}
+BOOL_COLUMNS = {"press_interference_ok"}
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Categorical string columns, float32 numerics and bool flags."""
+    out = df.copy()
+    for col in out.columns:
+        if col in CATEGORY_DTYPES:
+            dtype = CATEGORY_DTYPES[col]
+            unknown = set(out[col].dropna().unique()) - set(dtype.categories)
+            if unknown:
+                # astype would silently turn them into NaN
+                raise ValueError(f"Unknown values in column '{col}': {sorted(map(str, unknown))}")
+            out[col] = out[col].astype(dtype)
+        elif col in BOOL_COLUMNS:
+            out[col] = out[col].astype(bool)
+        elif col in FLOAT64_COLUMNS:
+            out[col] = out[col].astype("float64")
+        elif pd.api.types.is_float_dtype(out[col]) or pd.api.types.is_integer_dtype(out[col]):
+            out[col] = out[col].astype("float32")
+    return out
+
+
+def _csv_dtypes(columns: List[str]) -> Dict[str, Any]:
+    """Dtypes for pd.read_csv so numerics are parsed straight into their storage type."""
+    dtypes = {}
+    for col in columns:
+        if col in CATEGORY_DTYPES:
+            dtypes[col] = "category"
+        elif col in BOOL_COLUMNS:
+            dtypes[col] = bool
+        elif col in FLOAT64_COLUMNS:
+            dtypes[col] = "float64"
+    return dtypes
+
+
+def read_dataset(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a dataset (CSV file, Parquet file or Parquet part directory) with the schema applied."""
+    path = Path(path)
+    if path.is_dir():
+        parts = sorted(path.glob("part-*.parquet"))
+        df = pd.concat([pd.read_parquet(p, columns=columns) for p in parts], ignore_index=True)
+    elif path.suffix == ".parquet":
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        df = pd.read_csv(path, usecols=columns, dtype=_csv_dtypes(columns or list(header)))
+    return compact_dtypes(df)
+
+
+def iter_dataset(path: Path, chunk_rows: int = 100_000, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Read a dataset chunk by chunk (at most chunk_rows rows each) with the schema applied."""
+    path = Path(path)
+    if path.is_dir() or path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        parts = sorted(path.glob("part-*.parquet")) if path.is_dir() else [path]
+        for part in parts:
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield compact_dtypes(batch.to_pandas())
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = _csv_dtypes(columns or list(header))
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunk_rows):
+        yield compact_dtypes(chunk)
+
+
+def deduplicate(df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """Drop exact duplicate rows (first occurrence kept); returns (frame, rows dropped)."""
+    keep = ~df.duplicated(keep="first")
+    dropped = int(len(df) - keep.sum())
+    if dropped == 0:
+        return df, 0
+    return df[keep].reset_index(drop=True), dropped
+
+
+def content_hash(df: pd.DataFrame) -> str:
+    """SHA-256 of column names, dtypes and row values (row order matters)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c), str(df[c].dtype)] for c in df.columns]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """uint64 hash of every row's values (identifies new or changed rows across dataset versions)."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def meta_path_for(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.stem + ".meta.json")
+
+
+def write_compact(df: pd.DataFrame, path: Path, duplicates_dropped: int = 0) -> Dict[str, Any]:
+    """Write a single zstd-compressed Parquet file plus its .meta.json (hash, rows, dtypes)."""
+    path = Path(path)
+    df = compact_dtypes(df)
+    df.to_parquet(path, index=False, compression="zstd")
+    meta = {
+        "sha256": content_hash(df),
+        "n_rows": int(len(df)),
+        "duplicates_dropped": int(duplicates_dropped),
+        "dtypes": {str(c): str(df[c].dtype) for c in df.columns},
+    }
+    with open(meta_path_for(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    return meta
+
+
+def dataset_hash(path: Path, df: Optional[pd.DataFrame] = None) -> str:
+    """Content hash of a dataset: from the .meta.json of compact files, computed otherwise."""
+    meta_path = meta_path_for(path)
+    if Path(path).suffix == ".parquet" and meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)["sha256"]
+    return content_hash(df if df is not None else read_dataset(path))
+
+
+def _memory_mb(df: pd.DataFrame) -> float:
+    return float(df.memory_usage(deep=True).sum()) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", type=Path, help="generated dataset (CSV file or Parquet directory)")
+    parser.add_argument("output", type=Path, help="compact .parquet file to write")
+    parser.add_argument("--keep-duplicates", action="store_true")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    raw = pd.read_csv(args.source) if args.source.suffix == ".csv" else read_dataset(args.source)
+    t_raw = time.perf_counter() - t0
+
+    df = compact_dtypes(raw)
+    dropped = 0
+    if not args.keep_duplicates:
+        df, dropped = deduplicate(df)
+    meta = write_compact(df, args.output, dropped)
+
+    t0 = time.perf_counter()
+    compact = read_dataset(args.output)
+    t_compact = time.perf_counter() - t0
+
+    print(f"Rows: {len(raw)} -> {meta['n_rows']} ({dropped} exact duplicates dropped)")
+    print(f"Memory: {_memory_mb(raw):.1f} MB (inferred dtypes) -> {_memory_mb(compact):.1f} MB")
+    print(f"Load time: {t_raw * 1000:.0f} ms -> {t_compact * 1000:.0f} ms")
+    print(f"Size on disk: {args.source.stat().st_size / 1e6 if args.source.is_file() else float('nan'):.1f} MB "
+          f"-> {args.output.stat().st_size / 1e6:.1f} MB")
+    print(f"sha256: {meta['sha256']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Streaming dataset writer for the synthetic SHC dataset
+
+generate_dataset produces the dataset chunk by chunk; this module writes each
+chunk to disk as soon as it is complete so peak memory does not grow with the
+number of samples and a crash only loses the chunk in flight.
+
+Two formats are supported:
+    - "parquet": a directory of part-NNNNN.parquet files with categorical and
+      float32 columns plus manifest.json
+    - "csv": a single CSV appended chunk by chunk plus <name>.manifest.json
+
+The manifest records, per chunk, the file, row count, label distribution and
+a SHA-256 of the chunk's bytes, and is rewritten atomically after every chunk,
+so it also serves as the checkpoint for resuming an interrupted run.
+
+Sharded runs (several machines on a shared directory) write one output per
+shard next to the final path; merge_shards validates the shard manifests and
+combines them into the same output a single-machine run would have produced.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from dataset_schema import LABELS, compact_dtypes, read_dataset
+
+FORMATS = ("csv", "parquet")
+
+
+def manifest_path_for(output: Path, fmt: str) -> Path:
+    output = Path(output)
+    if fmt == "parquet":
+        return output / "manifest.json"
+    return output.with_name(output.stem + ".manifest.json")
+
+
+def write_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    """Write the manifest atomically (temp file + rename)."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    if not Path(path).exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def shard_output_path(output: Path, index: int, count: int) -> Path:
+    """Per-shard output next to the final dataset path."""
+    output = Path(output)
+    return output.with_name(f"{output.stem}.shard-{index}-of-{count}{output.suffix}")
+
+
+def shard_chunk_range(n_chunks: int, index: int, count: int) -> Tuple[int, int]:
+    """Contiguous [start, stop) chunk range of shard `index` out of `count`."""
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index {index} out of range for {count} shards")
+    return (index * n_chunks) // count, ((index + 1) * n_chunks) // count
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def label_counts(df: pd.DataFrame) -> Dict[str, int]:
+    counts = df["label"].astype(str).value_counts()
+    return {str(k): int(v) for k, v in counts.items()}
+
+
+class ChunkWriter:
+    """Appends generated chunks to a CSV file or a Parquet part directory."""
+
+    def __init__(self, output: Path, fmt: str = "csv"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown dataset format: {fmt} (expected one of {FORMATS})")
+        self.output = Path(output)
+        self.fmt = fmt
+        self.manifest_path = manifest_path_for(self.output, fmt)
+        if fmt == "parquet":
+            self.output.mkdir(parents=True, exist_ok=True)
+
+    def reset(self) -> None:
+        """Remove previous output so a fresh run does not mix with old data."""
+        if self.fmt == "parquet":
+            for part in self.output.glob("part-*.parquet"):
+                part.unlink()
+        elif self.output.exists():
+            self.output.unlink()
+        if self.manifest_path.exists():
+            self.manifest_path.unlink()
+
+    def rollback(self, manifest: Dict[str, Any]) -> None:
+        """Remove output written after the last checkpoint recorded in the manifest."""
+        if self.fmt == "parquet":
+            recorded = {chunk["file"] for chunk in manifest["chunks"]}
+            for part in self.output.glob("part-*.parquet"):
+                if part.name not in recorded:
+                    part.unlink()
+        elif self.output.exists():
+            size = manifest["chunks"][-1]["bytes"] if manifest["chunks"] else 0
+            with open(self.output, "r+b") as f:
+                f.truncate(size)
+            if size == 0:
+                self.output.unlink()
+
+    def write_chunk(self, index: int, df: pd.DataFrame) -> Dict[str, Any]:
+        """Write one chunk and return its manifest entry."""
+        if self.fmt == "parquet":
+            name = f"part-{index:05d}.parquet"
+            path = self.output / name
+            compact_dtypes(df).to_parquet(path, index=False)
+            entry = {"file": name, "sha256": _sha256(path.read_bytes())}
+        else:
+            data = df.to_csv(index=False, header=False, lineterminator="\n").encode("utf-8")
+            with open(self.output, "ab") as f:
+                if f.tell() == 0:
+                    f.write(df.iloc[:0].to_csv(index=False, lineterminator="\n").encode("utf-8"))
+                f.write(data)
+                # File size after this chunk: the CSV truncation point when resuming
+                size = f.tell()
+            entry = {"file": self.output.name, "bytes": size, "sha256": _sha256(data)}
+        return {
+            "index": int(index),
+            **entry,
+            "n_rows": int(len(df)),
+            "label_counts": label_counts(df),
+        }
+
+
+def _merge_stats(states: List[Dict[str, Any]]) -> Dict[str, Any]:
+    states = [s for s in states if s and s.get("n")]
+    if not states:
+        return {"n": 0, "total": 0.0, "min": None, "max": None}
+    return {
+        "n": sum(s["n"] for s in states),
+        "total": sum(s["total"] for s in states),
+        "min": min(s["min"] for s in states),
+        "max": max(s["max"] for s in states),
+    }
+
+
+def _validate_shard(manifest: Dict[str, Any], shard_out: Path, fmt: str) -> None:
+    """Check a shard's files against its manifest (hashes and row counts)."""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for chunk in manifest["chunks"]:
+            path = shard_out / chunk["file"]
+            if _sha256(path.read_bytes()) != chunk["sha256"]:
+                raise ValueError(f"Hash mismatch for {path}")
+            if pq.ParquetFile(path).metadata.num_rows != chunk["n_rows"]:
+                raise ValueError(f"Row count mismatch for {path}")
+        return
+
+    with open(shard_out, "rb") as f:
+        header = f.readline()
+        start = len(header)
+        for chunk in manifest["chunks"]:
+            f.seek(start)
+            data = f.read(chunk["bytes"] - start)
+            if _sha256(data) != chunk["sha256"]:
+                raise ValueError(f"Hash mismatch for chunk {chunk['index']} in {shard_out}")
+            if data.count(b"\n") != chunk["n_rows"]:
+                raise ValueError(f"Row count mismatch for chunk {chunk['index']} in {shard_out}")
+            start = chunk["bytes"]
+
+
+def merge_shards(output: Path, fmt: str, n_shards: int, run_keys: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Validate the manifests of all shards and combine them into `output`.
+
+    Every shard must be complete, share the same run arguments (seed, sample
+    count, chunk size, ...) and cover its chunk range without gaps; chunk files
+    must match their recorded hashes and row counts. The merged dataset and
+    manifest are identical to a single-machine run with the same arguments.
+    """
+    output = Path(output)
+    manifests = []
+    for index in range(n_shards):
+        shard_out = shard_output_path(output, index, n_shards)
+        manifest = read_manifest(manifest_path_for(shard_out, fmt))
+        if manifest is None:
+            raise FileNotFoundError(f"Missing manifest for shard {index}/{n_shards}: {shard_out}")
+        if not manifest.get("complete", False):
+            raise ValueError(f"Shard {index}/{n_shards} is not complete")
+        shard = manifest.get("shard") or {}
+        if (shard.get("index"), shard.get("count")) != (index, n_shards):
+            raise ValueError(f"Manifest of {shard_out} belongs to shard {shard.get('index')}/{shard.get('count')}")
+        for key in run_keys:
+            if manifests and manifest.get(key) != manifests[0][0].get(key):
+                raise ValueError(f"Shard {index} differs from shard 0 in '{key}'")
+        expected = list(range(shard["start_chunk"], shard["stop_chunk"]))
+        if [chunk["index"] for chunk in manifest["chunks"]] != expected:
+            raise ValueError(f"Shard {index} does not cover chunks {expected[:1]}..{expected[-1:]}")
+        if manifests and shard["start_chunk"] != manifests[-1][0]["shard"]["stop_chunk"]:
+            raise ValueError(f"Gap or overlap between shard {index - 1} and shard {index}")
+        _validate_shard(manifest, shard_out, fmt)
+        manifests.append((manifest, shard_out))
+
+    writer = ChunkWriter(output, fmt)
+    writer.reset()
+    merged = {key: manifests[0][0][key] for key in run_keys}
+    merged.update({"chunks": [], "next_chunk": 0, "total_rows": 0, "label_distribution": {}})
+
+    out_file = None if fmt == "parquet" else open(output, "wb")
+    try:
+        for manifest, shard_out in manifests:
+            if fmt == "parquet":
+                for chunk in manifest["chunks"]:
+                    shutil.copyfile(shard_out / chunk["file"], output / chunk["file"])
+                    merged["chunks"].append(dict(chunk))
+            else:
+                with open(shard_out, "rb") as f:
+                    header = f.readline()
+                    if out_file.tell() == 0:
+                        out_file.write(header)
+                    shutil.copyfileobj(f, out_file)
+                offset = out_file.tell() - os.path.getsize(shard_out)
+                for chunk in manifest["chunks"]:
+                    merged["chunks"].append({**chunk, "file": output.name, "bytes": chunk["bytes"] + offset})
+            merged["total_rows"] += manifest["total_rows"]
+            for label, count in manifest["label_distribution"].items():
+                merged["label_distribution"][label] = merged["label_distribution"].get(label, 0) + count
+    finally:
+        if out_file is not None:
+            out_file.close()
+
+    merged["next_chunk"] = manifests[-1][0]["shard"]["stop_chunk"]
+    merged["stats"] = {
+        col: _merge_stats([m["stats"].get(col) for m, _ in manifests])
+        for col in manifests[0][0]["stats"]
+    }
+    merged["complete"] = True
+    write_manifest(writer.manifest_path, merged)
+    return merged
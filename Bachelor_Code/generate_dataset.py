@@ -1,8 +1,14 @@
 # generate_shc_dataset.py
 
+import argparse
+import itertools
 import math
+import os
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
 
 # add imports at top
 import json
@@ -16,12 +22,57 @@ PLOTS_DIR.mkdir(exist_ok=True)
 
 import numpy as np
 import pandas as pd
-from fastapi import HTTPException
-
-from make_prediction import select_shaft_connection, materials, calculate_required_torque
-from main import ShaftConnectionRequest, UserPreferences
+from make_prediction import (
+    CONNECTION_TYPES, MARGIN_TIE_BAND, SCORE_WEIGHTS,
+    evaluate_capacities_batch, score_connections_batch, select_shaft_connection_batch,
+    materials,
+)
+from dataset_writer import (
+    FORMATS, LABELS, ChunkWriter, merge_shards, read_dataset, read_manifest,
+    shard_chunk_range, shard_output_path, write_manifest,
+)
 
 OUTPUT_FILE = Path(__file__).parent / "synthetic_SHC_dataset.csv"
+OUTPUT_DIR_PARQUET = Path(__file__).parent / "synthetic_SHC_dataset"
+OUTPUT_DIR_ENUM = Path(__file__).parent / "enumerated_SHC_dataset"
+# Samples per generation chunk; every chunk draws from its own SeedSequence child
+CHUNK_SIZE = 2000
+
+# prior: independent draws; active: boundary-focused; sobol / lhs: quasi-random point sets
+SAMPLING_MODES = ("prior", "active", "sobol", "lhs")
+# Active sampling: candidates drawn per kept row, and share of kept rows drawn
+# away from the decision boundaries so the rest of the space stays covered
+ACTIVE_POOL_FACTOR = 4
+ACTIVE_BACKGROUND_SHARE = 0.2
+
+# Full-factorial enumeration: cases per block, inner/outer diameter ratio of hollow shafts
+ENUM_BLOCK_SIZE = 200_000
+ENUM_INNER_RATIO = 0.45
+
+PREF_COLUMNS = [
+    "pref_ease", "pref_movement", "pref_cost", "pref_vibration",
+    "pref_speed", "pref_bidirectional", "pref_maintenance", "pref_durability",
+]
+# Column order of the generated dataset
+DATASET_COLUMNS = [
+    # geometry / operating conditions
+    "shaft_diameter", "hub_length", "shaft_type", "shaft_material", "has_bending",
+    "safety_factor", "surface_condition", "mu_override", "hub_outer_diameter",
+    "shaft_inner_diameter", "required_torque",
+    # prefs
+    *PREF_COLUMNS,
+    # labels
+    "label", "analytical_label", "feasible",
+]
+# Intermediate physics of the analytical engine, appended with include_physics:
+# capacities (Nmm), relative margins cap / M_design - 1 and scores (NaN when
+# the connection is infeasible) per connection type
+PHYSICS_COLUMNS = [
+    "M_design_Nmm", "mu_used", "Uw_mm", "press_interference_ok",
+    *[f"cap_{conn}" for conn in CONNECTION_TYPES],
+    *[f"margin_{conn}" for conn in CONNECTION_TYPES],
+    *[f"score_{conn}" for conn in CONNECTION_TYPES],
+]
 
 # Discrete diameters you actually care about (DIN-ish progression)
 DIAMETER_OPTIONS = np.array([
@@ -31,152 +82,291 @@ DIAMETER_OPTIONS = np.array([
     170, 190, 210, 230
 ], dtype=float)
 
-def random_user_prefs(rng: np.random.Generator) -> UserPreferences:
-    def pref() -> float:
-        return float(rng.integers(0, 11)) / 10.0  # 0.0..1.0 step 0.1
 
-    return UserPreferences(
-        ease=pref(), movement=pref(), cost=pref(), vibration=pref(),
-        speed=pref(), maintenance=pref(), bidirectional=pref(), durability=pref(),
+def _sample_geometry_columns(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """Geometry, material and friction columns of n requests (no torque / safety factor yet)."""
+    # Diameter bands: 70% typical (20-60), 25% mid (60-120], 5% tails
+    typical = DIAMETER_OPTIONS[(DIAMETER_OPTIONS >= 20) & (DIAMETER_OPTIONS <= 60)]
+    mid     = DIAMETER_OPTIONS[(DIAMETER_OPTIONS > 60) & (DIAMETER_OPTIONS <= 120)]
+    tails   = DIAMETER_OPTIONS[(DIAMETER_OPTIONS < 20) | (DIAMETER_OPTIONS > 120)]
+    u = rng.random(n)
+    d = np.where(
+        u < 0.70, typical[rng.integers(0, len(typical), n)],
+        np.where(u < 0.95, mid[rng.integers(0, len(mid), n)], tails[rng.integers(0, len(tails), n)]),
     )
 
+    # 70% with bending → hub length ~ D, others ~ 0.5–0.8 D
+    has_bending = rng.random(n) < 0.7
+    hub_length = np.round(d * np.where(has_bending, rng.uniform(0.9, 1.3, n), rng.uniform(0.4, 0.8, n)), 0)
 
+    hollow = rng.random(n) < 0.2
+    material_names = np.array(list(materials.keys()))
+    material = material_names[rng.integers(0, len(material_names), n)]
 
-def sample_required_torque(
-    rng: np.random.Generator,
-    d_mm: float,
-    shaft_material: str,
-    mode: str = "relative",
-):
-    if mode == "relative":
-        ref_T = calculate_required_torque(d_mm, shaft_material)
-        factor = float(rng.uniform(0.3, 1.4))
-        return round(ref_T * factor, 0), factor
-
-    coef = float(rng.uniform(70.0, 200.0))
-    Wt = math.pi * (d_mm ** 3) / 16.0
-    taper = 1.0 if d_mm <= 40 else 0.9 if d_mm <= 70 else 0.8
-    T = round(0.05 * coef * Wt * taper, 0)
-    return T, None
-
-
-def sample_safety_factor_1dp(
-    rng: np.random.Generator,
-    has_bending: bool,
-    surface_condition: str,
-    mu_override,
-    torque_factor: float | None,
-    prefs: UserPreferences,
-) -> float:
-    # Baseline (most users hover around 1.4–1.6)
-    sf = rng.normal(1.5, 0.12)
-
-    # More demanding / uncertain situations -> higher SF
-    if has_bending:
-        sf += 0.10
-
-    # "dry" tends to be less controlled; "oiled" implies more controlled assembly/conditions
-    if surface_condition == "dry":
-        sf += 0.05
-    elif surface_condition == "oiled":
-        sf -= 0.03
-
-    # if user overrides μ, they’re “tuning” the model; treat as slightly more controlled
-    if mu_override is not None:
-        sf -= 0.05
-
-    # torque_factor > 1 means you sampled "harder than reference" cases -> bump SF a bit
-    if torque_factor is not None:
-        sf += 0.20 * max(0.0, torque_factor - 1.0)
-
-    # preferences: durability & bidirectional -> more conservative; cost -> less conservative
-    sf += 0.20 * (prefs.durability - 0.5)
-    sf += 0.10 * (prefs.bidirectional - 0.5)
-    sf -= 0.15 * (prefs.cost - 0.5)
-
-    # Frontend bounds and 1 decimal place output
-    sf = min(max(sf, 1.0), 2.0)
-    return round(float(sf), 1)
-
-
-def sample_diameter_user_like(rng):
-    typical = DIAMETER_OPTIONS[(DIAMETER_OPTIONS >= 20) & (DIAMETER_OPTIONS <= 60)]
-    mid     = DIAMETER_OPTIONS[(DIAMETER_OPTIONS > 60) & (DIAMETER_OPTIONS <= 120)]
-    tails   = DIAMETER_OPTIONS[(DIAMETER_OPTIONS < 20) | (DIAMETER_OPTIONS > 120)]
+    # Surface condition and possible μ override
+    surface_condition = np.array(["dry", "oiled"])[rng.integers(0, 2, n)]
+    mu_override = np.where(rng.random(n) < 0.15, np.round(rng.uniform(0.05, 0.25, n), 2), np.nan)
 
-    u = rng.random()
-    if u < 0.70:
-        return float(rng.choice(typical))
-    elif u < 0.95:
-        return float(rng.choice(mid))
-    return float(rng.choice(tails))
+    # Geometry: outer diameter for hubs, inner for hollow shafts
+    shaft_inner = np.where(hollow, np.round(d * rng.uniform(0.3, 0.6, n), 0), np.nan)
+    hub_outer = d * rng.uniform(1.8, 2.6, n)
+    hub_outer = np.where(hollow, np.round(hub_outer, 0), hub_outer)  # hollow rounds before the bending bump
+    hub_outer = np.round(np.where(has_bending, hub_outer * rng.uniform(1.05, 1.15, n), hub_outer), 0)
 
+    return {
+        "shaft_diameter": d,
+        "hub_length": hub_length,
+        "shaft_type": np.where(hollow, "hollow", "solid"),
+        "shaft_material": material,
+        "hub_material": material,
+        "has_bending": has_bending.astype(float),
+        "surface_condition": surface_condition,
+        "mu_override": mu_override,
+        "hub_outer_diameter": hub_outer,
+        "shaft_inner_diameter": shaft_inner,
+    }
 
-def sample_request(rng: np.random.Generator) -> ShaftConnectionRequest:
-    d = sample_diameter_user_like(rng)
 
-    # 70% with bending → hub length ~ D, others ~ 0.5–0.8 D
-    has_bending = bool(rng.random() < 0.7)
-    if has_bending:
-        hub_length = float(d * rng.uniform(0.9, 1.3))
-    else:
-        hub_length = float(d * rng.uniform(0.4, 0.8))
+def _sample_pref_columns(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """Preferences on the 0.0..1.0 grid with step 0.1."""
+    pref_grid = rng.integers(0, 11, (n, len(PREF_COLUMNS))) / 10.0
+    return {col: pref_grid[:, i] for i, col in enumerate(PREF_COLUMNS)}
 
-    shaft_type = "hollow" if rng.random() < 0.2 else "solid"
-    material = rng.choice(list(materials.keys()))
-    # safety_factor = round(float(rng.uniform(1.0, 2.0)), 2)
 
-    
+def _add_load_columns(rng: np.random.Generator, cols: Dict[str, np.ndarray], prefs: Dict[str, np.ndarray]) -> None:
+    """Add required_torque and safety_factor to geometry columns (in place)."""
+    d = cols["shaft_diameter"]
+    n = len(d)
 
-    # Surface condition and possible μ override
-    surface_condition = rng.choice(["dry", "oiled"])
-    mu_override = None
-    if rng.random() < 0.15:
-        mu_override = round(float(rng.uniform(0.05, 0.25)), 2)
+    # Torque relative to the reference demand of make_prediction.calculate_required_torque
+    Wt = math.pi * (d ** 3) / 16.0
+    taper = np.where(d <= 40, 1.0, np.where(d <= 70, 0.9, 0.8))
+    torque_factor = rng.uniform(0.3, 1.4, n)
+    cols["required_torque"] = np.round(0.05 * 135.0 * Wt * taper * torque_factor, 0)
 
-    # Geometry: outer diameter for hubs, inner for hollow shafts
-    if shaft_type == "hollow":
-        shaft_inner = round(float(d * rng.uniform(0.3, 0.6)), 0)
-        hub_outer = round(float(d * rng.uniform(1.8, 2.6)), 0)
-        if has_bending:
-            hub_outer = round(hub_outer * rng.uniform(1.05, 1.15), 0)
+    # Safety factor: most users hover around 1.4-1.6; bending, dry surfaces and harder
+    # than reference torque push it up, a mu override and cost preference pull it down
+    sf = rng.normal(1.5, 0.12, n)
+    sf += 0.10 * cols["has_bending"]
+    sf += np.where(cols["surface_condition"] == "dry", 0.05, -0.03)
+    sf -= 0.05 * ~np.isnan(cols["mu_override"])
+    sf += 0.20 * np.maximum(0.0, torque_factor - 1.0)
+    sf += 0.20 * (prefs["pref_durability"] - 0.5)
+    sf += 0.10 * (prefs["pref_bidirectional"] - 0.5)
+    sf -= 0.15 * (prefs["pref_cost"] - 0.5)
+    cols["safety_factor"] = np.round(np.clip(sf, 1.0, 2.0), 1)
 
-    else:
-        shaft_inner = None
-        hub_outer = float(d * rng.uniform(1.8, 2.6))
-        if has_bending:
-            hub_outer *= rng.uniform(1.05, 1.15)
-        hub_outer = round(hub_outer, 0)
-
-    prefs = random_user_prefs(rng)
-    req_torque, torque_factor = sample_required_torque(rng, d, material, mode="relative")
-
-    # after surface_condition + mu_override are set:
-    safety_factor = sample_safety_factor_1dp(
-        rng=rng,
-        has_bending=has_bending,
-        surface_condition=surface_condition,
-        mu_override=mu_override,
-        torque_factor=torque_factor,
-        prefs=prefs,
-    )
 
-    request = ShaftConnectionRequest(
-        shaft_diameter=d,
-        hub_length=round(hub_length, 0),
-        shaft_material=material,
-        hub_material=material,
-        shaft_type=shaft_type,
-        has_bending=has_bending,
-        required_torque=req_torque,
-        user_preferences=prefs,
-        safety_factor=safety_factor,
-        surface_condition=surface_condition,
-        hub_outer_diameter=hub_outer,
-        shaft_inner_diameter=shaft_inner,
-        mu_override=mu_override,
-    )
-    return request
+def sample_requests_batch(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """
+    Draw n requests at once as NumPy columns (dataset column names).
+
+    The distributions of the former per-row sampler (kept as the reference in
+    tests/test_generate_dataset.py), without building a Pydantic model per
+    row. The columns feed select_shaft_connection_batch.
+    """
+    cols = _sample_geometry_columns(rng, n)
+    prefs = _sample_pref_columns(rng, n)
+    _add_load_columns(rng, cols, prefs)
+    return {**cols, **prefs}
+
+
+def sample_geometry_major_batch(rng: np.random.Generator, n_geometries: int, prefs_per_geometry: int) -> Tuple[Dict, Dict]:
+    """
+    Draw n_geometries load cases and prefs_per_geometry preference vectors for each.
+
+    Returns (geometry columns of length n_geometries, preference columns of
+    length n_geometries * prefs_per_geometry, grouped by geometry). The safety
+    factor belongs to the load case here, so its preference terms are taken at
+    the neutral 0.5 instead of following one of the K vectors.
+    """
+    cols = _sample_geometry_columns(rng, n_geometries)
+    neutral = {col: np.full(n_geometries, 0.5) for col in PREF_COLUMNS}
+    _add_load_columns(rng, cols, neutral)
+    prefs = _sample_pref_columns(rng, n_geometries * prefs_per_geometry)
+    return cols, prefs
+
+# Unit-cube dimensions of the quasi-random sampler, in column order of the
+# uniforms passed to _requests_from_uniforms
+QMC_GEOMETRY_DIMS = [
+    "diameter", "has_bending", "hub_length_ratio", "hollow", "material", "surface_condition",
+    "has_mu_override", "mu_override", "inner_ratio", "hub_outer_ratio", "bending_bump",
+    "torque_factor", "safety_factor_noise",
+]
+QMC_METHODS = ("sobol", "lhs")
+
+
+def _qmc_uniforms(rng: np.random.Generator, n: int, dims: int, method: str) -> np.ndarray:
+    """n points of a scrambled Sobol' sequence or a Latin hypercube in [0, 1)^dims."""
+    from scipy.stats import qmc
+
+    if method == "sobol":
+        # Sobol' balance properties hold for powers of two; draw the next one and keep a prefix
+        m = max(0, math.ceil(math.log2(max(n, 1))))
+        return qmc.Sobol(d=dims, scramble=True, seed=rng).random_base2(m)[:n]
+    return qmc.LatinHypercube(d=dims, seed=rng).random(n)
+
+
+def _categorical_from_uniform(u: np.ndarray, values: np.ndarray, probs: np.ndarray = None) -> np.ndarray:
+    """Inverse CDF of a discrete distribution (uniform over values by default)."""
+    if probs is None:
+        probs = np.full(len(values), 1.0 / len(values))
+    idx = np.searchsorted(np.cumsum(probs), u, side="right")
+    return values[np.minimum(idx, len(values) - 1)]
+
+
+def _prefs_from_uniforms(U: np.ndarray) -> Dict[str, np.ndarray]:
+    """Preferences on the 0.0..1.0 grid with step 0.1 (11 equal strata per dimension)."""
+    grid = np.minimum(np.floor(U * 11), 10) / 10.0
+    return {col: grid[:, i] for i, col in enumerate(PREF_COLUMNS)}
+
+
+def _requests_from_uniforms(U: np.ndarray, prefs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Map unit-cube points to request columns (same marginals as sample_requests_batch).
+
+    Every dimension, discrete ones included, goes through its inverse CDF, so
+    the stratification of the point set carries over: diameters, materials
+    and surface conditions appear in proportion to their prior probabilities.
+    """
+    from scipy.stats import norm
+
+    u = dict(zip(QMC_GEOMETRY_DIMS, U.T))
+
+    # Diameter bands: 70% typical (20-60), 25% mid (60-120], 5% tails, uniform within a band
+    typical = (DIAMETER_OPTIONS >= 20) & (DIAMETER_OPTIONS <= 60)
+    mid = (DIAMETER_OPTIONS > 60) & (DIAMETER_OPTIONS <= 120)
+    tails = ~typical & ~mid
+    probs = 0.70 * typical / typical.sum() + 0.25 * mid / mid.sum() + 0.05 * tails / tails.sum()
+    d = _categorical_from_uniform(u["diameter"], DIAMETER_OPTIONS, probs)
+
+    has_bending = u["has_bending"] < 0.7
+    hub_length = np.round(d * np.where(has_bending, 0.9 + 0.4 * u["hub_length_ratio"], 0.4 + 0.4 * u["hub_length_ratio"]), 0)
+
+    hollow = u["hollow"] < 0.2
+    material = _categorical_from_uniform(u["material"], np.array(list(materials.keys())))
+    surface_condition = _categorical_from_uniform(u["surface_condition"], np.array(["dry", "oiled"]))
+    mu_override = np.where(u["has_mu_override"] < 0.15, np.round(0.05 + 0.20 * u["mu_override"], 2), np.nan)
+
+    shaft_inner = np.where(hollow, np.round(d * (0.3 + 0.3 * u["inner_ratio"]), 0), np.nan)
+    hub_outer = d * (1.8 + 0.8 * u["hub_outer_ratio"])
+    hub_outer = np.where(hollow, np.round(hub_outer, 0), hub_outer)
+    hub_outer = np.round(np.where(has_bending, hub_outer * (1.05 + 0.10 * u["bending_bump"]), hub_outer), 0)
+
+    Wt = math.pi * (d ** 3) / 16.0
+    taper = np.where(d <= 40, 1.0, np.where(d <= 70, 0.9, 0.8))
+    torque_factor = 0.3 + 1.1 * u["torque_factor"]
+    required_torque = np.round(0.05 * 135.0 * Wt * taper * torque_factor, 0)
+
+    sf = 1.5 + 0.12 * norm.ppf(np.clip(u["safety_factor_noise"], 1e-12, 1.0 - 1e-12))
+    sf += 0.10 * has_bending
+    sf += np.where(surface_condition == "dry", 0.05, -0.03)
+    sf -= 0.05 * ~np.isnan(mu_override)
+    sf += 0.20 * np.maximum(0.0, torque_factor - 1.0)
+    sf += 0.20 * (prefs["pref_durability"] - 0.5)
+    sf += 0.10 * (prefs["pref_bidirectional"] - 0.5)
+    sf -= 0.15 * (prefs["pref_cost"] - 0.5)
+
+    return {
+        "shaft_diameter": d,
+        "hub_length": hub_length,
+        "shaft_type": np.where(hollow, "hollow", "solid"),
+        "shaft_material": material,
+        "hub_material": material,
+        "has_bending": has_bending.astype(float),
+        "safety_factor": np.round(np.clip(sf, 1.0, 2.0), 1),
+        "surface_condition": surface_condition,
+        "mu_override": mu_override,
+        "hub_outer_diameter": hub_outer,
+        "shaft_inner_diameter": shaft_inner,
+        "required_torque": required_torque,
+    }
+
+
+def sample_requests_qmc(rng: np.random.Generator, n: int, method: str = "sobol") -> Dict[str, np.ndarray]:
+    """
+    Quasi-random counterpart of sample_requests_batch (one point set over all 21 dimensions).
+
+    method is "sobol" (scrambled Sobol') or "lhs" (Latin hypercube); rng
+    seeds the scrambling, so every chunk gets its own randomized point set.
+    """
+    U = _qmc_uniforms(rng, n, len(QMC_GEOMETRY_DIMS) + len(PREF_COLUMNS), method)
+    prefs = _prefs_from_uniforms(U[:, len(QMC_GEOMETRY_DIMS):])
+    return {**_requests_from_uniforms(U[:, :len(QMC_GEOMETRY_DIMS)], prefs), **prefs}
+
+
+def sample_geometry_major_qmc(
+    rng: np.random.Generator, n_geometries: int, prefs_per_geometry: int, method: str = "sobol"
+) -> Tuple[Dict, Dict]:
+    """Quasi-random counterpart of sample_geometry_major_batch (separate point sets for geometry and prefs)."""
+    neutral = {col: np.full(n_geometries, 0.5) for col in PREF_COLUMNS}
+    cols = _requests_from_uniforms(_qmc_uniforms(rng, n_geometries, len(QMC_GEOMETRY_DIMS), method), neutral)
+    prefs = _prefs_from_uniforms(_qmc_uniforms(rng, n_geometries * prefs_per_geometry, len(PREF_COLUMNS), method))
+    return cols, prefs
+
+
+# Dimensions and bins of the coverage metric: (low, high, bins); discrete
+# 0.1-step dimensions get one bin per grid value
+COVERAGE_DIMS = {
+    "hub_length_ratio": (0.4, 1.3, 10),
+    "hub_outer_ratio": (1.8, 3.0, 10),
+    "torque_factor": (0.3, 1.4, 10),
+    "safety_factor": (0.95, 2.05, 11),
+    **{col: (-0.05, 1.05, 11) for col in PREF_COLUMNS},
+}
+COVERAGE_STRATA = ["shaft_diameter", "shaft_material", "surface_condition", "shaft_type"]
+COVERAGE_DISCREPANCY_ROWS = 2048
+
+
+def coverage_metrics(df: pd.DataFrame) -> Dict[str, float]:
+    """
+    How well a dataset covers the sampled input space.
+
+    - strata_coverage: share of diameter x material x surface x shaft type
+      combinations that occur at least once
+    - pair_cell_coverage / min_pair_cell_coverage: mean / worst share of
+      occupied cells over all 2-D projections of the continuous and
+      preference dimensions (COVERAGE_DIMS grid)
+    - discrepancy: centered L2 discrepancy of the rank-transformed dimensions
+      (joint uniformity independent of the marginals, lower is better), on a
+      fixed-size prefix so datasets of any size compare
+    """
+    from scipy.stats import qmc
+
+    d = df["shaft_diameter"].to_numpy(dtype=float)
+    Wt = math.pi * (d ** 3) / 16.0
+    taper = np.where(d <= 40, 1.0, np.where(d <= 70, 0.9, 0.8))
+    dims = {
+        "hub_length_ratio": df["hub_length"].to_numpy(dtype=float) / d,
+        "hub_outer_ratio": df["hub_outer_diameter"].to_numpy(dtype=float) / d,
+        "torque_factor": df["required_torque"].to_numpy(dtype=float) / (0.05 * 135.0 * Wt * taper),
+        "safety_factor": df["safety_factor"].to_numpy(dtype=float),
+        **{col: df[col].to_numpy(dtype=float) for col in PREF_COLUMNS},
+    }
+    # Bin index of every row in every dimension
+    binned = {}
+    for name, (lo, hi, bins) in COVERAGE_DIMS.items():
+        x = np.clip((dims[name] - lo) / (hi - lo), 0.0, 1.0 - 1e-9)
+        binned[name] = (x * bins).astype(int)
+
+    pair_coverage = []
+    for a, b in itertools.combinations(COVERAGE_DIMS, 2):
+        cells = np.unique(binned[a] * COVERAGE_DIMS[b][2] + binned[b])
+        pair_coverage.append(len(cells) / (COVERAGE_DIMS[a][2] * COVERAGE_DIMS[b][2]))
+
+    n_strata = len(DIAMETER_OPTIONS) * len(materials) * 2 * 2
+    strata = df[COVERAGE_STRATA].astype(str).drop_duplicates()
+
+    prefix = pd.DataFrame({name: x[:COVERAGE_DISCREPANCY_ROWS] for name, x in dims.items()})
+    ranks = prefix.rank(pct=True).to_numpy() - 0.5 / max(len(prefix), 1)
+    return {
+        "n_rows": int(len(df)),
+        "strata_coverage": len(strata) / n_strata,
+        "pair_cell_coverage": float(np.mean(pair_coverage)),
+        "min_pair_cell_coverage": float(np.min(pair_coverage)),
+        "discrepancy": float(qmc.discrepancy(ranks, method="CD")) if len(ranks) > 1 else float("nan"),
+    }
+
 
 def save_dataset_distribution_plots(df: pd.DataFrame, out_dir: Path) -> None:
     """Generate publication-quality distribution plots for the synthetic dataset."""
@@ -264,92 +454,624 @@ def save_dataset_distribution_plots(df: pd.DataFrame, out_dir: Path) -> None:
     plt.close()
 
 
+def _sample_and_evaluate(
+    rng: np.random.Generator, n: int, prefs_per_geometry: int, sampling: str = "prior"
+) -> Tuple[Dict, Dict]:
+    """Draw n requests and run the batch selection on them; returns (columns, selection result)."""
+    qmc_method = sampling if sampling in QMC_METHODS else None
+    if prefs_per_geometry <= 1:
+        cols = sample_requests_qmc(rng, n, qmc_method) if qmc_method else sample_requests_batch(rng, n)
+        return cols, select_shaft_connection_batch(cols)
+
+    # One capacity evaluation per geometry, K preference vectors scored against it
+    n_geometries = math.ceil(n / prefs_per_geometry)
+    if qmc_method:
+        geometry, prefs = sample_geometry_major_qmc(rng, n_geometries, prefs_per_geometry, qmc_method)
+    else:
+        geometry, prefs = sample_geometry_major_batch(rng, n_geometries, prefs_per_geometry)
+    capacities = evaluate_capacities_batch(geometry)
+    capacities = {k: np.repeat(v, prefs_per_geometry)[:n] for k, v in capacities.items()}
+    prefs = {k: v[:n] for k, v in prefs.items()}
+    scored = score_connections_batch(capacities, {col[len("pref_"):]: v for col, v in prefs.items()})
+    cols = {k: np.repeat(v, prefs_per_geometry)[:n] for k, v in geometry.items()}
+    cols.update(prefs)
+    return cols, {**capacities, **scored}
+
+
+def boundary_mask(result: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Rows close to an analytical decision boundary.
+
+    A row is near the boundary when some connection's capacity is within
+    MARGIN_TIE_BAND of the design torque (feasible/infeasible switch) or when
+    the best and second-best feasible scores differ by less than what
+    MARGIN_TIE_BAND of capacity margin is worth in the score (label switch).
+    """
+    m_design = result["M_design_Nmm"]
+    near_capacity = np.zeros(len(m_design), dtype=bool)
+    for conn in CONNECTION_TYPES:
+        near_capacity |= np.abs(result[f"cap_{conn}"] / m_design - 1.0) <= MARGIN_TIE_BAND
+
+    scores = np.stack([result[f"score_{conn}"] for conn in CONNECTION_TYPES], axis=1)
+    scores = np.sort(np.where(np.isnan(scores), -np.inf, scores), axis=1)
+    with np.errstate(invalid="ignore"):
+        gap = scores[:, -1] - scores[:, -2]
+    near_tie = np.isfinite(gap) & (gap <= MARGIN_TIE_BAND * SCORE_WEIGHTS["margin"])
+    return near_capacity | near_tie
+
+
+def _select_active(rng: np.random.Generator, near_boundary: np.ndarray, n: int) -> np.ndarray:
+    """Indices of n rows: boundary rows first, ACTIVE_BACKGROUND_SHARE of the rest for coverage."""
+    boundary = np.flatnonzero(near_boundary)
+    other = np.flatnonzero(~near_boundary)
+    n_background = min(len(other), int(round(ACTIVE_BACKGROUND_SHARE * n)))
+    n_boundary = min(len(boundary), n - n_background)
+    n_background = min(len(other), n - n_boundary)  # top up when the boundary is sparse
+    picked = np.concatenate([
+        rng.choice(boundary, n_boundary, replace=False),
+        rng.choice(other, n_background, replace=False),
+    ])
+    return np.sort(picked)
+
+
+def _generate_chunk(task: Tuple[int, np.random.SeedSequence, int, Dict]) -> pd.DataFrame:
+    """Generate the rows of one chunk from its own SeedSequence stream (runs in a worker)."""
+    _, seed_seq, n_chunk, options = task
+    rng = np.random.default_rng(seed_seq)
+    active = options["sampling"] == "active"
+
+    n_draw = n_chunk * ACTIVE_POOL_FACTOR if active else n_chunk
+    cols, result = _sample_and_evaluate(rng, n_draw, options["prefs_per_geometry"], options["sampling"])
+
+    label = result["recommended_connection"]
+    feasible = result["feasible"]
+
+    # skip impossible designs for training, unless you explicitly
+    # want a "none" class
+    keep = np.ones(n_draw, dtype=bool) if options["keep_infeasible"] else feasible
+    if active:
+        candidates = np.flatnonzero(keep)
+        keep = candidates[_select_active(rng, boundary_mask(result)[candidates], n_chunk)]
+
+    df = pd.DataFrame({name: col[keep] for name, col in cols.items()})
+    df["label"] = label[keep]
+    df["analytical_label"] = label[keep]
+    df["feasible"] = feasible[keep].astype(float)
+    if options["include_physics"]:
+        df = df.assign(**_physics_columns(result, keep))
+    return df[dataset_columns(options["include_physics"])]
+
+
+def dataset_columns(include_physics: bool = False) -> List[str]:
+    return DATASET_COLUMNS + PHYSICS_COLUMNS if include_physics else list(DATASET_COLUMNS)
+
+
+def _physics_columns(result: Dict[str, np.ndarray], rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """PHYSICS_COLUMNS of the selected rows from a batch selection result."""
+    m_design = result["M_design_Nmm"][rows]
+    out = {
+        "M_design_Nmm": m_design,
+        "mu_used": result["mu_used"][rows],
+        "Uw_mm": result["Uw_mm"][rows],
+        "press_interference_ok": result["press_interference_ok"][rows],
+    }
+    for conn in CONNECTION_TYPES:
+        out[f"cap_{conn}"] = result[f"cap_{conn}"][rows]
+    for conn in CONNECTION_TYPES:
+        out[f"margin_{conn}"] = result[f"cap_{conn}"][rows] / m_design - 1.0
+    for conn in CONNECTION_TYPES:
+        out[f"score_{conn}"] = result[f"score_{conn}"][rows]
+    return out
+
+
+def _chunk_tasks(n_samples: int, seed: int, chunk_size: int, options: Dict) -> List[Tuple]:
+    """
+    Split n_samples into fixed-size chunks, each with an independent child stream.
+
+    Chunk i always gets child i of SeedSequence(seed), so the output depends only
+    on (seed, chunk_size) and not on how many workers process the chunks.
+    """
+    n_chunks = max(1, math.ceil(n_samples / chunk_size))
+    children = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = []
+    for i, child in enumerate(children):
+        n_chunk = min(chunk_size, n_samples - i * chunk_size)
+        tasks.append((i, child, n_chunk, options))
+    return tasks
+
+
+def _ordered_pool_map(fn, tasks: List[Tuple], workers: int) -> Iterator:
+    """
+    Ordered process-pool map with a bounded number of chunks in flight.
+
+    Results come back in submission order (deterministic merge) and at most
+    2 * workers chunks are pending, so memory stays flat for any n_samples.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        remaining = iter(tasks)
+        pending = deque(pool.submit(fn, task) for task in itertools.islice(remaining, 2 * workers))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                nxt = next(remaining, None)
+                if nxt is not None:
+                    pending.append(pool.submit(fn, nxt))
+                yield result
+        finally:
+            # Consumer stopped early (quotas filled) or failed: drop chunks that have
+            # not started; leaving the with block waits for the running ones
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def generate_chunks(
+    n_samples: int,
+    seed: int = 42,
+    keep_infeasible: bool = False,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    start_chunk: int = 0,
+    stop_chunk: int = None,
+    prefs_per_geometry: int = 1,
+    sampling: str = "prior",
+    include_physics: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """Yield the rows of chunks [start_chunk, stop_chunk), always in chunk order."""
+    options = {
+        "keep_infeasible": keep_infeasible,
+        "prefs_per_geometry": prefs_per_geometry,
+        "sampling": sampling,
+        "include_physics": include_physics,
+    }
+    tasks = _chunk_tasks(n_samples, seed, chunk_size, options)[start_chunk:stop_chunk]
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _generate_chunk(task)
+        return
+
+    yield from _ordered_pool_map(_generate_chunk, tasks, min(workers, len(tasks)))
+
+
+class _RunningStats:
+    """min / max / mean of a column accumulated over chunks (checkpointable)."""
+
+    def __init__(self, state: Dict = None):
+        state = state or {}
+        self.n = int(state.get("n", 0))
+        self.total = float(state.get("total", 0.0))
+        self.min = state.get("min")
+        self.max = state.get("max")
+
+    def update(self, values: pd.Series) -> None:
+        values = values.dropna()
+        if values.empty:
+            return
+        self.n += len(values)
+        self.total += float(values.sum())
+        lo, hi = float(values.min()), float(values.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+    def state(self) -> Dict:
+        return {"n": self.n, "total": self.total, "min": self.min, "max": self.max}
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"min": self.min, "max": self.max, "mean": self.total / max(self.n, 1)}
+
+
+# Columns with running min / max / mean in the manifest
+STATS_COLUMNS = ("shaft_diameter", "required_torque")
+
+
+def _open_checkpoint(
+    writer: ChunkWriter, run: Dict, run_keys: Tuple[str, ...], resume: bool,
+    start_chunk: int = 0, shard_info: Dict = None,
+) -> Dict:
+    """Manifest to continue from: the unfinished checkpoint of the same run, or a fresh one."""
+    manifest = read_manifest(writer.manifest_path) if resume else None
+    if (
+        manifest is not None
+        and not manifest.get("complete", False)
+        and all(manifest.get(k) == run[k] for k in run_keys)
+        and manifest.get("shard") == shard_info
+    ):
+        # Drop anything written after the last checkpoint (chunk in flight at the crash)
+        writer.rollback(manifest)
+        print(f"Resuming at chunk {manifest['next_chunk']} ({manifest['total_rows']} rows already written)")
+        return manifest
+
+    writer.reset()
+    manifest = {
+        **run,
+        "chunks": [],
+        "next_chunk": start_chunk,
+        "total_rows": 0,
+        "label_distribution": {},
+        "stats": {},
+        "complete": False,
+    }
+    if shard_info is not None:
+        manifest["shard"] = shard_info
+    return manifest
+
+
+def _checkpoint_chunk(
+    writer: ChunkWriter, manifest: Dict, index: int, chunk: pd.DataFrame, stats: Dict[str, _RunningStats]
+) -> None:
+    """Write one chunk and record it in the manifest (the resume point)."""
+    entry = writer.write_chunk(index, chunk)
+    for col, running in stats.items():
+        running.update(chunk[col])
+
+    manifest["chunks"].append(entry)
+    manifest["next_chunk"] = index + 1
+    manifest["total_rows"] += entry["n_rows"]
+    for label, count in entry["label_counts"].items():
+        manifest["label_distribution"][label] = manifest["label_distribution"].get(label, 0) + count
+    manifest["stats"] = {col: running.state() for col, running in stats.items()}
+    write_manifest(writer.manifest_path, manifest)
+
+
+# Manifest keys that must match for a run to resume from an existing checkpoint
+_RUN_KEYS = (
+    "format", "seed", "n_samples", "chunk_size", "keep_infeasible",
+    "prefs_per_geometry", "sampling", "class_quotas", "columns",
+)
+
+
+def _apply_quotas(chunk: pd.DataFrame, remaining: Dict[str, int]) -> pd.DataFrame:
+    """Keep the first rows of each label until its remaining quota is used up."""
+    labels = chunk["label"].to_numpy()
+    keep = np.zeros(len(chunk), dtype=bool)
+    for label, left in remaining.items():
+        if left > 0:
+            keep[np.flatnonzero(labels == label)[:left]] = True
+    return chunk[keep].reset_index(drop=True)
+
+
+def _quotas_filled(class_quotas: Dict[str, int], manifest: Dict) -> bool:
+    return all(manifest["label_distribution"].get(k, 0) >= q for k, q in class_quotas.items())
+
+
 def generate_dataset(
     n_samples: int = 5000,
     seed: int = 42,
     keep_infeasible: bool = False,
-) -> pd.DataFrame:
-    rng = np.random.default_rng(seed)
-    rows: List[Dict] = []
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    output_file: Path = OUTPUT_FILE,
+    fmt: str = "csv",
+    plots: bool = True,
+    resume: bool = True,
+    shard: Tuple[int, int] = None,
+    prefs_per_geometry: int = 1,
+    sampling: str = "prior",
+    class_quotas: Dict[str, int] = None,
+    include_physics: bool = False,
+) -> Dict:
+    """
+    Generate the dataset and stream it to disk chunk by chunk.
 
-    for _ in range(n_samples):
-        req = sample_request(rng)
+    Only one chunk per worker is held in memory at a time. The manifest doubles
+    as checkpoint: after each chunk it records the next chunk index, rows
+    written, running label counts and column stats. If an unfinished manifest
+    with the same run arguments exists and resume is True, generation continues
+    at the next chunk; since chunk i always uses SeedSequence child i, the
+    result is identical to an uninterrupted run. Returns the manifest.
 
-        try:
-            result = select_shaft_connection(req)
-        except HTTPException:
-            # something invalid in the geometry; skip sample
-            continue
-
-        label = result["recommended_connection"]
-        feasible = bool(result.get("feasible", label != "none"))
-
-        if not feasible and not keep_infeasible:
-            # skip impossible designs for training, unless you explicitly
-            # want a "none" class
-            continue
-
-        prefs = req.user_preferences
-
-        rows.append(
-            {
-                # geometry / operating conditions
-                "shaft_diameter": req.shaft_diameter,
-                "hub_length": req.hub_length,
-                "shaft_type": req.shaft_type,
-                "shaft_material": req.shaft_material,
-                "has_bending": float(req.has_bending),
-                "safety_factor": req.safety_factor,
-                "surface_condition": req.surface_condition,
-                "mu_override": req.mu_override,
-                "hub_outer_diameter": req.hub_outer_diameter,
-                "shaft_inner_diameter": req.shaft_inner_diameter,
-                "required_torque": req.required_torque,
-                # prefs
-                "pref_ease": prefs.ease,
-                "pref_movement": prefs.movement,
-                "pref_cost": prefs.cost,
-                "pref_vibration": prefs.vibration,
-                "pref_speed": prefs.speed,
-                "pref_bidirectional": prefs.bidirectional,
-                "pref_maintenance": prefs.maintenance,
-                "pref_durability": prefs.durability,
-                # labels
-                "label": label,
-                "analytical_label": label,
-                "feasible": float(feasible),
-            }
-        )
+    With shard=(i, N) only the i-th contiguous block of chunks is generated,
+    into a shard file/directory next to output_file (see merge_dataset_shards).
+    Chunk streams still come from the global seed and chunk index, so shards
+    need no coordination.
+
+    With prefs_per_geometry=K > 1, every sampled geometry / load case is
+    evaluated once and scored against K preference vectors (K consecutive
+    rows with the same geometry); see sample_geometry_major_batch.
+
+    sampling="active" draws ACTIVE_POOL_FACTOR candidates per row and keeps
+    mostly rows near a decision boundary (see boundary_mask); "sobol" and
+    "lhs" draw each chunk as one low-discrepancy point set (sample_requests_qmc). With
+    class_quotas (label -> rows), n_samples is the draw budget: rows of a
+    label are kept until its quota is filled, labels without a quota are
+    dropped, and generation stops as soon as every quota is met.
+
+    include_physics appends PHYSICS_COLUMNS (capacities, margins, M_design,
+    mu, Uw and scores as computed by the engine) to every row.
+    """
+    if prefs_per_geometry < 1:
+        raise ValueError("prefs_per_geometry must be >= 1")
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling} (expected one of {SAMPLING_MODES})")
+    if class_quotas is not None:
+        unknown = set(class_quotas) - set(LABELS)
+        if unknown:
+            raise ValueError(f"Unknown labels in class_quotas: {sorted(unknown)}")
+        if shard is not None:
+            raise ValueError("class_quotas are global and cannot be combined with sharding")
+    run = {
+        "format": fmt,
+        "seed": seed,
+        "n_samples": n_samples,
+        "chunk_size": chunk_size,
+        "keep_infeasible": keep_infeasible,
+        "prefs_per_geometry": prefs_per_geometry,
+        "sampling": sampling,
+        "class_quotas": class_quotas,
+        "columns": dataset_columns(include_physics),
+    }
+    n_chunks = max(1, math.ceil(n_samples / chunk_size))
+    start_chunk, stop_chunk = 0, n_chunks
+    shard_info = None
+    if shard is not None:
+        start_chunk, stop_chunk = shard_chunk_range(n_chunks, *shard)
+        shard_info = {"index": shard[0], "count": shard[1], "start_chunk": start_chunk, "stop_chunk": stop_chunk}
+        output_file = shard_output_path(output_file, *shard)
+        plots = False
+    writer = ChunkWriter(output_file, fmt)
+
+    manifest = _open_checkpoint(writer, run, _RUN_KEYS, resume, start_chunk, shard_info)
+    stats = {col: _RunningStats(manifest["stats"].get(col)) for col in STATS_COLUMNS}
+
+    chunks = generate_chunks(
+        n_samples, seed, keep_infeasible, workers, chunk_size, manifest["next_chunk"], stop_chunk,
+        prefs_per_geometry, sampling, include_physics,
+    )
+    # Closing the generator on an early stop shuts its process pool down right away
+    with closing(chunks):
+        for index, chunk in enumerate(chunks, start=manifest["next_chunk"]):
+            if class_quotas is not None:
+                remaining = {k: q - manifest["label_distribution"].get(k, 0) for k, q in class_quotas.items()}
+                chunk = _apply_quotas(chunk, remaining)
+            _checkpoint_chunk(writer, manifest, index, chunk, stats)
+            if class_quotas is not None and _quotas_filled(class_quotas, manifest):
+                break
+
+    manifest["complete"] = True
+    write_manifest(writer.manifest_path, manifest)
+    print(f"Saved {manifest['total_rows']} rows to {output_file} ({len(manifest['chunks'])} chunks, {fmt})")
+    if class_quotas is not None and not _quotas_filled(class_quotas, manifest):
+        print(f"Warning: sample budget exhausted before filling the quotas {class_quotas}: {manifest['label_distribution']}")
+
+    if shard is None:
+        _save_summary(output_file, manifest, plots)
+    return manifest
+
+
+def merge_dataset_shards(
+    n_shards: int,
+    output_file: Path = OUTPUT_FILE,
+    fmt: str = "csv",
+    plots: bool = True,
+) -> Dict:
+    """Validate and merge the outputs of generate_dataset(..., shard=(i, n_shards))."""
+    manifest = merge_shards(output_file, fmt, n_shards, _RUN_KEYS)
+    print(f"Merged {n_shards} shards: {manifest['total_rows']} rows to {output_file}")
+    _save_summary(output_file, manifest, plots)
+    return manifest
 
-    df = pd.DataFrame(rows)
-    df.to_csv(OUTPUT_FILE, index=False)
-    print(f"Saved {len(df)} rows to {OUTPUT_FILE}")
 
-        # Save distribution figures for thesis (Figure 4.4)
-    save_dataset_distribution_plots(df, PLOTS_DIR)
+def default_enumeration_grid() -> Dict[str, list]:
+    """Factor levels of the full-factorial validation set (JSON-serializable for the manifest)."""
+    return {
+        "shaft_diameter": [float(d) for d in DIAMETER_OPTIONS],
+        "shaft_material": list(materials.keys()),
+        "shaft_type": ["solid", "hollow"],
+        "surface_condition": ["dry", "oiled"],
+        "hub_length_ratio": [round(float(x), 3) for x in np.linspace(0.4, 1.3, 10)],
+        "hub_outer_ratio": [1.8, 2.2, 2.6],
+        "torque_factor": [round(float(x), 3) for x in np.linspace(0.3, 1.4, 23)],
+        "safety_factor": [round(1.0 + 0.1 * i, 1) for i in range(11)],
+    }
+
+
+def _enumerate_block(task: Tuple[int, int, int, Dict, bool]) -> pd.DataFrame:
+    """Rows [start, stop) of the Cartesian product of the grid, evaluated in one batch (runs in a worker)."""
+    _, start, stop, grid, include_physics = task
+    names = list(grid)
+    levels = [np.asarray(grid[name]) for name in names]
+    # Decode flat case indices into level indices: the product is never materialized
+    idx = np.unravel_index(np.arange(start, stop), [len(v) for v in levels])
+    f = {name: values[i] for name, values, i in zip(names, levels, idx)}
+
+    d = f["shaft_diameter"].astype(float)
+    n = len(d)
+    hollow = f["shaft_type"] == "hollow"
+    Wt = math.pi * (d ** 3) / 16.0
+    taper = np.where(d <= 40, 1.0, np.where(d <= 70, 0.9, 0.8))
+    cols = {
+        "shaft_diameter": d,
+        "hub_length": np.round(d * f["hub_length_ratio"], 0),
+        "shaft_type": f["shaft_type"],
+        "shaft_material": f["shaft_material"],
+        "hub_material": f["shaft_material"],
+        # The sampler's bending cases are exactly those with hub length >= 0.9 D
+        "has_bending": (f["hub_length_ratio"] >= 0.9).astype(float),
+        "safety_factor": f["safety_factor"].astype(float),
+        "surface_condition": f["surface_condition"],
+        "mu_override": np.full(n, np.nan),
+        "hub_outer_diameter": np.round(d * f["hub_outer_ratio"], 0),
+        "shaft_inner_diameter": np.where(hollow, np.round(d * ENUM_INNER_RATIO, 0), np.nan),
+        "required_torque": np.round(0.05 * 135.0 * Wt * taper * f["torque_factor"], 0),
+        **{col: np.full(n, 0.5) for col in PREF_COLUMNS},
+    }
+    result = select_shaft_connection_batch(cols)
+
+    df = pd.DataFrame(cols)
+    df["label"] = result["recommended_connection"]
+    df["analytical_label"] = result["recommended_connection"]
+    df["feasible"] = result["feasible"].astype(float)
+    if include_physics:
+        df = df.assign(**_physics_columns(result, np.arange(n)))
+    return df[dataset_columns(include_physics)]
+
+
+_ENUM_RUN_KEYS = ("format", "grid", "block_size", "columns")
+
+
+def enumerate_dataset(
+    grid: Dict[str, list] = None,
+    block_size: int = ENUM_BLOCK_SIZE,
+    workers: int = None,
+    output_file: Path = OUTPUT_DIR_ENUM,
+    fmt: str = "parquet",
+    resume: bool = True,
+    include_physics: bool = False,
+) -> Dict:
+    """
+    Evaluate every combination of the grid factors and stream the rows to disk.
+
+    The Cartesian product is walked in blocks of block_size flat case indices;
+    each block is decoded, evaluated with select_shaft_connection_batch in a
+    worker process and written as one chunk (all workers by default, at most
+    2 * workers blocks in memory). All rows are kept, infeasible ones with the
+    label "none". Preferences are neutral (0.5), mu comes from the friction
+    table and hollow shafts use ENUM_INNER_RATIO. Resumes from the manifest
+    like generate_dataset; include_physics as in generate_dataset. Returns
+    the manifest.
+    """
+    grid = grid or default_enumeration_grid()
+    workers = workers or os.cpu_count() or 1
+    n_cases = math.prod(len(levels) for levels in grid.values())
+    n_blocks = math.ceil(n_cases / block_size)
+    run = {
+        "format": fmt,
+        "grid": grid,
+        "block_size": block_size,
+        "columns": dataset_columns(include_physics),
+        "n_cases": n_cases,
+    }
+
+    writer = ChunkWriter(output_file, fmt)
+    manifest = _open_checkpoint(writer, run, _ENUM_RUN_KEYS, resume)
+    stats = {col: _RunningStats(manifest["stats"].get(col)) for col in STATS_COLUMNS}
+    print(f"Enumerating {n_cases} cases in {n_blocks} blocks with {workers} workers")
+
+    tasks = [
+        (b, b * block_size, min(n_cases, (b + 1) * block_size), grid, include_physics)
+        for b in range(manifest["next_chunk"], n_blocks)
+    ]
+    if workers <= 1 or len(tasks) <= 1:
+        blocks = (_enumerate_block(task) for task in tasks)
+    else:
+        blocks = _ordered_pool_map(_enumerate_block, tasks, min(workers, len(tasks)))
+    with closing(blocks):
+        for index, block in enumerate(blocks, start=manifest["next_chunk"]):
+            _checkpoint_chunk(writer, manifest, index, block, stats)
+
+    manifest["complete"] = True
+    write_manifest(writer.manifest_path, manifest)
+    print(f"Saved {manifest['total_rows']} rows to {output_file} ({len(manifest['chunks'])} blocks, {fmt})")
+    return manifest
+
+
+def _save_summary(output_file: Path, manifest: Dict, plots: bool) -> None:
+    """Thesis figures and dataset_stats.json for a finished dataset."""
+    if plots:
+        # Save distribution figures for thesis (Figure 4.4); only the plotted columns are read back
+        plot_columns = ["shaft_diameter", "required_torque", "label", "shaft_material", "safety_factor"]
+        save_dataset_distribution_plots(read_dataset(output_file, plot_columns), PLOTS_DIR)
 
     # Save a compact stats JSON (good for thesis reproducibility)
     stats = {
-        "n_rows": int(len(df)),
-        "label_distribution": df["label"].value_counts().to_dict(),
-        "shaft_diameter_mm": {
-            "min": float(df["shaft_diameter"].min()),
-            "max": float(df["shaft_diameter"].max()),
-            "mean": float(df["shaft_diameter"].mean()),
-        },
-        "required_torque_Nm": {
-            "min": float(df["required_torque"].min()),
-            "max": float(df["required_torque"].max()),
-            "mean": float(df["required_torque"].mean()),
-        },
+        "n_rows": int(manifest["total_rows"]),
+        "label_distribution": manifest["label_distribution"],
+        "shaft_diameter_mm": _RunningStats(manifest["stats"].get("shaft_diameter")).to_dict(),
+        "required_torque_Nm": _RunningStats(manifest["stats"].get("required_torque")).to_dict(),
     }
     with open(PLOTS_DIR / "dataset_stats.json", "w", encoding="utf-8") as f:
         json.dump(stats, f, indent=2, ensure_ascii=False)
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Generate the synthetic shaft-hub connection dataset.")
+    parser.add_argument("--n-samples", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (output does not depend on this); "
+                             "default: 1, all cores with --enumerate")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="samples per chunk / random stream (part of the reproducibility key)")
+    parser.add_argument("--keep-infeasible", action="store_true")
+    parser.add_argument("--prefs-per-geometry", type=int, default=1, metavar="K",
+                        help="score K preference vectors per sampled geometry (one capacity evaluation)")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default="prior",
+                        help="active: concentrate rows near the analytical decision boundaries; "
+                             "sobol / lhs: quasi-random coverage of the input space")
+    parser.add_argument("--class-quota", nargs="+", default=None, metavar="LABEL=N",
+                        help="stop once every listed label has N rows (--n-samples is then the draw budget)")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="csv: one appended file; parquet: directory of part files "
+                             "(default: csv, parquet with --enumerate)")
+    parser.add_argument("--output", type=Path, default=None,
+                        help=f"default: {OUTPUT_FILE.name} (csv) or {OUTPUT_DIR_PARQUET.name}/ (parquet)")
+    parser.add_argument("--no-plots", action="store_true", help="skip the distribution figures")
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignore an unfinished checkpoint and start from chunk 0")
+    parser.add_argument("--shard", type=_parse_shard, default=None, metavar="i/N",
+                        help="generate only shard i of N (0-based) next to --output")
+    parser.add_argument("--include-physics", action="store_true",
+                        help="also store capacities, margins, M_design, mu, Uw and scores per row")
+    parser.add_argument("--coverage", action="store_true",
+                        help="print coverage metrics of the finished dataset")
+    parser.add_argument("--enumerate", action="store_true",
+                        help="evaluate the full-factorial grid instead of sampling (default output: "
+                             f"{OUTPUT_DIR_ENUM.name}/, parquet)")
+    parser.add_argument("--merge-shards", type=int, default=None, metavar="N",
+                        help="validate and merge N finished shards into --output, then exit")
+    return parser.parse_args()
+
 
-    return df
+def _parse_shard(value: str) -> Tuple[int, int]:
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {count})")
+    return index, count
+
+
+def _parse_quotas(items: List[str]) -> Dict[str, int]:
+    if not items:
+        return None
+    quotas = {}
+    for item in items:
+        label, _, value = item.partition("=")
+        quotas[label] = int(value)
+    return quotas
 
 
 if __name__ == "__main__":
-    generate_dataset()
+    args = _parse_args()
+    if args.enumerate:
+        fmt = args.format or "parquet"
+        output_file = args.output or OUTPUT_DIR_ENUM
+        enumerate_dataset(
+            workers=args.workers, output_file=output_file, fmt=fmt,
+            resume=not args.fresh, include_physics=args.include_physics,
+        )
+    else:
+        fmt = args.format or "csv"
+        output_file = args.output or (OUTPUT_DIR_PARQUET if fmt == "parquet" else OUTPUT_FILE)
+        if args.merge_shards is not None:
+            merge_dataset_shards(args.merge_shards, output_file, fmt, plots=not args.no_plots)
+        else:
+            generate_dataset(
+                n_samples=args.n_samples,
+                seed=args.seed,
+                keep_infeasible=args.keep_infeasible,
+                workers=args.workers or 1,
+                chunk_size=args.chunk_size,
+                output_file=output_file,
+                fmt=fmt,
+                plots=not args.no_plots,
+                resume=not args.fresh,
+                shard=args.shard,
+                prefs_per_geometry=args.prefs_per_geometry,
+                sampling=args.sampling,
+                class_quotas=_parse_quotas(args.class_quota),
+                include_physics=args.include_physics,
+            )
+    if args.coverage:
+        print(json.dumps(coverage_metrics(read_dataset(output_file)), indent=2))
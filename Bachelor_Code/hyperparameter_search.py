@@ -0,0 +1,210 @@
+# hyperparameter_search.py
+"""
+Time-budgeted hyperparameter search with successive halving
+
+For every candidate model, N random configurations from its search space
+(SEARCH_SPACES; the current defaults are always configuration 0) are trained
+with a small number of trees / boosting rounds and scored on a validation
+split. Only the best 1/ETA survive to the next rung, where the resource grows
+by ETA, until one configuration remains or the maximum resource is reached.
+Weak configurations therefore cost only the cheapest rung.
+
+XGBoost, LightGBM and CatBoost use their native early stopping on the
+validation split, so a rung never trains more rounds than help; the number
+of rounds the winner actually used becomes its n_estimators. Random Forest has
+no early stopping and uses the number of trees as its resource.
+
+The search stops at the wall-clock budget (no new trial starts after it):
+each model gets an equal share of the remaining time, and a model that runs
+out keeps the best configuration of the highest rung it reached. A model also
+stops early once all survivors early-stopped below the current resource.
+"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+
+from training_scheduler import set_thread_budget
+
+ETA = 3                      # keep the best 1/ETA per rung, grow the resource by ETA
+N_CONFIGS = 27               # configurations in the first rung
+EARLY_STOPPING_ROUNDS = 30
+
+# Largest n_estimators per model (resource of the last rung)
+MAX_ESTIMATORS = {
+    "Random Forest": 400,
+    "XGBoost": 1000,
+    "LightGBM": 1000,
+    "CatBoost": 1000,
+}
+
+# Per-model search spaces: list = choice, ("log"|"uniform"|"int", low, high) = range
+SEARCH_SPACES = {
+    "Random Forest": {
+        "max_depth": [None, 8, 12, 16, 24],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": ["sqrt", 0.5, 0.8],
+    },
+    "XGBoost": {
+        "learning_rate": ("log", 0.02, 0.3),
+        "max_depth": ("int", 3, 10),
+        "min_child_weight": ("log", 1.0, 10.0),
+        "subsample": ("uniform", 0.6, 1.0),
+        "colsample_bytree": ("uniform", 0.6, 1.0),
+        "reg_lambda": ("log", 0.1, 10.0),
+    },
+    "LightGBM": {
+        "learning_rate": ("log", 0.02, 0.3),
+        "num_leaves": ("int", 15, 255),
+        "min_child_samples": ("int", 5, 100),
+        "subsample": ("uniform", 0.6, 1.0),
+        "subsample_freq": [1],
+        "colsample_bytree": ("uniform", 0.6, 1.0),
+        "reg_lambda": ("log", 0.1, 10.0),
+    },
+    "CatBoost": {
+        "learning_rate": ("log", 0.02, 0.3),
+        "depth": ("int", 4, 10),
+        "l2_leaf_reg": ("log", 1.0, 10.0),
+    },
+}
+
+
+def sample_config(space: Dict[str, Any], rng: np.random.Generator) -> Dict[str, Any]:
+    config = {}
+    for param, spec in space.items():
+        if isinstance(spec, list):
+            config[param] = spec[rng.integers(0, len(spec))]
+        elif spec[0] == "int":
+            config[param] = int(rng.integers(spec[1], spec[2] + 1))
+        elif spec[0] == "log":
+            config[param] = float(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))))
+        else:
+            config[param] = float(rng.uniform(spec[1], spec[2]))
+    return config
+
+
+def _fit_trial(estimator, X_train, y_train, X_val, y_val) -> Tuple[Any, int]:
+    """Fit with native early stopping where available; returns (fitted, rounds used)."""
+    module = type(estimator).__module__
+    n_estimators = estimator.get_params()["n_estimators"]
+    if module.startswith("xgboost"):
+        estimator.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        estimator.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        return estimator, int(estimator.best_iteration) + 1
+    if module.startswith("lightgbm"):
+        import lightgbm
+
+        estimator.fit(
+            X_train, y_train, eval_set=[(X_val, y_val)],
+            callbacks=[lightgbm.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)],
+        )
+        return estimator, int(estimator.best_iteration_ or n_estimators)
+    if module.startswith("catboost"):
+        estimator.fit(X_train, y_train, eval_set=(X_val, y_val),
+                      early_stopping_rounds=EARLY_STOPPING_ROUNDS, verbose=False)
+        return estimator, int(estimator.get_best_iteration()) + 1
+    estimator.fit(X_train, y_train)
+    return estimator, n_estimators
+
+
+def successive_halving(
+    name: str,
+    base_estimator,
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_val: np.ndarray,
+    y_val: np.ndarray,
+    deadline: float,
+    n_configs: int = N_CONFIGS,
+    seed: int = 42,
+    n_threads: Optional[int] = None,
+    logger=None,
+) -> Dict[str, Any]:
+    """Successive halving for one model; returns the best configuration and the rung log."""
+    rng = np.random.default_rng(seed)
+    space = SEARCH_SPACES.get(name, {})
+    configs = [{}] + [sample_config(space, rng) for _ in range(n_configs - 1)] if space else [{}]
+    n_rungs = max(1, math.ceil(math.log(len(configs), ETA)) + 1)
+    max_resource = MAX_ESTIMATORS.get(name, base_estimator.get_params().get("n_estimators", 100))
+
+    best = None
+    rungs = []
+    trials = 0
+    for rung in range(n_rungs):
+        resource = max(10, int(max_resource / ETA ** (n_rungs - 1 - rung)))
+        scored = []
+        for config in configs:
+            if time.perf_counter() >= deadline:
+                break
+            estimator = clone(base_estimator).set_params(**config, n_estimators=resource)
+            if n_threads:
+                set_thread_budget(estimator, n_threads)
+            estimator, rounds = _fit_trial(estimator, X_train, y_train, X_val, y_val)
+            score = f1_score(y_val, estimator.predict(X_val), average="macro", zero_division=0)
+            scored.append((score, rounds, config))
+            trials += 1
+        if not scored:
+            break
+
+        scored.sort(key=lambda t: -t[0])
+        rungs.append({
+            "n_estimators": resource,
+            "configs": len(configs),
+            "completed": len(scored),
+            "best_f1_macro": float(scored[0][0]),
+        })
+        # Results of the highest rung reached win over better scores on fewer trees
+        best = {"params": scored[0][2], "n_estimators": scored[0][1], "val_f1_macro": float(scored[0][0])}
+        if logger:
+            logger.info(f"  {name} rung {rung}: {len(scored)}/{len(configs)} configs at "
+                        f"n_estimators={resource}, best F1-macro {scored[0][0]:.4f}")
+        if len(scored) < len(configs) or len(configs) == 1:
+            break
+        survivors = scored[:max(1, len(configs) // ETA)]
+        if all(rounds < resource for _, rounds, _ in survivors):
+            # Every survivor early-stopped below this resource; more rounds change nothing
+            break
+        configs = [config for _, _, config in survivors]
+
+    return {**(best or {"params": {}, "n_estimators": None, "val_f1_macro": None}),
+            "trials": trials, "rungs": rungs}
+
+
+def search_hyperparameters(
+    models: Dict[str, Any],
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_val: np.ndarray,
+    y_val: np.ndarray,
+    time_budget_s: float,
+    n_configs: int = N_CONFIGS,
+    seed: int = 42,
+    n_threads: Optional[int] = None,
+    logger=None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Successive halving for every model within one wall-clock budget.
+
+    Each model gets an equal share of the time that is left when its search
+    starts. Returns {name: {"params", "n_estimators", "val_f1_macro",
+    "trials", "rungs", "seconds"}}.
+    """
+    end = time.perf_counter() + time_budget_s
+    results = {}
+    names: List[str] = list(models)
+    for i, name in enumerate(names):
+        start = time.perf_counter()
+        share = max(0.0, end - start) / (len(names) - i)
+        if logger:
+            logger.info(f"Searching {name} ({share:.0f} s budget)")
+        results[name] = successive_halving(
+            name, models[name], X_train, y_train, X_val, y_val,
+            deadline=start + share, n_configs=n_configs, seed=seed, n_threads=n_threads, logger=logger,
+        )
+        results[name]["seconds"] = time.perf_counter() - start
+    return results
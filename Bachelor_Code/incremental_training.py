@@ -0,0 +1,193 @@
+# incremental_training.py
+"""
+Warm-start retraining of the saved connection classifier on appended data
+
+A full run of train_connection_classifier.py records the row hashes of its
+training and test split next to the model (ROWS_FILE). This script compares
+the current dataset against them and trains only on rows that are new or
+changed since then:
+    - XGBoost / LightGBM / CatBoost continue boosting from the saved booster
+    - Random Forest adds trees (warm_start) grown on the new rows
+    - a soft-voting ensemble updates every member and keeps its weights
+The fitted preprocessing is reused unchanged.
+
+Guard: old and updated model are scored on the fixed holdout (the test split
+of the last full training). If macro F1 drops by more than the tolerance, or
+the new rows cannot be used for a warm start (a class is missing from them,
+unknown labels), a full retrain runs instead, with the options of the run that
+produced the saved model (encoding, ensemble weights, CV, SLOs, compression).
+
+    python incremental_training.py --dataset synthetic_SHC_dataset.csv
+"""
+
+import argparse
+import copy
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.pipeline import Pipeline
+
+import train_connection_classifier as training
+from booster_classifier import BoosterClassifier
+from dataset_schema import content_hash, deduplicate, read_dataset, row_hashes
+
+# Trees / boosting rounds added per update (more overfit small increments; the guard catches it)
+INCREMENTAL_ESTIMATORS = 10
+# Largest holdout macro-F1 drop accepted before falling back to a full retrain
+REGRESSION_TOLERANCE = 0.005
+
+
+def continue_estimator(estimator, X, y, extra: int):
+    """Copy of a fitted estimator with `extra` trees / rounds trained on (X, y)."""
+    module = type(estimator).__module__
+    if module.startswith("xgboost"):
+        updated = clone(estimator).set_params(n_estimators=extra)
+        updated.fit(X, y, xgb_model=estimator.get_booster(), verbose=False)
+        return updated
+    if module.startswith("lightgbm"):
+        updated = clone(estimator).set_params(n_estimators=extra)
+        updated.fit(X, y, init_model=estimator.booster_)
+        return updated
+    if module.startswith("catboost"):
+        updated = clone(estimator).set_params(n_estimators=extra)
+        updated.fit(X, y, init_model=estimator, verbose=False)
+        return updated
+    if isinstance(estimator, BoosterClassifier):
+        updated = clone(estimator).set_params(num_boost_round=extra)
+        updated.fit(X, y, init_model=estimator.booster)
+        return updated
+    if hasattr(estimator, "warm_start"):
+        updated = copy.deepcopy(estimator)
+        updated.set_params(warm_start=True, n_estimators=estimator.n_estimators + extra)
+        updated.fit(X, y)
+        updated.set_params(warm_start=False)
+        return updated
+    raise TypeError(f"No warm start for {type(estimator).__name__}")
+
+
+def update_pipeline(pipeline: Pipeline, X, y, n_classes: int, extra: int) -> Pipeline:
+    """Warm-start the model of a saved (preprocess, model) pipeline on new raw rows."""
+    preprocessor = pipeline.steps[0][1]
+    name, model = pipeline.steps[-1]
+    Xt = preprocessor.transform(X)
+    if hasattr(model, "named_estimators_"):
+        fitted = {member: continue_estimator(est, Xt, y, extra) for member, est in model.named_estimators_.items()}
+        model = training.build_prefit_voting(fitted, np.arange(n_classes), weights=model.weights)
+    else:
+        model = continue_estimator(model, Xt, y, extra)
+    return Pipeline(steps=[(pipeline.steps[0][0], preprocessor), (name, model)])
+
+
+def retrain_options(meta: dict) -> dict:
+    """Options of the training run that produced the saved model, to repeat it in a full retrain."""
+    if "training_options" in meta:
+        return dict(meta["training_options"])
+    # Metadata written before the options were recorded
+    options = {}
+    if "categorical_encoding" in meta:
+        options["categorical_encoding"] = meta["categorical_encoding"]
+    if meta.get("slo"):
+        options["slo"] = meta["slo"]
+    if "compression" in meta:
+        options["compress_tolerance"] = meta["compression"]["tolerance"]
+    return options
+
+
+def main(
+    dataset_path: Path = training.DATASET_PATH,
+    extra_estimators: int = INCREMENTAL_ESTIMATORS,
+    tolerance: float = REGRESSION_TOLERANCE,
+):
+    logger, log_file = training.setup_logging()
+    model_path = training.MODEL_DIR / "connection_classifier.pkl"
+    meta_path = training.MODEL_DIR / "connection_classifier_meta.pkl"
+    rows_path = training.MODEL_DIR / training.ROWS_FILE
+    if not (model_path.exists() and meta_path.exists() and rows_path.exists()):
+        logger.info("No previous model with row hashes found; running a full training")
+        return training.main(dataset_path=dataset_path)
+
+    start_time = time.time()
+    pipeline = joblib.load(model_path)
+    meta = joblib.load(meta_path)
+    rows = np.load(rows_path)
+
+    df, duplicate_rows = deduplicate(read_dataset(dataset_path))
+    df, _, _ = training.clean_dataset(df)
+    features = meta["features"]
+    hashes = row_hashes(df[features + ["label"]])
+    in_holdout = np.isin(hashes, rows["holdout"])
+    is_new = ~np.isin(hashes, rows["train"]) & ~in_holdout
+    logger.info(f"Dataset: {len(df)} rows ({duplicate_rows} duplicates dropped), "
+                f"{int(is_new.sum())} new or changed, holdout {int(in_holdout.sum())} of {len(rows['holdout'])}")
+    if not is_new.any():
+        logger.info("No new rows since the last training; model unchanged")
+        return
+
+    classes = list(meta["classes"])
+    labels = df["label"].astype(str)
+    unknown = set(labels[is_new]) - set(classes)
+    if unknown or set(labels[is_new]) != set(classes) or not in_holdout.any():
+        reason = (f"unknown labels {sorted(unknown)}" if unknown else
+                  "new rows do not cover every class" if in_holdout.any() else "holdout rows missing")
+        logger.warning(f"Warm start not possible ({reason}); running a full retrain")
+        return training.main(dataset_path=dataset_path, **retrain_options(meta))
+
+    y = labels.map({label: idx for idx, label in enumerate(classes)}).to_numpy()
+    X = df[features]
+    X_hold, y_hold = X[in_holdout], y[in_holdout]
+
+    f1_before = f1_score(y_hold, pipeline.predict(X_hold), average="macro", zero_division=0)
+    update_start = time.time()
+    try:
+        updated = update_pipeline(pipeline, X[is_new], y[is_new], len(classes), extra_estimators)
+    except (TypeError, ValueError) as exc:
+        # Estimators without a warm-start path (or saved without what it needs)
+        logger.warning(f"Warm start not possible ({exc}); running a full retrain")
+        return training.main(dataset_path=dataset_path, **retrain_options(meta))
+    update_time = time.time() - update_start
+    metrics_after = training.holdout_metrics(y_hold, updated.predict(X_hold))
+    f1_after = metrics_after["f1_macro"]
+    logger.info(f"Warm start of {meta['best_model']} on {int(is_new.sum())} rows took {update_time:.2f} s; "
+                f"holdout F1-macro {f1_before:.4f} -> {f1_after:.4f}")
+
+    if f1_after < f1_before - tolerance:
+        logger.warning(f"Holdout F1-macro dropped by more than {tolerance}; running a full retrain")
+        return training.main(dataset_path=dataset_path, **retrain_options(meta))
+
+    # Same holdout metrics as a full training writes, all describing the updated model
+    meta["best_metrics"].update(metrics_after)
+    meta["dataset_sha256"] = content_hash(df)
+    meta.setdefault("incremental_updates", []).append({
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "new_rows": int(is_new.sum()),
+        "extra_estimators": int(extra_estimators),
+        "holdout_f1_macro_before": float(f1_before),
+        "holdout_f1_macro_after": float(f1_after),
+        "seconds": float(time.time() - start_time),
+    })
+    joblib.dump(updated, model_path)
+    joblib.dump(meta, meta_path)
+    np.savez(rows_path, train=np.concatenate([rows["train"], hashes[is_new]]), holdout=rows["holdout"])
+    logger.info(f"Saved updated model to {model_path}")
+    logger.info(f"Log file: {log_file}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=training.DATASET_PATH,
+                        help="CSV file, compact .parquet file or Parquet part directory")
+    parser.add_argument("--extra-estimators", type=int, default=INCREMENTAL_ESTIMATORS,
+                        help="trees / boosting rounds added per model")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="accepted holdout macro-F1 drop before a full retrain")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(dataset_path=args.dataset, extra_estimators=args.extra_estimators, tolerance=args.tolerance)
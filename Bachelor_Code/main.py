@@ -1,12 +1,20 @@
 # main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
-from make_prediction import select_shaft_connection
-from model_service import predict_connection
+from make_prediction import select_shaft_connection, SelectionInputError
+from ml_batcher import predict_connection_async, get_batcher
 
-app = FastAPI(title="Shaft Connection Selector API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Answer the predictions still queued for a micro-batch before the worker stops
+    await get_batcher().close()
+
+
+app = FastAPI(title="Shaft Connection Selector API", lifespan=lifespan)
 
 # CORS middleware to allow React frontend to connect
 # Can be configured via environment variable CORS_ORIGINS (comma-separated)
@@ -93,6 +101,11 @@ class ConnectionResult(BaseModel):
 async def root():
     return {"message": "Shaft Connection Selector API"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """ML micro-batching metrics (queue time and batch size)."""
+    return {"ml_batching": get_batcher().metrics()}
+
 @app.get("/materials")
 async def get_materials():
     from make_prediction import materials
@@ -126,7 +139,7 @@ def _assemble_ml_features(request: ShaftConnectionRequest) -> Dict[str, Any]:
 async def select_connection(request: ShaftConnectionRequest):
     try:
         result = select_shaft_connection(request)
-        ml_prediction = predict_connection(_assemble_ml_features(request))
+        ml_prediction = await predict_connection_async(_assemble_ml_features(request))
         if ml_prediction:
             # Ensure label is a valid connection type string
             label = ml_prediction.get("label")
@@ -141,6 +154,8 @@ async def select_connection(request: ShaftConnectionRequest):
             result["ml_recommendation"] = None
             result["ml_probabilities"] = None
         return result
+    except SelectionInputError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,5 +1,6 @@
 # make_prediction.py
-from fastapi import HTTPException
+# Analytical selection engine. Kept free of FastAPI/pandas so it imports fast
+# and can be used from the dataset generator and analysis scripts as well.
 from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 import math
@@ -11,6 +12,15 @@ import numpy as np
 MARGIN_TIE_BAND = 0.35
 RNG_SEED_DEFAULT = 7
 
+
+class SelectionInputError(ValueError):
+    """Invalid selection request; the API maps it to an HTTP error response."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
 # -----------------------
 # Materials & allowables
 # -----------------------
@@ -657,6 +667,13 @@ def calculate_hub_stiffness_factor(d_mm: float, DaA_mm: Optional[float]) -> floa
 # -----------------------
 # Scoring
 # -----------------------
+SCORE_WEIGHTS = {
+    "margin":       0.10,
+    "prefs":        0.70,
+    "overkill":     0.10,
+    "hub_stiffness": 0.10,
+}
+
 def score_candidate(
     conn: str,
     Mt_cap: float,
@@ -665,12 +682,7 @@ def score_candidate(
     L_mm: float,
     prefs: UserPrefs,
     DaA_mm: Optional[float] = None,
-    weights = {
-        "margin":       0.10,
-        "prefs":        0.70,
-        "overkill":     0.10,
-        "hub_stiffness": 0.10,
-    },
+    weights = SCORE_WEIGHTS,
     margin_cap: float = 0.35
 ) -> float:
     # 1) Margin reward (diminishing)
@@ -732,15 +744,15 @@ def calculate_required_torque(d_mm: float, shaft_mat_name: str, torque_coefficie
 def select_shaft_connection(request) -> Dict[str, Any]:
     # Validate enums/materials
     if request.shaft_material not in materials:
-        raise HTTPException(status_code=400, detail=f"Invalid shaft material: {request.shaft_material}")
+        raise SelectionInputError(f"Invalid shaft material: {request.shaft_material}")
     if request.hub_material not in materials:
-        raise HTTPException(status_code=400, detail=f"Invalid hub material: {request.hub_material}")
+        raise SelectionInputError(f"Invalid hub material: {request.hub_material}")
     if request.shaft_type not in ["solid", "hollow"]:
-        raise HTTPException(status_code=400, detail="Shaft type must be 'solid' or 'hollow'")
+        raise SelectionInputError("Shaft type must be 'solid' or 'hollow'")
 
     # REQUIRED torque
     if request.required_torque is None:
-        raise HTTPException(status_code=400, detail="required_torque is mandatory")
+        raise SelectionInputError("required_torque is mandatory")
     M_req = float(request.required_torque)
 
     # User preferences
@@ -890,3 +902,298 @@ def select_shaft_connection(request) -> Dict[str, Any]:
         "input_parameters": request.dict(),
         "details": {"press": pf, "key": key, "spline": spline, "feasible_flags": feasible_flags},
     }
+
+
+# -----------------------
+# Vectorized batch selection (dataset generation)
+# -----------------------
+# Same equations as select_shaft_connection, evaluated on NumPy columns so the
+# dataset generator can label many samples without building per-row request
+# objects. Results match the scalar path row for row.
+CONNECTION_TYPES = ("press", "key", "spline")
+
+# UserPrefs field -> CONN_PROFILE key, in the summation order of score_candidate
+PREF_PROFILE_KEYS = {
+    "ease":          "assembly/disassembly_ease",
+    "movement":      "movement_ease",
+    "cost":          "manufacturing_cost",
+    "bidirectional": "bidirectional",
+    "vibration":     "vibration_resistance",
+    "speed":         "high_speed_suitability",
+    "maintenance":   "maintenance_ease",
+    "durability":    "durability",
+}
+
+
+def _material_column(names: np.ndarray, fn) -> np.ndarray:
+    """Map a column of material names through fn(material_dict) -> float."""
+    uniq, inverse = np.unique(np.asarray(names), return_inverse=True)
+    values = np.array([fn(materials[name]) for name in uniq], dtype=float)
+    return values[inverse.reshape(-1)]
+
+
+def _sigma_zul(mat: Dict[str, Any]) -> float:
+    if mat.get("ductile", True):
+        return float(mat["sigma_yield"]) / float(mat.get("SF", 1.2))
+    return float(mat["sigma_uts"]) / float(mat.get("SB", 2.5))
+
+
+def mu_for_batch(
+    shaft_mats: np.ndarray,
+    hub_mats: np.ndarray,
+    surface_conditions: np.ndarray,
+    overrides: np.ndarray,
+) -> np.ndarray:
+    """Column version of mu_for with the fixed RNG_SEED_DEFAULT stream of select_shaft_connection."""
+    combos = np.char.add(np.char.add(np.asarray(shaft_mats, dtype=str), "|"),
+                         np.char.add(np.asarray(hub_mats, dtype=str), "|"))
+    combos = np.char.add(combos, np.asarray(surface_conditions, dtype=str))
+    uniq, inverse = np.unique(combos, return_inverse=True)
+    table = np.array([
+        mu_for(np.random.default_rng(RNG_SEED_DEFAULT), *combo.split("|"))
+        for combo in uniq
+    ], dtype=float)
+    mu = table[inverse.reshape(-1)]
+
+    overrides = np.asarray(overrides, dtype=float)
+    has_override = ~np.isnan(overrides)
+    mu[has_override] = np.clip(overrides[has_override], 0.05, 0.25)
+    return mu
+
+
+def key_geometry_from_d_batch(d_mm: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    d_mm = np.asarray(d_mm, dtype=float)
+    b = np.full(d_mm.shape, float(key_table[-1]["b"]))
+    h = np.full(d_mm.shape, float(key_table[-1]["h"]))
+    unassigned = np.ones(d_mm.shape, dtype=bool)
+    for row in key_table:
+        hit = unassigned & (row["d_min"] <= d_mm) & (d_mm <= row["d_max"])
+        b[hit] = float(row["b"])
+        h[hit] = float(row["h"])
+        unassigned &= ~hit
+    return b, h
+
+
+def spline_geometry_from_d_batch(d_mm: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Column version of spline_geometry_from_d_lookup -> (z, h_proj, D)."""
+    d_mm = np.asarray(d_mm, dtype=float)
+
+    # DIN 5480-like fallback for diameters beyond the table
+    modules = np.asarray(_DIN5480_MODULES)
+    m_target = np.clip(d_mm / 35.0, 0.5, 10.0)
+    m = modules[np.argmin(np.abs(modules[None, :] - m_target[:, None]), axis=1)]
+    z = np.clip(np.round(d_mm / m), 18, 80).astype(float)
+    h_proj = 2.25 * m
+    D = d_mm + 2.0 * h_proj
+
+    unassigned = np.ones(d_mm.shape, dtype=bool)
+    for row in spline_table:
+        hit = unassigned & (d_mm <= row["d_max"])
+        z[hit] = row["N"]
+        D[hit] = row["D"]
+        h_proj[hit] = 0.5 * (row["D"] - d_mm[hit])
+        unassigned &= ~hit
+    return z, h_proj, D
+
+
+def hub_stiffness_factor_batch(d_mm: np.ndarray, DaA_mm: np.ndarray) -> np.ndarray:
+    d_mm = np.asarray(d_mm, dtype=float)
+    DaA_mm = np.asarray(DaA_mm, dtype=float)
+    QA = d_mm / DaA_mm
+    factor = np.select(
+        [QA < 0.5, QA < 0.6, QA < 0.7, QA < 0.8],
+        [1.0, 0.85, 0.60, 0.30],
+        default=0.10,
+    )
+    return np.where(np.isnan(DaA_mm) | (DaA_mm <= d_mm), 0.5, factor)
+
+
+def score_candidate_batch(
+    conn: str,
+    Mt_cap: np.ndarray,
+    M_req: np.ndarray,
+    d_mm: np.ndarray,
+    prefs: Dict[str, np.ndarray],
+    DaA_mm: np.ndarray,
+    weights = SCORE_WEIGHTS,
+    margin_cap: float = 0.35,
+) -> np.ndarray:
+    """Column version of score_candidate; prefs maps UserPrefs field names to columns."""
+    # 1) Margin reward (diminishing) and overkill penalty
+    margin_raw = np.maximum(0.0, (Mt_cap - M_req) / np.maximum(M_req, 1e-6))
+    margin_useful = np.minimum(margin_raw, margin_cap) / margin_cap
+    s_margin = weights["margin"] * margin_useful
+
+    overkill = np.maximum(0.0, margin_raw - margin_cap)
+    overkill_capped = np.minimum(overkill, 0.5)
+    s_overkill = -weights["overkill"] * overkill_capped
+
+    # 2) Preferences
+    prof = CONN_PROFILE[conn]
+    pref_sum = prefs["ease"]
+    pref_dot = prefs["ease"] * prof.get(PREF_PROFILE_KEYS["ease"], 0.0)
+    for field in ("movement", "cost", "bidirectional", "vibration", "speed", "maintenance", "durability"):
+        pref_sum = pref_sum + prefs[field]
+        pref_dot = pref_dot + prefs[field] * prof.get(PREF_PROFILE_KEYS[field], 0.0)
+    norm = np.where(pref_sum > 1e-9, pref_sum, 1.0)
+    s_prefs = weights["prefs"] * (pref_dot / norm)
+
+    # 3) Hub stiffness penalty (press only)
+    s_hub_stiffness = 0.0
+    if conn == "press":
+        hub_factor = hub_stiffness_factor_batch(d_mm, DaA_mm)
+        s_hub_stiffness = weights["hub_stiffness"] * (hub_factor - 1.0)
+
+    # 4) Spline practicality penalty
+    spline_practicality = 0.0
+    if conn == "spline":
+        spline_pref_intensity = (prefs["movement"] + prefs["bidirectional"] + prefs["durability"]) / 3.0
+        spline_practicality = -0.2 * np.maximum(0.0, 1.0 - spline_pref_intensity)
+
+    raw_score = s_margin + s_overkill + s_prefs + s_hub_stiffness + spline_practicality
+    return np.maximum(raw_score, -0.15)
+
+
+def evaluate_capacities_batch(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Everything of the batch selection that does not depend on user preferences.
+
+    Args:
+        cols: equal-length columns named like the dataset: shaft_diameter,
+            hub_length, shaft_material, hub_material, shaft_type,
+            required_torque, safety_factor, surface_condition, mu_override
+            (NaN = none), hub_outer_diameter (NaN = 2*d), shaft_inner_diameter
+            (NaN for solid shafts) and optional surface_roughness_shaft/hub.
+            Spline geometry overrides are not supported.
+
+    Returns:
+        Columns cap_<type> (capacities in Nmm), feasible_<type>, M_design_Nmm,
+        mu_used, p_erf_MPa, p_zul_MPa, Uw_mm, press_interference_ok and the
+        d_mm / DaA_mm geometry used for scoring.
+    """
+    shaft_mat = np.asarray(cols["shaft_material"])
+    hub_mat = np.asarray(cols["hub_material"])
+    for names, what in ((shaft_mat, "shaft"), (hub_mat, "hub")):
+        unknown = set(np.unique(names).tolist()) - set(materials)
+        if unknown:
+            raise SelectionInputError(f"Invalid {what} material: {sorted(unknown)[0]}")
+    shaft_type = np.asarray(cols["shaft_type"])
+    if not np.isin(shaft_type, ["solid", "hollow"]).all():
+        raise SelectionInputError("Shaft type must be 'solid' or 'hollow'")
+
+    d = np.asarray(cols["shaft_diameter"], dtype=float)
+    n = d.shape[0]
+    L = np.asarray(cols["hub_length"], dtype=float)
+    M_req = np.asarray(cols["required_torque"], dtype=float)
+    S_R = np.asarray(cols["safety_factor"], dtype=float)
+    hollow = shaft_type == "hollow"
+    DaA = np.asarray(cols["hub_outer_diameter"], dtype=float)
+    DaA = np.where(np.isnan(DaA), 2.0 * d, DaA)
+    DiI = np.asarray(cols["shaft_inner_diameter"], dtype=float)
+    Rz_shaft = np.asarray(cols.get("surface_roughness_shaft", np.full(n, 12.0)), dtype=float)
+    Rz_hub = np.asarray(cols.get("surface_roughness_hub", np.full(n, 12.0)), dtype=float)
+
+    mu = mu_for_batch(shaft_mat, hub_mat, cols["surface_condition"], cols["mu_override"])
+
+    # Press fit (rows whose geometry is invalid get zero capacity, as in the scalar path)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        press_valid = (d > 0) & (L > 0) & (mu > 0) & (S_R > 0) & (DaA > d)
+        press_valid &= ~hollow | ((DiI > 0.0) & (DiI < d))
+        QA = d / DaA
+        QI = np.where(hollow, DiI / d, 0.0)
+
+        p_erf = (2.0 * M_req * S_R) / (math.pi * mu * (d ** 2) * L)
+        p_hub = ((1.0 - QA**2) / math.sqrt(3.0)) * _material_column(hub_mat, _sigma_zul)
+        p_shaft = (2.0 / math.sqrt(3.0)) * _material_column(shaft_mat, _sigma_zul)
+        p_shaft = np.where(hollow, p_shaft * (1.0 - QI**2), p_shaft)
+        p_zul = np.minimum(p_shaft, p_hub)
+        Mt_press = (math.pi * mu * p_zul * L * (d ** 2)) / 2.0
+
+        E_I = _material_column(shaft_mat, lambda m: float(m["E"]))
+        nu_I = _material_column(shaft_mat, lambda m: float(m["nu"]))
+        E_A = _material_column(hub_mat, lambda m: float(m["E"]))
+        nu_A = _material_column(hub_mat, lambda m: float(m["nu"]))
+        Ue = p_erf * d * (((1.0 + nu_I) / E_I) / (1.0 - QI**2) + ((1.0 + nu_A) / E_A) / (1.0 - QA**2))
+    Uw = Ue - 0.4 * (Rz_shaft + Rz_hub) / 1000.0
+    Uw_limit = np.where(d <= 50.0, 0.02, 0.05)
+    press_ok = press_valid & (Uw > 0.0) & (Uw <= Uw_limit)
+    Mt_press = np.where(press_valid, Mt_press, 0.0)
+
+    # Key (DIN 6885-like table)
+    b_key, h_key = key_geometry_from_d_batch(d)
+    tau_allow = _material_column(shaft_mat, lambda m: float(m["tau_allow_key"]))
+    p_key = np.minimum(_material_column(shaft_mat, lambda m: float(m["p_allow_key"])),
+                       _material_column(hub_mat, lambda m: float(m["p_allow_key"])))
+    r = 0.5 * d
+    Mt_key = np.minimum(tau_allow * (b_key * L) * r, p_key * ((h_key / 2.0) * L) * r)
+
+    # Spline
+    z, h_proj, D_spline = spline_geometry_from_d_batch(d)
+    p_spline = np.minimum(_material_column(shaft_mat, lambda m: float(m["p_allow_spline"])),
+                          _material_column(hub_mat, lambda m: float(m["p_allow_spline"])))
+    r_m = 0.25 * (d + D_spline)
+    Mt_spline = 0.75 * L * z * h_proj * r_m * p_spline
+
+    M_design = M_req * S_R
+    out = {
+        "d_mm": d,
+        "DaA_mm": DaA,
+        "M_design_Nmm": M_design,
+        "mu_used": mu,
+        "p_erf_MPa": np.where(press_valid, p_erf, np.nan),
+        "p_zul_MPa": np.where(press_valid, p_zul, np.nan),
+        "Uw_mm": np.where(press_valid, Uw, np.nan),
+        "press_interference_ok": press_ok,
+        "cap_press": Mt_press,
+        "cap_key": Mt_key,
+        "cap_spline": Mt_spline,
+        "feasible_press": (Mt_press >= M_design) & press_ok,
+        "feasible_key": Mt_key >= M_design,
+        "feasible_spline": Mt_spline >= M_design,
+    }
+    return out
+
+
+def score_connections_batch(capacities: Dict[str, np.ndarray], prefs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Score and pick the connection for capacity rows from evaluate_capacities_batch.
+
+    prefs maps UserPrefs field names to columns of the same length as the
+    capacity columns.
+
+    Returns:
+        Columns recommended_connection ("press"/"key"/"spline"/"none"),
+        feasible and score_<type> (NaN when the type is infeasible).
+    """
+    scores = {}
+    for conn in CONNECTION_TYPES:
+        s = score_candidate_batch(
+            conn, capacities[f"cap_{conn}"], capacities["M_design_Nmm"],
+            capacities["d_mm"], prefs, capacities["DaA_mm"],
+        )
+        scores[conn] = np.where(capacities[f"feasible_{conn}"], s, np.nan)
+
+    # argmax keeps the first maximum, like max() over the press/key/spline dict
+    flags = np.stack([capacities[f"feasible_{c}"] for c in CONNECTION_TYPES], axis=1)
+    stacked = np.where(flags, np.stack([scores[c] for c in CONNECTION_TYPES], axis=1), -np.inf)
+    feasible = flags.any(axis=1)
+    best = np.asarray(CONNECTION_TYPES, dtype=object)[np.argmax(stacked, axis=1)]
+    best[~feasible] = "none"
+
+    out = {"recommended_connection": best, "feasible": feasible}
+    for conn in CONNECTION_TYPES:
+        out[f"score_{conn}"] = scores[conn]
+    return out
+
+
+def select_shaft_connection_batch(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized select_shaft_connection for the dataset generator.
+
+    cols holds the columns described in evaluate_capacities_batch plus
+    pref_<criterion> for the 8 UserPrefs criteria. Returns the columns of
+    evaluate_capacities_batch and score_connections_batch.
+    """
+    capacities = evaluate_capacities_batch(cols)
+    prefs = {field: np.asarray(cols[f"pref_{field}"], dtype=float) for field in PREF_PROFILE_KEYS}
+    return {**capacities, **score_connections_batch(capacities, prefs)}
@@ -0,0 +1,185 @@
+"""
+Dynamic micro-batching for ML predictions
+
+Concurrent API requests each need one row scored by the connection classifier.
+Tree ensembles are far cheaper per row when scored together, so this module
+collects pending feature vectors for a short window (or until the batch is
+full), runs a single ``predict_connection_batch`` call and hands every caller
+its own row back.
+
+The window adapts to load: when requests arrive further apart than the maximum
+window there is nobody to wait for and the row is scored immediately; under
+load the batcher waits roughly as long as it takes to fill the batch, capped at
+``ML_BATCH_MAX_WAIT_MS``.
+
+Every caller gets an answer: if the batch call fails (or returns the wrong
+number of rows) all rows of that batch resolve to None, like a failed
+``predict_connection``. ``close()`` scores the rows already queued before the
+worker stops (the API calls it on shutdown).
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import model_service
+
+MAX_WAIT_MS = float(os.getenv("ML_BATCH_MAX_WAIT_MS", "5"))
+MAX_BATCH_SIZE = max(1, int(os.getenv("ML_BATCH_MAX_SIZE", "64")))
+METRICS_WINDOW = 1000  # number of recent samples kept for the metrics summary
+# Queued by close(): the worker scores everything queued before it and exits
+_STOP = object()
+
+
+def _summary(values) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    n = len(ordered)
+    return {
+        "count": n,
+        "mean": float(sum(ordered) / n),
+        "p50": float(ordered[int(0.50 * (n - 1))]),
+        "p99": float(ordered[int(0.99 * (n - 1))]),
+        "max": float(ordered[-1]),
+    }
+
+
+class MicroBatcher:
+    """Collects single-row prediction requests and scores them in batches."""
+
+    def __init__(self, max_wait_ms: float = MAX_WAIT_MS, max_batch_size: int = MAX_BATCH_SIZE):
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # EWMA of request inter-arrival time drives the adaptive window
+        self._last_arrival: Optional[float] = None
+        self._interarrival_s = self.max_wait_s
+        # Recent samples for the metrics endpoint
+        self._queue_times_ms = deque(maxlen=METRICS_WINDOW)
+        self._batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self._batches_total = 0
+        self._rows_total = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        # (Re)start the worker on first use or when the event loop changed (tests, reloads)
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+
+    def _record_arrival(self, now: float) -> None:
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            self._interarrival_s = 0.8 * self._interarrival_s + 0.2 * gap
+        self._last_arrival = now
+
+    def _window_s(self, pending: int) -> float:
+        """How long to keep collecting given the current arrival rate."""
+        if self._interarrival_s >= self.max_wait_s:
+            # Light load: the next request is not expected within the window
+            return 0.0
+        remaining = self.max_batch_size - pending
+        return min(self.max_wait_s, self._interarrival_s * remaining)
+
+    async def predict(self, features: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Queue one feature dictionary and wait for its prediction."""
+        self._ensure_worker()
+        now = time.perf_counter()
+        self._record_arrival(now)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, future, now))
+        return await future
+
+    async def close(self) -> None:
+        """Score the rows queued so far, then stop the worker (a later predict starts a new one)."""
+        worker, queue = self._worker, self._queue
+        if worker is None or worker.done():
+            return
+        # New requests go to a fresh queue and worker; the old worker drains its queue up to the sentinel
+        self._worker = self._queue = None
+        await queue.put(_STOP)
+        await worker
+
+    async def _collect(self, queue: asyncio.Queue) -> List[tuple]:
+        """Next batch of (features, future, enqueued) items; ends at the _STOP sentinel."""
+        batch = [await queue.get()]
+        deadline = time.perf_counter() + self._window_s(len(batch))
+        while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+            # Take whatever is already queued without waiting
+            while not queue.empty() and len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+                batch.append(queue.get_nowait())
+            timeout = deadline - time.perf_counter()
+            if len(batch) >= self.max_batch_size or batch[-1] is _STOP or timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = await self._collect(queue)
+            if batch[-1] is _STOP:
+                stopping = True
+                batch.pop()
+                if not batch:
+                    break
+            dispatched = time.perf_counter()
+            for _, _, enqueued in batch:
+                self._queue_times_ms.append((dispatched - enqueued) * 1000.0)
+            self._batch_sizes.append(len(batch))
+            self._batches_total += 1
+            self._rows_total += len(batch)
+
+            rows = [features for features, _, _ in batch]
+            try:
+                # Scoring runs off the event loop so new requests keep queueing
+                predictions = await loop.run_in_executor(None, model_service.predict_connection_batch, rows)
+            except Exception as e:
+                print(f"Error in micro-batch prediction: {e}")
+                predictions = None
+            if predictions is None or len(predictions) != len(batch):
+                predictions = [None] * len(batch)
+
+            for (_, future, _), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue time and batch size statistics over the recent window."""
+        return {
+            "config": {
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "max_batch_size": self.max_batch_size,
+            },
+            "current_window_ms": self._window_s(1) * 1000.0,
+            "batches_total": self._batches_total,
+            "rows_total": self._rows_total,
+            "queue_time_ms": _summary(self._queue_times_ms),
+            "batch_size": _summary(self._batch_sizes),
+        }
+
+
+_batcher: Optional[MicroBatcher] = None
+
+
+def get_batcher() -> MicroBatcher:
+    """Process-wide batcher used by the API."""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher()
+    return _batcher
+
+
+async def predict_connection_async(features: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Awaitable counterpart of ``model_service.predict_connection``."""
+    return await get_batcher().predict(features)
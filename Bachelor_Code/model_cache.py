@@ -0,0 +1,91 @@
+# model_cache.py
+"""
+Content-addressed cache of fitted candidate models
+
+Rerunning train_connection_classifier.py on an unchanged dataset with
+unchanged model configurations (e.g. after editing only the plotting code)
+used to retrain every candidate. Each fitted candidate is now stored under the
+cache directory, keyed by
+    - the dataset content hash and the numeric / categorical feature lists
+    - the training setup (preprocessing / split key, rows held out from the
+      base models)
+    - the estimator class and its parameters (thread counts excluded)
+    - the versions of Python and the ML libraries (a pickle from another
+      version may load but behave differently)
+An entry holds the fitted estimator, its fit timings and its test-split
+predictions, from which the metrics are reproduced without refitting or
+predicting again.
+"""
+
+import hashlib
+import json
+import platform
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+
+from cross_validation import _RUNTIME_PARAMS
+
+_VERSIONED_PACKAGES = ("numpy", "pandas", "scikit-learn", "xgboost", "lightgbm", "catboost")
+
+
+def library_versions() -> Dict[str, Optional[str]]:
+    """Python and ML library versions that are part of every cache key."""
+    versions = {"python": platform.python_version()}
+    for package in _VERSIONED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def model_cache_key(
+    dataset_sha256: str,
+    numeric: List[str],
+    categorical: List[str],
+    estimator,
+    training_setup: Dict[str, Any],
+) -> str:
+    """Key of a fitted candidate: dataset, features, training setup, estimator params, library versions."""
+    params = {k: v for k, v in estimator.get_params().items() if k not in _RUNTIME_PARAMS}
+    config = {
+        "dataset_sha256": dataset_sha256,
+        "numeric": numeric,
+        "categorical": categorical,
+        "training_setup": training_setup,
+        "model": f"{type(estimator).__module__}.{type(estimator).__name__}",
+        "params": repr(sorted(params.items())),
+        "versions": library_versions(),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _entry_path(cache_dir: Path, key: str) -> Path:
+    return Path(cache_dir) / "models" / f"{key[:16]}.joblib"
+
+
+def load_model(cache_dir: Path, key: str) -> Optional[Dict[str, Any]]:
+    """Cached entry {"estimator", "fit", "y_pred", "key"} or None (missing or unreadable)."""
+    path = _entry_path(cache_dir, key)
+    if not path.exists():
+        return None
+    try:
+        entry = joblib.load(path)
+    except Exception:
+        return None
+    # Guard against a truncated-key collision
+    return entry if entry.get("key") == key else None
+
+
+def store_model(cache_dir: Path, key: str, estimator, fit: Dict[str, Any], y_pred) -> Path:
+    """Write a fitted candidate, its fit timings and test predictions; returns the entry path."""
+    path = _entry_path(cache_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    joblib.dump({"key": key, "estimator": estimator, "fit": fit, "y_pred": y_pred}, tmp)
+    # Atomic so an interrupted run never leaves a half-written entry behind
+    tmp.replace(path)
+    return path
@@ -0,0 +1,387 @@
+# model_compression.py
+"""
+Post-training compression of the selected connection classifier
+
+The selected model can be large: the soft-voting ensemble holds four
+150-tree ensembles, among them a fully grown Random Forest (~20 MB). This
+stage shrinks a fitted (preprocess, model) pipeline step by step and keeps a
+change only while macro F1 stays within `tolerance` of the uncompressed
+model:
+    1. remove weak voters    drop ensemble members, largest first among those
+                             whose removal stays within the tolerance
+    2. drop trees            keep the first k trees / boosting rounds (forest
+                             trees are exchangeable, boosting rounds are cut
+                             from the end)
+    3. limit depth           cut Random Forest trees at a maximum depth; the
+                             cut node predicts its class distribution
+    4. float32 quantization  round LightGBM thresholds and leaf values to
+                             float32 (XGBoost and CatBoost already store
+                             float32 splits; scikit-learn trees have a fixed
+                             float64 layout)
+Within a step the smallest setting that meets the tolerance wins. Every step
+is benchmarked like a training candidate (serving_benchmark: size,
+single-row latency, batch throughput) and the smallest, then fastest,
+pipeline is returned with a per-step report.
+
+(X, y) must be rows none of the models was fitted on and that are not used
+to report the result: training holds out part of its training split, and
+the standalone run below tunes on one half of the holdout rows of the last
+full training (as recorded for incremental_training.py) and reports on the
+other:
+
+    python model_compression.py --tolerance 0.005
+"""
+
+import argparse
+import copy
+import io
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from serving_benchmark import benchmark_candidate
+
+# Largest macro-F1 loss accepted relative to the uncompressed model
+F1_TOLERANCE = 0.005
+# Tree counts tried, as fractions of the current count (smallest first)
+TREE_FRACTIONS = (0.1, 0.2, 0.3, 0.5, 0.75)
+# Maximum depths tried for Random Forest trees (smallest first)
+FOREST_DEPTHS = (6, 8, 10, 12, 14, 16, 20, 25)
+
+_LGB_FLOAT_LINE = re.compile(r"^(threshold|leaf_value)=(.*)$", re.MULTILINE)
+# Byte offsets of every tree in the model string; stale once values are rewritten
+_LGB_TREE_SIZES = re.compile(r"^tree_sizes=.*\n", re.MULTILINE)
+
+
+def _module(estimator) -> str:
+    return type(estimator).__module__
+
+
+def n_trees(estimator) -> Optional[int]:
+    """Number of trees / boosting rounds of a fitted estimator (None if not a tree ensemble)."""
+    module = _module(estimator)
+    if module.startswith("xgboost"):
+        return int(estimator.get_booster().num_boosted_rounds())
+    if module.startswith("lightgbm"):
+        return int(estimator.booster_.current_iteration())
+    if module.startswith("catboost"):
+        return int(estimator.tree_count_)
+    if hasattr(estimator, "estimators_") and not hasattr(estimator, "voting"):
+        return len(estimator.estimators_)
+    return None
+
+
+def keep_trees(estimator, k: int):
+    """Copy of a fitted tree ensemble that keeps only its first k trees / rounds."""
+    module = _module(estimator)
+    if module.startswith("catboost"):
+        trimmed = estimator.copy()
+        # Fitted CatBoost models reject set_params; tree_count_ reflects the shrink
+        trimmed.shrink(ntree_end=k)
+        return trimmed
+    trimmed = copy.copy(estimator)
+    if module.startswith("xgboost"):
+        trimmed._Booster = estimator.get_booster()[:k]
+    elif module.startswith("lightgbm"):
+        import lightgbm as lgb
+
+        trimmed._Booster = lgb.Booster(model_str=estimator.booster_.model_to_string(num_iteration=k))
+        trimmed._n_iter = k
+    else:
+        trimmed.estimators_ = estimator.estimators_[:k]
+    trimmed.set_params(n_estimators=k)
+    return trimmed
+
+
+def _prune_tree(tree, max_depth: int):
+    """sklearn Tree cut at max_depth, with unreachable nodes removed from its arrays."""
+    from sklearn.tree._tree import Tree
+
+    state = tree.__getstate__()
+    nodes = state["nodes"]
+    depth = np.zeros(len(nodes), dtype=np.int64)
+    kept, stack = [], [0]
+    while stack:
+        node = stack.pop()
+        kept.append(node)
+        if depth[node] < max_depth and nodes[node]["left_child"] != -1:
+            for child in (nodes[node]["left_child"], nodes[node]["right_child"]):
+                depth[child] = depth[node] + 1
+                stack.append(child)
+    kept = np.sort(np.asarray(kept))
+    remap = np.full(len(nodes), -1, dtype=np.int64)
+    remap[kept] = np.arange(len(kept))
+
+    pruned = nodes[kept].copy()
+    leaf = (depth[kept] >= max_depth) | (pruned["left_child"] == -1)
+    for field in ("left_child", "right_child"):
+        pruned[field] = np.where(leaf, -1, remap[np.where(leaf, 0, pruned[field])])
+    pruned["feature"] = np.where(leaf, -2, pruned["feature"])
+    pruned["threshold"] = np.where(leaf, -2.0, pruned["threshold"])
+
+    out = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+    out.__setstate__({
+        **state,
+        "max_depth": min(max_depth, state["max_depth"]),
+        "node_count": len(kept),
+        "nodes": pruned,
+        "values": state["values"][kept],
+    })
+    return out
+
+
+def max_depth(estimator) -> Optional[int]:
+    """Deepest tree of a fitted scikit-learn forest (None for other estimators)."""
+    if _module(estimator).startswith("sklearn") and n_trees(estimator):
+        return max(int(tree.tree_.max_depth) for tree in estimator.estimators_)
+    return None
+
+
+def limit_depth(estimator, depth: int):
+    """Copy of a fitted scikit-learn forest with every tree cut at `depth`."""
+    limited = copy.copy(estimator)
+    limited.estimators_ = []
+    for tree in estimator.estimators_:
+        tree = copy.copy(tree)
+        tree.tree_ = _prune_tree(tree.tree_, depth)
+        limited.estimators_.append(tree)
+    limited.set_params(max_depth=depth)
+    return limited
+
+
+def quantize_float32(estimator):
+    """Copy with float32 thresholds / leaf values, or None where the library has no float64 to shed."""
+    if not _module(estimator).startswith("lightgbm"):
+        return None
+    import lightgbm as lgb
+
+    def to_float32(match):
+        # Shortest decimal that round-trips the float32 value
+        values = np.asarray(match.group(2).split(), dtype=np.float64).astype(np.float32)
+        return f"{match.group(1)}=" + " ".join(str(v) for v in values)
+
+    model_str = _LGB_FLOAT_LINE.sub(to_float32, estimator.booster_.model_to_string())
+    # Without tree_sizes LightGBM parses the trees sequentially
+    model_str = _LGB_TREE_SIZES.sub("", model_str)
+    quantized = copy.copy(estimator)
+    quantized._Booster = lgb.Booster(model_str=model_str)
+    return quantized
+
+
+def _members(model) -> Dict[str, Any]:
+    if hasattr(model, "named_estimators_"):
+        return dict(model.named_estimators_)
+    return {type(model).__name__: model}
+
+
+def _assemble(members: Dict[str, Any], model, classes: np.ndarray):
+    """Model from (compressed) members: the bare estimator, or a prefit voting with the original weights."""
+    if not hasattr(model, "named_estimators_") or len(members) == 1:
+        return next(iter(members.values()))
+    # Deferred: compressing a saved model should not need the training script at import time
+    from train_connection_classifier import build_prefit_voting
+
+    weights = None
+    if model.weights is not None:
+        weights = [w for name, w in zip(model.named_estimators_, model.weights) if name in members]
+    return build_prefit_voting(members, classes, weights=weights)
+
+
+def _serialized_mb(obj) -> float:
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return len(buffer.getvalue()) / 1e6
+
+
+def _pipeline(pipeline: Pipeline, model) -> Pipeline:
+    name = pipeline.steps[-1][0] if hasattr(model, "named_estimators_") else "model"
+    return Pipeline(steps=[pipeline.steps[0], (name, model)])
+
+
+def compress_pipeline(
+    pipeline: Pipeline,
+    X,
+    y: np.ndarray,
+    tolerance: float = F1_TOLERANCE,
+    logger=None,
+) -> Tuple[Pipeline, List[Dict[str, Any]]]:
+    """
+    Smallest / fastest compression of a fitted pipeline within `tolerance` macro F1 on (X, y).
+
+    X is the raw feature frame of a validation split (not the rows the final
+    model is evaluated on). Returns (compressed pipeline, report), one
+    report entry per step: what changed, macro F1, accuracy and the serving
+    benchmark of the pipeline after that step.
+    """
+    log = logger.info if logger else print
+    preprocessor = pipeline.steps[0][1]
+    model = pipeline.steps[-1][1]
+    classes = np.arange(len(model.classes_))
+    Xt = preprocessor.transform(X)
+
+    def score(members):
+        pred = _assemble(members, model, classes).predict(Xt)
+        return f1_score(y, pred, average="macro", zero_division=0), accuracy_score(y, pred)
+
+    members = _members(model)
+    base_f1, _ = score(members)
+    floor = base_f1 - tolerance
+    log(f"Uncompressed F1-macro {base_f1:.4f}; accepting compressed models down to {floor:.4f}")
+
+    report, candidates = [], []
+
+    def record(step, changes):
+        compressed = _pipeline(pipeline, _assemble(members, model, classes))
+        f1, acc = score(members)
+        bench = benchmark_candidate(compressed, X)
+        report.append({"step": step, "changes": changes, "f1_macro": float(f1), "accuracy": float(acc), **bench})
+        candidates.append(compressed)
+        log(f"{step}: F1-macro {f1:.4f}, {bench['serialized_mb']:.2f} MB, p50 {bench['single_row_p50_ms']:.2f} ms, "
+            f"p99 {bench['single_row_p99_ms']:.2f} ms, {bench['batch_rows_per_second']:.0f} rows/s"
+            + (f" ({'; '.join(changes)})" if changes else ""))
+
+    record("original", [])
+
+    # 1. Remove weak voters: among members whose removal keeps F1 within the
+    #    tolerance, drop the largest, until none qualifies or one is left
+    changes = []
+    while len(members) > 1 and hasattr(model, "named_estimators_"):
+        feasible = []
+        for name in members:
+            rest = {other: est for other, est in members.items() if other != name}
+            if score(rest)[0] >= floor:
+                feasible.append((_serialized_mb(members[name]), name))
+        if not feasible:
+            break
+        _, name = max(feasible)
+        members.pop(name)
+        changes.append(f"removed {name}")
+    if changes:
+        record("remove weak voters", changes)
+
+    # 2. Drop trees: fewest trees / rounds per member within the tolerance
+    changes = []
+    for name, estimator in list(members.items()):
+        total = n_trees(estimator)
+        if not total:
+            continue
+        for k in sorted({max(1, int(total * f)) for f in TREE_FRACTIONS if int(total * f) < total}):
+            trimmed = {**members, name: keep_trees(estimator, k)}
+            if score(trimmed)[0] >= floor:
+                members = trimmed
+                changes.append(f"{name}: {total} -> {k} trees")
+                break
+    if changes:
+        record("drop trees", changes)
+
+    # 3. Limit depth: shallowest Random Forest cut within the tolerance
+    changes = []
+    for name, estimator in list(members.items()):
+        deepest = max_depth(estimator)
+        if deepest is None:
+            continue
+        for depth in (d for d in FOREST_DEPTHS if d < deepest):
+            limited = {**members, name: limit_depth(estimator, depth)}
+            if score(limited)[0] >= floor:
+                members = limited
+                changes.append(f"{name}: depth {deepest} -> {depth}")
+                break
+    if changes:
+        record("limit depth", changes)
+
+    # 4. float32 quantization of thresholds and leaf values
+    changes = []
+    for name, estimator in list(members.items()):
+        quantized = quantize_float32(estimator)
+        if quantized is None:
+            continue
+        candidate = {**members, name: quantized}
+        if score(candidate)[0] >= floor and _serialized_mb(quantized) < _serialized_mb(estimator):
+            members = candidate
+            changes.append(f"{name}: float32 thresholds / leaf values")
+    if changes:
+        record("float32 quantization", changes)
+
+    best = min(range(len(report)), key=lambda i: (report[i]["serialized_mb"], report[i]["single_row_p50_ms"]))
+    report[best]["selected"] = True
+    log(f"Selected '{report[best]['step']}': {report[0]['serialized_mb']:.2f} -> {report[best]['serialized_mb']:.2f} MB, "
+        f"p50 {report[0]['single_row_p50_ms']:.2f} -> {report[best]['single_row_p50_ms']:.2f} ms, "
+        f"F1-macro {report[0]['f1_macro']:.4f} -> {report[best]['f1_macro']:.4f}")
+    return candidates[best], report
+
+
+def main(dataset_path: Optional[Path] = None, tolerance: float = F1_TOLERANCE):
+    import train_connection_classifier as training
+    from dataset_schema import deduplicate, read_dataset, row_hashes
+
+    dataset_path = dataset_path or training.DATASET_PATH
+    logger, log_file = training.setup_logging()
+    model_path = training.MODEL_DIR / "connection_classifier.pkl"
+    meta_path = training.MODEL_DIR / "connection_classifier_meta.pkl"
+    rows_path = training.MODEL_DIR / training.ROWS_FILE
+    if not (model_path.exists() and meta_path.exists() and rows_path.exists()):
+        logger.error("No trained model with holdout row hashes found; run train_connection_classifier.py first")
+        return
+    meta = joblib.load(meta_path)
+    if "compression" in meta:
+        # Tolerances would compound; compress the freshly trained model instead
+        logger.info("Saved model is already compressed; retrain before compressing again")
+        return
+
+    pipeline = joblib.load(model_path)
+    df, _ = deduplicate(read_dataset(dataset_path))
+    df, _, _ = training.clean_dataset(df)
+    features = meta["features"]
+    holdout = np.isin(row_hashes(df[features + ["label"]]), np.load(rows_path)["holdout"])
+    if not holdout.any():
+        logger.error("None of the holdout rows of the last training are in the dataset")
+        return
+    X = df.loc[holdout, features]
+    y = df.loc[holdout, "label"].astype(str).map({label: i for i, label in enumerate(meta["classes"])}).to_numpy()
+    # Tune on one half of the holdout, report on the other
+    X_tune, X_report, y_tune, y_report = train_test_split(X, y, test_size=0.5, stratify=y, random_state=42)
+
+    f1_before = f1_score(y_report, pipeline.predict(X_report), average="macro", zero_division=0)
+    compressed, report = compress_pipeline(pipeline, X_tune, y_tune, tolerance, logger)
+    selected = next(step for step in report if step.get("selected"))
+    meta["best_metrics"].update(training.holdout_metrics(y_report, compressed.predict(X_report)))
+    logger.info(f"Compressed model on the reporting half of the holdout: F1-macro "
+                f"{f1_before:.4f} -> {meta['best_metrics']['f1_macro']:.4f}")
+    meta["serving_benchmark"] = {k: v for k, v in selected.items()
+                                 if k not in ("step", "changes", "selected", "f1_macro", "accuracy")}
+    meta["compression"] = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "tolerance": float(tolerance),
+        "validation_rows": int(len(y_tune)),
+        # Per-step F1 / accuracy are on the tuning half
+        "steps": report,
+        "report_rows": int(len(y_report)),
+        "report_f1_macro_before": float(f1_before),
+        "report_f1_macro_after": meta["best_metrics"]["f1_macro"],
+    }
+    joblib.dump(compressed, model_path)
+    joblib.dump(meta, meta_path)
+    logger.info(f"Saved compressed model to {model_path}")
+    logger.info(f"Log file: {log_file}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=None,
+                        help="CSV file, compact .parquet file or Parquet part directory "
+                             "(default: the training dataset)")
+    parser.add_argument("--tolerance", type=float, default=F1_TOLERANCE,
+                        help="largest macro-F1 loss accepted relative to the uncompressed model")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(dataset_path=args.dataset, tolerance=args.tolerance)
@@ -3,35 +3,237 @@ Model Service for ML Prediction
 
 This module loads the trained connection classifier model and provides
 prediction functionality for the FastAPI backend.
+
+Thread budget
+-------------
+The trained estimators bring their own thread pools (Random Forest via joblib,
+XGBoost/LightGBM via OpenMP, CatBoost via its own executor). Left on their
+defaults, every single-row request would fan out to all cores and concurrent
+requests would fight over the same CPUs. The service therefore owns the thread
+policy: single-row calls run with ``ML_THREADS_SINGLE`` threads (default 1) and
+batch calls with ``ML_THREADS_BATCH`` threads (default: all cores). BLAS pools
+are pinned to one thread since tree models do not use them. The budget applies
+to the final estimators only; preprocessing steps always run sequentially.
+``ML_THREADS_SINGLE=-1`` opts out: the estimators keep their library defaults
+and the OMP / OpenMP runtime is left untouched (for benchmarking).
+
+Each budget gets its own loaded copy of the model, configured once when it is
+loaded, so concurrent single-row and batch requests never change the thread
+settings of an estimator another request is predicting with. The OMP / BLAS
+environment defaults are applied when the first model is loaded (service
+startup), not at import, so tools that import this module keep the library
+defaults unless they load a model.
 """
 
+import os
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional
-import joblib
+from typing import Dict, Any, List, Optional
+
 import numpy as np
-import pandas as pd
 
 MODEL_DIR = Path(__file__).parent / "models"
 MODEL_PATH = MODEL_DIR / "connection_classifier.pkl"
 META_PATH = MODEL_DIR / "connection_classifier_meta.pkl"
 
-# Global variables for lazy loading
-_model = None
+# Thread budget (see module docstring)
+# ML_THREADS_SINGLE=-1 keeps the library defaults (all cores) and leaves the OMP / BLAS runtime alone
+SINGLE_ROW_THREADS = int(os.getenv("ML_THREADS_SINGLE", "1"))
+if SINGLE_ROW_THREADS <= 0:
+    SINGLE_ROW_THREADS = -1
+BATCH_THREADS = max(1, int(os.getenv("ML_THREADS_BATCH", str(os.cpu_count() or 1))))
+
+# Global variables for lazy loading: one model copy per thread budget
+_models: Dict[int, Any] = {}
 _metadata = None
+_threadpool_limiter = None
+_load_lock = threading.Lock()
+
+
+def _set_estimator_threads(estimator, n_threads: int) -> None:
+    """Recursively set the per-estimator thread count (n_jobs / nthread) of the final estimators."""
+    if hasattr(estimator, "steps"):
+        for _, step in estimator.steps[:-1]:
+            # A joblib dispatch per transform costs far more than encoding a
+            # request's rows, so transformers stay sequential
+            if "n_jobs" in step.get_params(deep=False):
+                step.set_params(n_jobs=None)
+        _set_estimator_threads(estimator.steps[-1][1], n_threads)
+        return
+    if hasattr(estimator, "estimators_"):
+        # VotingClassifier: n_jobs only parallelises fit, the fitted members do the work
+        for member in estimator.estimators_:
+            _set_estimator_threads(member, n_threads)
+    if _is_catboost(estimator):
+        # CatBoost takes thread_count per predict call (see _predict_proba)
+        return
+    try:
+        if "n_jobs" in estimator.get_params(deep=False):
+            estimator.set_params(n_jobs=n_threads)
+    except AttributeError:
+        pass
+
+
+def _is_catboost(estimator) -> bool:
+    return type(estimator).__module__.startswith("catboost")
+
+
+def _configure_thread_environment() -> None:
+    """OMP / BLAS defaults for thread pools initialised after this point (explicit settings win)."""
+    if SINGLE_ROW_THREADS <= 0:
+        # ML_THREADS_SINGLE=-1 (or benchmark_inference_threads.py --single-threads -1)
+        return
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(SINGLE_ROW_THREADS))
+
+
+def _configure_thread_pools() -> None:
+    """Pin BLAS to one thread and cap OpenMP for the libraries loaded with the model."""
+    global _threadpool_limiter
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    limits = {"blas": 1}
+    if SINGLE_ROW_THREADS > 0:
+        limits["openmp"] = SINGLE_ROW_THREADS
+    _threadpool_limiter = threadpool_limits(limits=limits)
+
+
+def _load_model(n_threads: Optional[int] = None):
+    """Lazy load the model copy for a thread budget (default: single-row) and the metadata."""
+    global _metadata
+    n_threads = SINGLE_ROW_THREADS if n_threads is None else n_threads
+    model = _models.get(n_threads)
+    if model is None:
+        with _load_lock:
+            model = _models.get(n_threads)
+            if model is None:
+                if not MODEL_PATH.exists():
+                    raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
+                if not META_PATH.exists():
+                    raise FileNotFoundError(f"Metadata file not found: {META_PATH}")
+
+                # Deferred import: unpickling pulls in sklearn and only the estimator
+                # libraries the saved model actually uses
+                import joblib
+
+                first = not _models
+                if first:
+                    _configure_thread_environment()
+                model = joblib.load(MODEL_PATH)
+                # Configured before it is published; never changed afterwards
+                _set_estimator_threads(model, n_threads)
+                if first:
+                    _metadata = joblib.load(META_PATH)
+                    # Estimator libraries are imported by unpickling, so their pools exist now
+                    _configure_thread_pools()
+                _models[n_threads] = model
+    return model, _metadata
+
+
+def _predict_proba(estimator, X, n_threads: int) -> np.ndarray:
+    """
+    predict_proba that forwards the thread budget to every fitted estimator.
+
+    Pipelines and soft-voting ensembles are unwrapped so that CatBoost members,
+    which only accept a per-call ``thread_count``, honour the budget as well.
+    """
+    if hasattr(estimator, "steps"):
+        Xt = X
+        for _, step in estimator.steps[:-1]:
+            Xt = step.transform(Xt)
+        return _predict_proba(estimator.steps[-1][1], Xt, n_threads)
+    if hasattr(estimator, "estimators_") and getattr(estimator, "voting", None) == "soft":
+        probas = [_predict_proba(member, X, n_threads) for member in estimator.estimators_]
+        return np.average(np.asarray(probas), axis=0, weights=estimator.weights)
+    if _is_catboost(estimator):
+        return estimator.predict_proba(X, thread_count=n_threads)
+    return estimator.predict_proba(X)
+
+
+def _build_frame(rows: List[Dict[str, Any]], metadata: Dict[str, Any]):
+    """Build the model input frame in the training feature order."""
+    import pandas as pd
+
+    # Extract feature order from metadata
+    feature_list = metadata.get("features", [])
+    numeric_features = metadata.get("numeric", [])
+
+    # Build feature vectors in the correct order
+    vectors = []
+    for features in rows:
+        feature_vector = []
+        for feat_name in feature_list:
+            if feat_name in features:
+                feature_vector.append(features[feat_name])
+            else:
+                # Handle missing features with defaults
+                if feat_name in numeric_features:
+                    feature_vector.append(0.0)
+                else:
+                    feature_vector.append("unknown")
+        vectors.append(feature_vector)
+
+    X = pd.DataFrame(vectors, columns=feature_list)
+
+    # Ensure numeric features are numeric
+    for feat in numeric_features:
+        if feat in X.columns:
+            X[feat] = pd.to_numeric(X[feat], errors='coerce').fillna(0.0)
+    return X
+
+
+def _format_prediction(probabilities: np.ndarray, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Map one row of class probabilities to the API response format."""
+    classes = metadata.get("classes", ["press", "key", "spline"])
+    label_mapping = metadata.get("label_mapping", {})
+
+    # Soft voting and all tree classifiers predict the argmax of predict_proba,
+    # so the label is derived from the probabilities instead of a second pass
+    pred_idx = int(np.argmax(probabilities))
+    if 0 <= pred_idx < len(classes):
+        pred_label = classes[pred_idx]
+    else:
+        # Fallback: try to use label_mapping or default to first class
+        pred_label = label_mapping.get(pred_idx, classes[0] if classes else "press")
 
+    # Build probability dictionary
+    prob_dict = {}
+    for idx, class_name in enumerate(classes):
+        if idx < len(probabilities):
+            prob_dict[class_name] = float(probabilities[idx])
 
-def _load_model():
-    """Lazy load the model and metadata."""
-    global _model, _metadata
-    if _model is None:
-        if not MODEL_PATH.exists():
-            raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
-        if not META_PATH.exists():
-            raise FileNotFoundError(f"Metadata file not found: {META_PATH}")
-        
-        _model = joblib.load(MODEL_PATH)
-        _metadata = joblib.load(META_PATH)
-    return _model, _metadata
+    return {
+        "label": pred_label,
+        "probs": prob_dict
+    }
+
+
+def predict_connection_batch(rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Predict connection types for several feature dictionaries in one model call.
+
+    Uses the batch thread budget (``ML_THREADS_BATCH``). Each entry of ``rows``
+    has the same layout as the ``features`` argument of ``predict_connection``.
+
+    Returns:
+        List of prediction dictionaries (same order as ``rows``), or None if the
+        model cannot be loaded or prediction fails.
+    """
+    if not rows:
+        return []
+    n_threads = SINGLE_ROW_THREADS if len(rows) == 1 else BATCH_THREADS
+    try:
+        model, metadata = _load_model(n_threads)
+        X = _build_frame(rows, metadata)
+        probabilities = _predict_proba(model, X, n_threads)
+        return [_format_prediction(row_probs, metadata) for row_probs in probabilities]
+
+    except Exception as e:
+        # Log error (in production, use proper logging)
+        print(f"Error in predict_connection_batch: {e}")
+        return None
 
 
 def predict_connection(features: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -66,71 +268,12 @@ def predict_connection(features: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         Returns None if model cannot be loaded or prediction fails.
     """
     try:
-        model, metadata = _load_model()
-        
-        # Extract feature order from metadata
-        feature_list = metadata.get("features", [])
-        numeric_features = metadata.get("numeric", [])
-        categorical_features = metadata.get("categorical", [])
-        
-        # Build feature vector in the correct order
-        feature_vector = []
-        for feat_name in feature_list:
-            if feat_name in features:
-                feature_vector.append(features[feat_name])
-            else:
-                # Handle missing features with defaults
-                if feat_name in numeric_features:
-                    feature_vector.append(0.0)
-                else:
-                    feature_vector.append("unknown")
-        
-        # Create DataFrame for prediction
-        X = pd.DataFrame([feature_vector], columns=feature_list)
-        
-        # Ensure numeric features are numeric
-        for feat in numeric_features:
-            if feat in X.columns:
-                X[feat] = pd.to_numeric(X[feat], errors='coerce').fillna(0.0)
-        
-        # Predict
-        prediction = model.predict(X)[0]
-        probabilities = model.predict_proba(X)[0]
-        
-        # Map prediction index to label
-        classes = metadata.get("classes", ["press", "key", "spline"])
-        label_mapping = metadata.get("label_mapping", {})
-        
-        # Convert prediction index to label
-        # Handle numpy integers and regular integers
-        if isinstance(prediction, (int, np.integer, np.ndarray)):
-            pred_idx = int(prediction) if not isinstance(prediction, np.ndarray) else int(prediction.item())
-            if 0 <= pred_idx < len(classes):
-                pred_label = classes[pred_idx]
-            else:
-                # Fallback: try to use label_mapping or default to first class
-                pred_label = label_mapping.get(pred_idx, classes[0] if classes else "press")
-        elif isinstance(prediction, str) and prediction in classes:
-            # Already a valid label string
-            pred_label = prediction
-        else:
-            # Last resort: convert to string, but log a warning
-            print(f"Warning: Unexpected prediction type/value: {prediction} (type: {type(prediction)})")
-            pred_label = str(prediction)
-        
-        # Build probability dictionary
-        prob_dict = {}
-        for idx, class_name in enumerate(classes):
-            if idx < len(probabilities):
-                prob_dict[class_name] = float(probabilities[idx])
-        
-        return {
-            "label": pred_label,
-            "probs": prob_dict
-        }
+        model, metadata = _load_model(SINGLE_ROW_THREADS)
+        X = _build_frame([features], metadata)
+        probabilities = _predict_proba(model, X, SINGLE_ROW_THREADS)[0]
+        return _format_prediction(probabilities, metadata)
     
     except Exception as e:
         # Log error (in production, use proper logging)
         print(f"Error in predict_connection: {e}")
         return None
-
@@ -0,0 +1,297 @@
+# out_of_core_training.py
+"""
+Out-of-core training for datasets larger than RAM
+
+train_connection_classifier.py loads the whole dataset and a dense one-hot
+matrix into memory. This path streams the dataset from disk instead
+(dataset_schema.iter_dataset, CSV / Parquet / part directory) and never holds
+more than one chunk of raw rows:
+
+    1. first pass: StandardScaler.partial_fit on the training rows, observed
+       categories and labels, row counts; the fitted preprocessor is identical
+       to the in-memory fit, so model_service serves the result unchanged
+    2. second pass: every chunk is transformed and saved as a float32 part
+       file (train / holdout)
+    3. XGBoost trains from an iterator-based external-memory DMatrix
+       (ExtMemQuantileDMatrix, pages cached on disk); LightGBM constructs its
+       Dataset from one Sequence per part file
+    4. the holdout is scored part by part (confusion matrix accumulation)
+
+Rows go to the holdout by row hash (1 in HOLDOUT_MODULUS), which needs no
+shuffle and is stable across runs. Exact duplicates are not dropped (that
+would need a row-hash set growing with the dataset). Raw rows and the one-hot
+matrix never exist in memory as a whole; what still grows with the row count
+is the boosters' own per-row state (labels, gradients, LightGBM's binned
+dataset at 1 byte per feature and row).
+
+    python out_of_core_training.py --dataset enumerated_SHC_dataset --chunk-rows 200000
+"""
+
+import argparse
+import json
+import resource
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import confusion_matrix
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import train_connection_classifier as training
+from booster_classifier import BoosterClassifier
+from dataset_schema import compact_dtypes, iter_dataset, row_hashes
+
+CHUNK_ROWS = 100_000
+HOLDOUT_MODULUS = 5          # 1 in 5 rows (by row hash) is held out, as the 80/20 split
+N_ESTIMATORS = 150
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _clean_chunks(dataset_path: Path, chunk_rows: int, features):
+    """Cleaned chunks with a boolean holdout mask per chunk."""
+    for chunk in iter_dataset(dataset_path, chunk_rows, columns=features + ["label"]):
+        chunk, _, _ = training.clean_dataset(chunk[features + ["label"]])
+        holdout = row_hashes(chunk) % HOLDOUT_MODULUS == 0
+        yield chunk, holdout
+
+
+def fit_streaming_preprocessor(dataset_path: Path, chunk_rows: int, features):
+    """
+    First pass: fit the preprocessor from streamed training rows.
+
+    Returns (preprocessor, sorted labels, train rows, holdout rows).
+    """
+    scaler = StandardScaler()
+    categories = {col: set() for col in training.CATEGORICAL}
+    labels = set()
+    n_train = n_holdout = 0
+    for chunk, holdout in _clean_chunks(dataset_path, chunk_rows, features):
+        train = chunk[~holdout]
+        if len(train):
+            scaler.partial_fit(train[training.FEATURE_NUMERIC])
+        for col in training.CATEGORICAL:
+            categories[col].update(train[col].dropna().astype(str).unique())
+        labels.update(chunk["label"].astype(str).unique())
+        n_train += len(train)
+        n_holdout += int(holdout.sum())
+
+    # Fit the regular preprocessor on a prototype frame holding every observed
+    # category, then swap in the streamed scaler: same result as a full fit
+    n_proto = max(len(values) for values in categories.values())
+    proto = {col: np.zeros(n_proto, dtype=np.float32) for col in training.FEATURE_NUMERIC}
+    for col, values in categories.items():
+        values = sorted(values)
+        proto[col] = [values[i % len(values)] for i in range(n_proto)]
+    preprocessor = training._build_preprocessor()
+    preprocessor.fit(compact_dtypes(pd.DataFrame(proto)[features]))
+    preprocessor.named_transformers_["num"].steps[0] = ("scaler", scaler)
+    return preprocessor, sorted(labels), n_train, n_holdout
+
+
+def write_transformed(dataset_path: Path, chunk_rows: int, features, preprocessor, classes, workdir: Path):
+    """
+    Second pass: transform every chunk and save it as float32 part files.
+
+    Returns {"train": [(X part, y part), ...], "holdout": [...]}; later stages
+    load one part at a time.
+    """
+    label_index = {label: idx for idx, label in enumerate(classes)}
+    parts = {"train": [], "holdout": []}
+    for i, (chunk, holdout) in enumerate(_clean_chunks(dataset_path, chunk_rows, features)):
+        for split, mask in (("train", ~holdout), ("holdout", holdout)):
+            part = chunk[mask]
+            if not len(part):
+                continue
+            X_path, y_path = workdir / f"{split}-{i:05d}-X.npy", workdir / f"{split}-{i:05d}-y.npy"
+            np.save(X_path, preprocessor.transform(part[features]).astype(np.float32))
+            np.save(y_path, part["label"].astype(str).map(label_index).to_numpy(dtype=np.int8))
+            parts[split].append((X_path, y_path))
+    return parts
+
+
+def xgboost_params(n_classes: int) -> Dict[str, Any]:
+    return {
+        "objective": "multi:softprob",
+        "num_class": n_classes,
+        "tree_method": "hist",
+        "eval_metric": "mlogloss",
+        "seed": 42,
+    }
+
+
+def lightgbm_params(n_classes: int) -> Dict[str, Any]:
+    return {"objective": "multiclass", "num_class": n_classes, "seed": 42, "verbose": -1}
+
+
+def train_xgboost(parts, n_classes: int, workdir: Path):
+    """XGBoost from an external-memory DMatrix fed part by part through a DataIter."""
+    import xgboost as xgb
+
+    class PartIter(xgb.DataIter):
+        def __init__(self):
+            self._index = 0
+            super().__init__(cache_prefix=str(workdir / "xgb_cache"))
+
+        def next(self, input_data):
+            if self._index >= len(parts):
+                return False
+            X_path, y_path = parts[self._index]
+            input_data(data=np.load(X_path), label=np.load(y_path))
+            self._index += 1
+            return True
+
+        def reset(self):
+            self._index = 0
+
+    if hasattr(xgb, "ExtMemQuantileDMatrix"):
+        dtrain = xgb.ExtMemQuantileDMatrix(PartIter())
+    else:
+        dtrain = xgb.DMatrix(PartIter())
+    return xgb.train(xgboost_params(n_classes), dtrain, num_boost_round=N_ESTIMATORS)
+
+
+def train_lightgbm(parts, n_classes: int):
+    """LightGBM with its Dataset constructed from one Sequence per part file."""
+    import lightgbm as lgb
+
+    class PartSequence(lgb.Sequence):
+        def __init__(self, path: Path):
+            self.path = path
+            self.n_rows = np.load(path, mmap_mode="r").shape[0]
+            self.batch_size = self.n_rows
+
+        def __getitem__(self, idx):
+            # LightGBM's sampling expects float64 rows
+            return np.asarray(np.load(self.path, mmap_mode="r")[idx], dtype=np.float64)
+
+        def __len__(self):
+            return self.n_rows
+
+    params = lightgbm_params(n_classes)
+    labels = np.concatenate([np.load(y_path) for _, y_path in parts])
+    dataset = lgb.Dataset([PartSequence(X_path) for X_path, _ in parts], label=labels, params=params)
+    return lgb.train(params, dataset, num_boost_round=N_ESTIMATORS)
+
+
+def evaluate_chunked(model, parts, n_classes: int) -> Dict[str, Any]:
+    """Holdout metrics from a confusion matrix accumulated part by part."""
+    cm = np.zeros((n_classes, n_classes), dtype=np.int64)
+    for X_path, y_path in parts:
+        cm += confusion_matrix(np.load(y_path), model.predict(np.load(X_path)), labels=np.arange(n_classes))
+    tp = np.diag(cm).astype(float)
+    precision = np.divide(tp, cm.sum(axis=0), out=np.zeros(n_classes), where=cm.sum(axis=0) > 0)
+    recall = np.divide(tp, cm.sum(axis=1), out=np.zeros(n_classes), where=cm.sum(axis=1) > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(n_classes),
+                   where=(precision + recall) > 0)
+    return {
+        "accuracy": float(tp.sum() / max(cm.sum(), 1)),
+        "precision_macro": float(precision.mean()),
+        "recall_macro": float(recall.mean()),
+        "f1_macro": float(f1.mean()),
+        "confusion_matrix": cm.tolist(),
+    }
+
+
+def main(dataset_path: Path = training.DATASET_PATH, chunk_rows: int = CHUNK_ROWS):
+    logger, log_file = training.setup_logging()
+    start_time = time.time()
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    workdir = training.CACHE_DIR / "out_of_core"
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = {
+        "experiment_info": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "dataset_path": str(dataset_path),
+            "training_mode": "out_of_core",
+            "chunk_rows": chunk_rows,
+            "holdout_share": 1 / HOLDOUT_MODULUS,
+        },
+        "model_results": {},
+    }
+
+    try:
+        t0 = time.time()
+        preprocessor, classes, n_train, n_holdout = fit_streaming_preprocessor(dataset_path, chunk_rows, features)
+        logger.info(f"Pass 1: {n_train} train / {n_holdout} holdout rows, classes {classes} "
+                    f"({time.time() - t0:.2f} s, peak RSS {_peak_rss_mb():.0f} MB)")
+        t0 = time.time()
+        parts = write_transformed(dataset_path, chunk_rows, features, preprocessor, classes, workdir)
+        logger.info(f"Pass 2: {len(parts['train'])} train / {len(parts['holdout'])} holdout parts written to {workdir} "
+                    f"({time.time() - t0:.2f} s, peak RSS {_peak_rss_mb():.0f} MB)")
+
+        # (trainer, parameters the booster is trained with; kept for BoosterClassifier.fit)
+        trainers = {
+            "XGBoost": (lambda: train_xgboost(parts["train"], len(classes), workdir), xgboost_params(len(classes))),
+            "LightGBM": (lambda: train_lightgbm(parts["train"], len(classes)), lightgbm_params(len(classes))),
+        }
+        best_name, best_model, best_metrics = None, None, None
+        for name, (train, params) in trainers.items():
+            t0 = time.time()
+            model = BoosterClassifier(train(), n_classes=len(classes), params=params, num_boost_round=N_ESTIMATORS)
+            train_time = time.time() - t0
+            metrics = evaluate_chunked(model, parts["holdout"], len(classes))
+            metrics.update({"training_time_seconds": float(train_time), "peak_rss_mb": _peak_rss_mb()})
+            results["model_results"][name] = metrics
+            logger.info(f"{name}: trained in {train_time:.2f} s, holdout F1-macro {metrics['f1_macro']:.4f}, "
+                        f"peak RSS {metrics['peak_rss_mb']:.0f} MB")
+            if best_metrics is None or metrics["f1_macro"] > best_metrics["f1_macro"]:
+                best_name, best_model, best_metrics = name, model, metrics
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    pipeline = Pipeline(steps=[("preprocess", preprocessor), ("model", best_model)])
+    model_path = training.MODEL_DIR / "connection_classifier.pkl"
+    meta_path = training.MODEL_DIR / "connection_classifier_meta.pkl"
+    joblib.dump(pipeline, model_path)
+    joblib.dump(
+        {
+            "features": features,
+            "numeric": training.FEATURE_NUMERIC,
+            "categorical": training.CATEGORICAL,
+            "range": {"shaft_diameter": (6, 230)},
+            "best_model": best_name,
+            "best_metrics": {k: best_metrics[k] for k in
+                             ("accuracy", "precision_macro", "recall_macro", "f1_macro", "confusion_matrix")},
+            "classes": classes,
+            "label_mapping": {idx: label for idx, label in enumerate(classes)},
+            "training_mode": "out_of_core",
+        },
+        meta_path,
+    )
+    # Row hashes of an earlier in-memory run no longer describe this model
+    (training.MODEL_DIR / training.ROWS_FILE).unlink(missing_ok=True)
+
+    results["best_model"] = {"name": best_name, "f1_macro": best_metrics["f1_macro"]}
+    results["training_summary"] = {
+        "total_training_time_seconds": float(time.time() - start_time),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    results_path = training.RESULTS_DIR / f"training_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    logger.info(f"Saved best model ({best_name}) to {model_path}")
+    logger.info(f"Results file: {results_path}")
+    logger.info(f"Log file: {log_file}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", type=Path, default=training.DATASET_PATH,
+                        help="CSV file, compact .parquet file or Parquet part directory")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help="rows read, transformed and fed to the boosters at a time")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    main(dataset_path=args.dataset, chunk_rows=args.chunk_rows)
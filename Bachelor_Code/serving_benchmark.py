@@ -0,0 +1,147 @@
+# serving_benchmark.py
+"""
+Serving cost of trained candidates and SLO-aware model selection
+
+For every candidate pipeline (preprocessing + model) this measures what the
+API pays to serve it:
+    - single-row latency p50 / p99 through model_service's predict path with
+      the single-row thread budget (the per-request cost)
+    - batch throughput in rows/s with the batch thread budget
+    - serialized size (joblib, as written to models/)
+    - RSS of a fresh interpreter after loading the pickle (what a serving
+      worker costs), measured in a subprocess so the training process's own
+      memory does not leak into the number
+
+select_within_slo then picks the best-scoring candidate that meets the
+latency / memory / size SLOs; when none does, the best overall is kept and the
+violation is reported.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+N_SINGLE_ROW = 200
+N_WARMUP = 10
+BATCH_ROWS = 1000
+
+# Benchmark field each SLO applies to
+SLO_FIELDS = {
+    "p99_ms": "single_row_p99_ms",
+    "rss_mb": "loaded_rss_mb",
+    "size_mb": "serialized_mb",
+}
+
+_RSS_SCRIPT = """
+import json, os, resource, sys
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+import joblib
+before = rss_mb()
+model = joblib.load(sys.argv[1])
+print(json.dumps({"before": before, "after": rss_mb()}))
+"""
+
+
+def _loaded_rss(path: Path) -> Tuple[Optional[float], Optional[float]]:
+    """(RSS after load, RSS growth caused by the load) of a fresh interpreter, in MB."""
+    proc = subprocess.run(
+        [sys.executable, "-c", _RSS_SCRIPT, str(path)],
+        cwd=Path(__file__).parent, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None, None
+    rss = json.loads(proc.stdout.strip().splitlines()[-1])
+    return rss["after"], rss["after"] - rss["before"]
+
+
+def benchmark_candidate(pipeline, X, single_threads: int = 1, batch_threads: Optional[int] = None) -> Dict[str, Any]:
+    """Latency, throughput, size and loaded RSS of one fitted pipeline on the raw feature frame X."""
+    import joblib
+
+    # Deferred: keeps serving-only imports out of modules that just select models
+    from model_service import _predict_proba, _set_estimator_threads
+
+    batch_threads = batch_threads or os.cpu_count() or 1
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+    data = buffer.getvalue()
+
+    # Benchmark the round-tripped copy so thread settings do not leak into the saved model
+    model = joblib.load(io.BytesIO(data))
+    rows = [X.iloc[[i % len(X)]] for i in range(N_WARMUP + N_SINGLE_ROW)]
+    _set_estimator_threads(model, single_threads)
+    latencies = []
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        _predict_proba(model, row, single_threads)
+        if i >= N_WARMUP:
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    batch = X.iloc[:BATCH_ROWS]
+    _set_estimator_threads(model, batch_threads)
+    _predict_proba(model, batch, batch_threads)
+    batch_seconds = min(_timed(lambda: _predict_proba(model, batch, batch_threads)) for _ in range(3))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "model.pkl"
+        path.write_bytes(data)
+        loaded_rss, rss_delta = _loaded_rss(path)
+
+    return {
+        "single_row_p50_ms": float(np.percentile(latencies, 50)),
+        "single_row_p99_ms": float(np.percentile(latencies, 99)),
+        "single_row_threads": int(single_threads),
+        "batch_rows_per_second": float(len(batch) / batch_seconds),
+        "batch_rows": int(len(batch)),
+        "batch_threads": int(batch_threads),
+        "serialized_mb": len(data) / 1e6,
+        "loaded_rss_mb": loaded_rss,
+        "load_rss_delta_mb": rss_delta,
+    }
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def slo_violations(bench: Dict[str, Any], slo: Dict[str, Optional[float]]) -> Dict[str, float]:
+    """SLOs a benchmark misses: {slo name: measured value}."""
+    violations = {}
+    for key, limit in slo.items():
+        value = bench.get(SLO_FIELDS[key])
+        if limit is not None and value is not None and value > limit:
+            violations[key] = value
+    return violations
+
+
+def select_within_slo(
+    scores: Dict[str, float],
+    benchmarks: Dict[str, Dict[str, Any]],
+    slo: Dict[str, Optional[float]],
+) -> Tuple[str, bool]:
+    """
+    Best-scoring candidate that meets every SLO.
+
+    Returns (name, slo_met); falls back to the best score overall when no
+    candidate meets the SLOs.
+    """
+    ranked = sorted(scores, key=lambda name: -scores[name])
+    for name in ranked:
+        if not slo_violations(benchmarks[name], slo):
+            return name, True
+    return ranked[0], False
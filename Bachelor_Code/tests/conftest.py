@@ -0,0 +1,39 @@
+# conftest.py
+"""Shared fixtures: a small stratified dataset and a training run isolated in tmp_path."""
+
+import sys
+import warnings
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import train_connection_classifier as training  # noqa: E402
+from dataset_schema import read_dataset  # noqa: E402
+
+ROWS_PER_CLASS = 300
+
+
+@pytest.fixture(scope="session")
+def small_dataset(tmp_path_factory):
+    """CSV with ROWS_PER_CLASS rows of every label from the synthetic dataset."""
+    df = read_dataset(training.DATASET_PATH)
+    small = df.groupby("label", group_keys=False).head(ROWS_PER_CLASS).reset_index(drop=True)
+    path = tmp_path_factory.mktemp("data") / "small_dataset.csv"
+    small.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def isolated_training(tmp_path, monkeypatch):
+    """Redirect models, results and caches of the training script into tmp_path."""
+    warnings.filterwarnings("ignore")
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    monkeypatch.setattr(training, "MODEL_DIR", model_dir)
+    monkeypatch.setattr(training, "RESULTS_DIR", tmp_path)
+    monkeypatch.setattr(training, "CACHE_DIR", tmp_path / "cache")
+    # CatBoost writes catboost_info/ into the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
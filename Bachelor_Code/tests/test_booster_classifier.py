@@ -0,0 +1,74 @@
+# test_booster_classifier.py
+import joblib
+import numpy as np
+import pytest
+from sklearn.pipeline import Pipeline
+
+import incremental_training
+import out_of_core_training
+import train_connection_classifier as training
+from booster_classifier import BoosterClassifier
+from dataset_schema import deduplicate, read_dataset, row_hashes
+
+N_ROUNDS = 5
+
+
+def _training_data(small_dataset):
+    # Loaded as incremental_training loads it, so the row hashes match
+    df, _ = deduplicate(read_dataset(small_dataset))
+    df, _, _ = training.clean_dataset(df)
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    classes = sorted(df["label"].astype(str).unique())
+    y = df["label"].astype(str).map({label: i for i, label in enumerate(classes)}).to_numpy()
+    return df, features, classes, y
+
+
+@pytest.fixture(params=["xgboost", "lightgbm"])
+def booster_params(request):
+    make = out_of_core_training.xgboost_params if request.param == "xgboost" else out_of_core_training.lightgbm_params
+    return make(3)
+
+
+def _n_rounds(booster) -> int:
+    if hasattr(booster, "num_boosted_rounds"):
+        return booster.num_boosted_rounds()
+    return booster.current_iteration()
+
+
+def test_fit_and_continue(small_dataset, booster_params):
+    df, features, _, y = _training_data(small_dataset)
+    X = training._build_preprocessor().fit_transform(df[features])
+    model = BoosterClassifier(params=booster_params, num_boost_round=N_ROUNDS).fit(X, y)
+    assert model.predict_proba(X).shape == (len(X), 3)
+    assert _n_rounds(model.booster) == N_ROUNDS
+
+    updated = incremental_training.continue_estimator(model, X[:200], y[:200], extra=2)
+    assert _n_rounds(updated.booster) == N_ROUNDS + 2
+    assert _n_rounds(model.booster) == N_ROUNDS
+
+
+def test_fit_without_params_raises():
+    with pytest.raises(ValueError):
+        BoosterClassifier(n_classes=3).fit(np.zeros((3, 2)), np.arange(3))
+
+
+def test_incremental_falls_back_without_warm_start(small_dataset, isolated_training, monkeypatch, caplog):
+    df, features, classes, y = _training_data(small_dataset)
+    preprocessor = training._build_preprocessor().fit(df[features])
+    params = out_of_core_training.lightgbm_params(len(classes))
+    fitted = BoosterClassifier(params=params, num_boost_round=N_ROUNDS).fit(preprocessor.transform(df[features]), y)
+    # Saved without its training params, as by an older out-of-core run
+    legacy = BoosterClassifier(fitted.booster, n_classes=len(classes))
+    models = isolated_training / "models"
+    joblib.dump(Pipeline([("preprocess", preprocessor), ("model", legacy)]), models / "connection_classifier.pkl")
+    joblib.dump({"features": features, "classes": classes, "best_model": "LightGBM",
+                 "best_metrics": {"f1_macro": 0.0}}, models / "connection_classifier_meta.pkl")
+    hashes = row_hashes(df[features + ["label"]])
+    # Rows after the first 400 count as new since the last training
+    np.savez(models / training.ROWS_FILE, train=hashes[:200], holdout=hashes[200:400])
+
+    retrains = []
+    monkeypatch.setattr(training, "main", lambda **kwargs: retrains.append(kwargs))
+    incremental_training.main(dataset_path=small_dataset)
+    assert retrains == [{"dataset_path": small_dataset}]
+    assert "BoosterClassifier.fit needs the training params" in caplog.text
@@ -0,0 +1,37 @@
+# test_categorical_encoding.py
+import joblib
+import pandas as pd
+
+import train_connection_classifier as training
+
+
+def _saved_model(tmp_path):
+    return joblib.load(tmp_path / "models" / "connection_classifier_meta.pkl")
+
+
+def test_native_rerun_uses_cached_preprocessing(small_dataset, isolated_training):
+    # The second run loads the Parquet matrices from the preprocessing cache
+    for _ in range(2):
+        training.main(dataset_path=small_dataset, categorical_encoding="native")
+    assert _saved_model(isolated_training)["categorical_encoding"] == "native"
+    assert len(list((isolated_training / "cache").glob("preprocess_*"))) == 1
+
+
+def test_cached_native_matrices_keep_category_dtype(small_dataset, isolated_training):
+    df, _, _ = training.clean_dataset(pd.read_csv(small_dataset))
+    X = df[training.FEATURE_NUMERIC + training.CATEGORICAL]
+    fresh = training.fit_preprocessing(X.iloc[:600], X.iloc[600:], "0" * 64, categorical_encoding="native")
+    cached = training.fit_preprocessing(X.iloc[:600], X.iloc[600:], "0" * 64, categorical_encoding="native")
+    for col in training.CATEGORICAL:
+        assert cached[1][col].dtype == fresh[1][col].dtype
+        assert cached[2][col].dtype == fresh[2][col].dtype
+
+
+def test_native_with_cross_validation(small_dataset, isolated_training):
+    training.main(dataset_path=small_dataset, categorical_encoding="native", cv_folds=2)
+    assert _saved_model(isolated_training)["categorical_encoding"] == "native"
+
+
+def test_native_with_hyperparameter_search(small_dataset, isolated_training):
+    training.main(dataset_path=small_dataset, categorical_encoding="native", search_budget=5)
+    assert _saved_model(isolated_training)["categorical_encoding"] == "native"
@@ -0,0 +1,51 @@
+# test_cross_validation.py
+import json
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import train_connection_classifier as training
+from cross_validation import cross_val_oof, oof_cache_key
+
+
+def test_key_depends_on_encoding():
+    keys = {
+        encoding: training._preprocess_cache_key("0" * 64, test_size=0.2, random_state=42,
+                                                 categorical_encoding=encoding)
+        for encoding in ("onehot", "native")
+    }
+    estimator = RandomForestClassifier(n_estimators=10, random_state=0)
+    assert oof_cache_key(keys["onehot"], estimator, 5, 42) != oof_cache_key(keys["native"], estimator, 5, 42)
+
+
+def test_cache_is_not_shared_across_training_matrices(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(120, 4)), np.repeat(np.arange(3), 40)
+    models = {"Random Forest": RandomForestClassifier(n_estimators=5, random_state=0)}
+
+    first = cross_val_oof(models, X, y, "onehot-key", tmp_path, n_splits=3, total_cpus=1)
+    again = cross_val_oof(models, X, y, "onehot-key", tmp_path, n_splits=3, total_cpus=1)
+    other = cross_val_oof(models, X, y, "native-key", tmp_path, n_splits=3, total_cpus=1)
+    assert not first["Random Forest"]["cached"]
+    assert again["Random Forest"]["cached"]
+    assert not other["Random Forest"]["cached"]
+    np.testing.assert_array_equal(first["Random Forest"]["proba"], again["Random Forest"]["proba"])
+
+
+def test_cached_predictions_of_other_length_are_refitted(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(120, 4)), np.repeat(np.arange(3), 40)
+    models = {"Random Forest": RandomForestClassifier(n_estimators=5, random_state=0)}
+
+    cross_val_oof(models, X, y, "same-key", tmp_path, n_splits=3, total_cpus=1)
+    subset = cross_val_oof(models, X[:90], y[:90], "same-key", tmp_path, n_splits=3, total_cpus=1)
+    assert not subset["Random Forest"]["cached"]
+    assert len(subset["Random Forest"]["proba"]) == 90
+
+
+def test_compression_holdout_does_not_reuse_full_split_oof(small_dataset, isolated_training):
+    training.main(dataset_path=small_dataset, cv_folds=2, model_cache=False)
+    training.main(dataset_path=small_dataset, cv_folds=2, compress_tolerance=0.01, model_cache=False)
+    results = sorted(isolated_training.glob("training_results_*.json"))
+    cv = json.loads(results[-1].read_text())["cross_validation"]["models"]
+    assert not any(model["cached"] for name, model in cv.items() if name != "Ensemble")
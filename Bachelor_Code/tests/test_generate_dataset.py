@@ -0,0 +1,215 @@
+# test_generate_dataset.py
+"""The columnar sampler and batch selection against the per-row reference implementation."""
+
+import math
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp
+
+import generate_dataset
+from generate_dataset import DIAMETER_OPTIONS, PREF_COLUMNS, _ordered_pool_map, sample_requests_batch
+from main import ShaftConnectionRequest, UserPreferences
+from make_prediction import (
+    CONNECTION_TYPES, calculate_required_torque, materials, select_shaft_connection,
+    select_shaft_connection_batch,
+)
+
+N_SAMPLES = 10_000
+
+
+# Per-row sampler the dataset generator used before sample_requests_batch
+
+def random_user_prefs(rng: np.random.Generator) -> UserPreferences:
+    def pref() -> float:
+        return float(rng.integers(0, 11)) / 10.0  # 0.0..1.0 step 0.1
+
+    return UserPreferences(
+        ease=pref(), movement=pref(), cost=pref(), vibration=pref(),
+        speed=pref(), maintenance=pref(), bidirectional=pref(), durability=pref(),
+    )
+
+
+def sample_required_torque(rng: np.random.Generator, d_mm: float, shaft_material: str):
+    ref_T = calculate_required_torque(d_mm, shaft_material)
+    factor = float(rng.uniform(0.3, 1.4))
+    return round(ref_T * factor, 0), factor
+
+
+def sample_safety_factor_1dp(rng, has_bending, surface_condition, mu_override, torque_factor, prefs) -> float:
+    sf = rng.normal(1.5, 0.12)
+    if has_bending:
+        sf += 0.10
+    if surface_condition == "dry":
+        sf += 0.05
+    elif surface_condition == "oiled":
+        sf -= 0.03
+    if mu_override is not None:
+        sf -= 0.05
+    if torque_factor is not None:
+        sf += 0.20 * max(0.0, torque_factor - 1.0)
+    sf += 0.20 * (prefs.durability - 0.5)
+    sf += 0.10 * (prefs.bidirectional - 0.5)
+    sf -= 0.15 * (prefs.cost - 0.5)
+    sf = min(max(sf, 1.0), 2.0)
+    return round(float(sf), 1)
+
+
+def sample_diameter_user_like(rng) -> float:
+    typical = DIAMETER_OPTIONS[(DIAMETER_OPTIONS >= 20) & (DIAMETER_OPTIONS <= 60)]
+    mid = DIAMETER_OPTIONS[(DIAMETER_OPTIONS > 60) & (DIAMETER_OPTIONS <= 120)]
+    tails = DIAMETER_OPTIONS[(DIAMETER_OPTIONS < 20) | (DIAMETER_OPTIONS > 120)]
+    u = rng.random()
+    if u < 0.70:
+        return float(rng.choice(typical))
+    elif u < 0.95:
+        return float(rng.choice(mid))
+    return float(rng.choice(tails))
+
+
+def sample_request(rng: np.random.Generator) -> ShaftConnectionRequest:
+    d = sample_diameter_user_like(rng)
+    has_bending = bool(rng.random() < 0.7)
+    if has_bending:
+        hub_length = float(d * rng.uniform(0.9, 1.3))
+    else:
+        hub_length = float(d * rng.uniform(0.4, 0.8))
+
+    shaft_type = "hollow" if rng.random() < 0.2 else "solid"
+    material = rng.choice(list(materials.keys()))
+    surface_condition = rng.choice(["dry", "oiled"])
+    mu_override = None
+    if rng.random() < 0.15:
+        mu_override = round(float(rng.uniform(0.05, 0.25)), 2)
+
+    if shaft_type == "hollow":
+        shaft_inner = round(float(d * rng.uniform(0.3, 0.6)), 0)
+        hub_outer = round(float(d * rng.uniform(1.8, 2.6)), 0)
+        if has_bending:
+            hub_outer = round(hub_outer * rng.uniform(1.05, 1.15), 0)
+    else:
+        shaft_inner = None
+        hub_outer = float(d * rng.uniform(1.8, 2.6))
+        if has_bending:
+            hub_outer *= rng.uniform(1.05, 1.15)
+        hub_outer = round(hub_outer, 0)
+
+    prefs = random_user_prefs(rng)
+    req_torque, torque_factor = sample_required_torque(rng, d, material)
+    safety_factor = sample_safety_factor_1dp(rng, has_bending, surface_condition, mu_override, torque_factor, prefs)
+    return ShaftConnectionRequest(
+        shaft_diameter=d, hub_length=round(hub_length, 0), shaft_material=material, hub_material=material,
+        shaft_type=shaft_type, has_bending=has_bending, required_torque=req_torque, user_preferences=prefs,
+        safety_factor=safety_factor, surface_condition=surface_condition, hub_outer_diameter=hub_outer,
+        shaft_inner_diameter=shaft_inner, mu_override=mu_override,
+    )
+
+
+def _columns(requests) -> dict:
+    """Per-row requests as the columns sample_requests_batch returns."""
+    def column(get):
+        return np.array([get(r) for r in requests])
+
+    def nan_if_none(value):
+        return np.nan if value is None else value
+
+    cols = {
+        name: column(lambda r, name=name: getattr(r, name))
+        for name in ("shaft_diameter", "hub_length", "shaft_type", "shaft_material", "hub_material",
+                     "surface_condition", "hub_outer_diameter", "required_torque", "safety_factor")
+    }
+    cols["has_bending"] = column(lambda r: float(r.has_bending))
+    cols["mu_override"] = column(lambda r: nan_if_none(r.mu_override)).astype(float)
+    cols["shaft_inner_diameter"] = column(lambda r: nan_if_none(r.shaft_inner_diameter)).astype(float)
+    for col in PREF_COLUMNS:
+        cols[col] = column(lambda r, field=col[len("pref_"):]: getattr(r.user_preferences, field))
+    return cols
+
+
+@pytest.fixture(scope="module")
+def reference_columns():
+    rng = np.random.default_rng(0)
+    return _columns([sample_request(rng) for _ in range(N_SAMPLES)])
+
+
+@pytest.fixture(scope="module")
+def batch_columns():
+    return sample_requests_batch(np.random.default_rng(1), N_SAMPLES)
+
+
+def _frequencies(values) -> dict:
+    labels, counts = np.unique(values, return_counts=True)
+    return dict(zip(labels.tolist(), (counts / counts.sum()).tolist()))
+
+
+@pytest.mark.parametrize("column", ["shaft_diameter", "shaft_type", "shaft_material", "has_bending",
+                                    "surface_condition", "safety_factor", *PREF_COLUMNS])
+def test_discrete_marginals_match_reference(reference_columns, batch_columns, column):
+    expected, actual = _frequencies(reference_columns[column]), _frequencies(batch_columns[column])
+    for value in set(expected) | set(actual):
+        assert actual.get(value, 0.0) == pytest.approx(expected.get(value, 0.0), abs=0.02)
+
+
+@pytest.mark.parametrize("column", ["mu_override", "shaft_inner_diameter"])
+def test_optional_columns_match_reference(reference_columns, batch_columns, column):
+    def present(cols):
+        values = cols[column] if column == "mu_override" else cols[column] / cols["shaft_diameter"]
+        return values[~np.isnan(values)]
+
+    ref, batch = present(reference_columns), present(batch_columns)
+    assert len(batch) / N_SAMPLES == pytest.approx(len(ref) / N_SAMPLES, abs=0.02)
+    assert ks_2samp(ref, batch).pvalue > 1e-3
+
+
+@pytest.mark.parametrize("column", ["hub_length", "hub_outer_diameter", "required_torque"])
+def test_continuous_marginals_match_reference(reference_columns, batch_columns, column):
+    # Relative to the diameter (torque: to d^3), so the KS test compares the conditional sampling
+    power = 3 if column == "required_torque" else 1
+    ref = reference_columns[column] / reference_columns["shaft_diameter"] ** power
+    batch = batch_columns[column] / batch_columns["shaft_diameter"] ** power
+    assert ks_2samp(ref, batch).pvalue > 1e-3
+
+
+def test_batch_selection_matches_per_row_engine():
+    rng = np.random.default_rng(2)
+    requests = [sample_request(rng) for _ in range(500)]
+    batch = select_shaft_connection_batch(_columns(requests))
+    for i, request in enumerate(requests):
+        result = select_shaft_connection(request)
+        assert batch["recommended_connection"][i] == result["recommended_connection"]
+        for conn in CONNECTION_TYPES:
+            assert batch[f"cap_{conn}"][i] == pytest.approx(result["capacities_Nmm"][conn], rel=1e-9)
+        assert batch["mu_used"][i] == pytest.approx(result["mu_used"])
+        assert math.isclose(batch["M_design_Nmm"][i], result["M_design_Nmm"], rel_tol=1e-9)
+
+
+def _slow_task(task):
+    marker_dir, i = task
+    time.sleep(0.2)
+    (marker_dir / f"{i}.done").touch()
+    return i
+
+
+def test_closing_pool_map_cancels_pending_tasks(tmp_path):
+    results = _ordered_pool_map(_slow_task, [(tmp_path, i) for i in range(20)], workers=2)
+    assert next(results) == 0
+    results.close()
+    # The pool is shut down when close() returns: nothing runs afterwards
+    started = len(list(tmp_path.glob("*.done")))
+    time.sleep(0.5)
+    assert len(list(tmp_path.glob("*.done"))) == started < 20
+    assert not multiprocessing.active_children()
+
+
+def test_filled_quotas_stop_the_worker_pool(tmp_path, monkeypatch):
+    alive = []
+    monkeypatch.setattr(generate_dataset, "_save_summary",
+                        lambda *args: alive.append(len(multiprocessing.active_children())))
+    manifest = generate_dataset.generate_dataset(
+        n_samples=40_000, chunk_size=1000, workers=2, output_file=tmp_path / "quota.csv",
+        class_quotas={"press": 100, "key": 100, "spline": 100},
+    )
+    assert len(manifest["chunks"]) < 40
+    assert alive == [0]
@@ -0,0 +1,15 @@
+# test_import_time.py
+import pytest
+
+from benchmark_import_time import DEFAULT_BUDGETS_MS, FORBIDDEN_IMPORTS, check_module, run_importtime
+
+
+@pytest.mark.parametrize("module", sorted(DEFAULT_BUDGETS_MS))
+def test_import_within_budget(module):
+    assert check_module(module, DEFAULT_BUDGETS_MS[module], top=0)
+
+
+@pytest.mark.parametrize("module", sorted(FORBIDDEN_IMPORTS))
+def test_heavy_libraries_are_imported_lazily(module):
+    imported = {name for name, _, _ in run_importtime(module)}
+    assert not imported & set(FORBIDDEN_IMPORTS[module])
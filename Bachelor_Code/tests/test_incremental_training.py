@@ -0,0 +1,75 @@
+# test_incremental_training.py
+import joblib
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+import incremental_training
+import train_connection_classifier as training
+from dataset_schema import deduplicate, read_dataset, row_hashes
+
+
+def test_warm_start_rewrites_all_holdout_metrics(small_dataset, isolated_training):
+    # Loaded as incremental_training loads it, so the row hashes match
+    df, _ = deduplicate(read_dataset(small_dataset))
+    df, _, _ = training.clean_dataset(df)
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    classes = sorted(df["label"].astype(str).unique())
+    y = df["label"].astype(str).map({label: i for i, label in enumerate(classes)}).to_numpy()
+    old, holdout = np.arange(len(df)) % 3 == 0, np.arange(len(df)) % 3 == 1
+
+    preprocessor = training._build_preprocessor().fit(df.loc[old, features])
+    model = training._build_models()["LightGBM"].set_params(n_estimators=20, verbose=-1)
+    model.fit(preprocessor.transform(df.loc[old, features]), y[old])
+    models = isolated_training / "models"
+    joblib.dump(Pipeline([("preprocess", preprocessor), ("model", model)]), models / "connection_classifier.pkl")
+    stale = {"accuracy": 0.0, "precision_macro": 0.0, "recall_macro": 0.0, "f1_macro": 0.0,
+             "confusion_matrix": [[0]]}
+    joblib.dump({"features": features, "classes": classes, "best_model": "LightGBM", "best_metrics": stale},
+                models / "connection_classifier_meta.pkl")
+    hashes = row_hashes(df[features + ["label"]])
+    np.savez(models / training.ROWS_FILE, train=hashes[old], holdout=hashes[holdout])
+
+    incremental_training.main(dataset_path=small_dataset, tolerance=1.0)
+
+    updated = joblib.load(models / "connection_classifier.pkl")
+    meta = joblib.load(models / "connection_classifier_meta.pkl")
+    assert len(meta["incremental_updates"]) == 1
+    expected = training.holdout_metrics(y[holdout], updated.predict(df.loc[holdout, features]))
+    assert meta["best_metrics"] == expected
+    assert np.sum(meta["best_metrics"]["confusion_matrix"]) == holdout.sum()
+
+
+def _saved_run(small_dataset, models_dir, **meta):
+    """Saved run whose model does not know a label of the new rows (rows after the first 600)."""
+    df, _ = deduplicate(read_dataset(small_dataset))
+    df, _, _ = training.clean_dataset(df)
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    classes = sorted(set(df["label"].astype(str)) - {df["label"].astype(str).iloc[-1]})
+    # The warm start is rejected before the model is used
+    joblib.dump("unused", models_dir / "connection_classifier.pkl")
+    joblib.dump({"features": features, "classes": classes, "best_model": "LightGBM", **meta},
+                models_dir / "connection_classifier_meta.pkl")
+    hashes = row_hashes(df[features + ["label"]])
+    np.savez(models_dir / training.ROWS_FILE, train=hashes[:300], holdout=hashes[300:600])
+
+
+def test_full_retrain_repeats_the_original_options(small_dataset, isolated_training, monkeypatch):
+    options = {"ensemble_weights": "learned", "cpus": None, "parallel_models": None, "search_budget": None,
+               "cv_folds": 3, "slo": {"single_row_p99_ms": 5.0}, "categorical_encoding": "native",
+               "model_cache": False, "compress_tolerance": 0.01}
+    _saved_run(small_dataset, isolated_training / "models", training_options=options)
+
+    retrains = []
+    monkeypatch.setattr(training, "main", lambda **kwargs: retrains.append(kwargs))
+    incremental_training.main(dataset_path=small_dataset)
+    assert retrains == [{"dataset_path": small_dataset, **options}]
+
+
+def test_full_retrain_options_from_older_metadata(small_dataset, isolated_training, monkeypatch):
+    _saved_run(small_dataset, isolated_training / "models", categorical_encoding="native",
+               slo={}, compression={"tolerance": 0.02})
+
+    retrains = []
+    monkeypatch.setattr(training, "main", lambda **kwargs: retrains.append(kwargs))
+    incremental_training.main(dataset_path=small_dataset)
+    assert retrains == [{"dataset_path": small_dataset, "categorical_encoding": "native", "compress_tolerance": 0.02}]
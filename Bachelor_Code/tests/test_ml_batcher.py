@@ -0,0 +1,124 @@
+# test_ml_batcher.py
+import asyncio
+import time
+
+import pytest
+
+import model_service
+from ml_batcher import MicroBatcher
+
+# Upper bound for any await in these tests, so a lost future fails instead of hanging
+TIMEOUT_S = 5.0
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Fake batch prediction: records every batch and echoes the row ids."""
+    seen = []
+
+    def predict_batch(rows):
+        seen.append([row["id"] for row in rows])
+        return [{"id": row["id"]} for row in rows]
+
+    monkeypatch.setattr(model_service, "predict_connection_batch", predict_batch)
+    return seen
+
+
+def _submit_all(batcher, n):
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.predict({"id": i}) for i in range(n))), TIMEOUT_S
+        )
+    return asyncio.run(run())
+
+
+def test_concurrent_submitters_get_their_own_results_in_order(batches):
+    results = _submit_all(MicroBatcher(max_wait_ms=20, max_batch_size=8), 50)
+    assert [result["id"] for result in results] == list(range(50))
+    assert [i for batch in batches for i in batch] == list(range(50))
+    assert max(len(batch) for batch in batches) <= 8
+
+
+def test_full_batch_is_flushed_without_waiting(batches):
+    batcher = MicroBatcher(max_wait_ms=2000, max_batch_size=4)
+    start = time.perf_counter()
+    _submit_all(batcher, 10)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_partial_batch_is_flushed_after_the_window(batches):
+    batcher = MicroBatcher(max_wait_ms=50, max_batch_size=64)
+    # Under load: the window is capped at max_wait instead of waiting for a full batch
+    batcher._interarrival_s = 0.001
+    start = time.perf_counter()
+    results = _submit_all(batcher, 3)
+    elapsed = time.perf_counter() - start
+    assert [result["id"] for result in results] == [0, 1, 2]
+    assert batches == [[0, 1, 2]]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_window_adapts_to_arrival_rate():
+    batcher = MicroBatcher(max_wait_ms=10, max_batch_size=16)
+    # Light load: nobody to wait for
+    assert batcher._window_s(1) == 0.0
+    now = 0.0
+    for _ in range(50):
+        now += 0.0002
+        batcher._record_arrival(now)
+    assert batcher._window_s(1) == pytest.approx(batcher._interarrival_s * 15)
+    assert batcher._window_s(1) < batcher.max_wait_s
+    # Inter-arrival times this short would want longer than max_wait for a full batch
+    batcher._interarrival_s = 0.005
+    assert batcher._window_s(1) == pytest.approx(batcher.max_wait_s)
+
+
+def test_failed_batch_answers_every_caller(monkeypatch):
+    calls = []
+
+    def predict_batch(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise RuntimeError("model crashed")
+        return [{"id": row["id"]} for row in rows]
+
+    monkeypatch.setattr(model_service, "predict_connection_batch", predict_batch)
+    batcher = MicroBatcher(max_wait_ms=20, max_batch_size=8)
+
+    async def run():
+        failed = await asyncio.wait_for(
+            asyncio.gather(*(batcher.predict({"id": i}) for i in range(5))), TIMEOUT_S
+        )
+        # The worker survives the failure
+        recovered = await asyncio.wait_for(batcher.predict({"id": 7}), TIMEOUT_S)
+        return failed, recovered
+
+    failed, recovered = asyncio.run(run())
+    assert failed == [None] * 5
+    assert recovered == {"id": 7}
+
+
+def test_short_prediction_list_answers_every_caller(monkeypatch):
+    monkeypatch.setattr(model_service, "predict_connection_batch", lambda rows: [{"id": 0}])
+    assert _submit_all(MicroBatcher(max_wait_ms=20, max_batch_size=8), 4) == [None] * 4
+
+
+def test_close_drains_queued_requests(batches):
+    batcher = MicroBatcher(max_wait_ms=2000, max_batch_size=2)
+
+    async def run():
+        pending = [asyncio.ensure_future(batcher.predict({"id": i})) for i in range(5)]
+        # Let every request reach the queue
+        await asyncio.sleep(0)
+        await asyncio.wait_for(batcher.close(), TIMEOUT_S)
+        drained = [task.result() for task in pending]
+        # A request after close starts a new worker
+        again = await asyncio.wait_for(batcher.predict({"id": 9}), TIMEOUT_S)
+        await batcher.close()
+        return drained, again
+
+    drained, again = asyncio.run(run())
+    assert [result["id"] for result in drained] == list(range(5))
+    assert again == {"id": 9}
+    assert [i for batch in batches for i in batch] == [0, 1, 2, 3, 4, 9]
@@ -0,0 +1,79 @@
+# test_model_compression.py
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_compression
+import train_connection_classifier as training
+
+
+@pytest.fixture(scope="module")
+def fitted_models(small_dataset, tmp_path_factory):
+    df, _, _ = training.clean_dataset(pd.read_csv(small_dataset))
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    y = df["label"].astype("category").cat.codes.to_numpy()
+    Xt = training._build_preprocessor().fit_transform(df[features])
+    models = training._build_models()
+    models["CatBoost"].set_params(train_dir=str(tmp_path_factory.mktemp("catboost_info")))
+    return {name: model.set_params(n_estimators=20).fit(Xt, y) for name, model in models.items()}, Xt
+
+
+@pytest.mark.parametrize("name", ["Random Forest", "XGBoost", "LightGBM", "CatBoost"])
+def test_keep_trees(fitted_models, name):
+    models, Xt = fitted_models
+    trimmed = model_compression.keep_trees(models[name], 5)
+    assert model_compression.n_trees(trimmed) == 5
+    assert model_compression.n_trees(models[name]) == 20
+    assert trimmed.predict_proba(Xt).shape == (len(Xt), 3)
+
+
+def test_limit_depth(fitted_models):
+    models, Xt = fitted_models
+    forest = models["Random Forest"]
+    deepest = model_compression.max_depth(forest)
+    np.testing.assert_allclose(model_compression.limit_depth(forest, deepest).predict_proba(Xt),
+                               forest.predict_proba(Xt))
+    shallow = model_compression.limit_depth(forest, 3)
+    assert model_compression.max_depth(shallow) <= 3
+    assert sum(t.tree_.node_count for t in shallow.estimators_) < sum(t.tree_.node_count for t in forest.estimators_)
+
+
+def test_quantize_float32(fitted_models):
+    models, Xt = fitted_models
+    quantized = model_compression.quantize_float32(models["LightGBM"])
+    np.testing.assert_allclose(quantized.predict_proba(Xt), models["LightGBM"].predict_proba(Xt), atol=1e-5)
+    assert model_compression.quantize_float32(models["XGBoost"]) is None
+
+
+def test_training_tunes_compression_on_held_out_training_rows(small_dataset, isolated_training, monkeypatch):
+    seen = {}
+    compress, train_candidates = training.compress_pipeline, training.train_candidates
+
+    def spy_compress(pipeline, X, y, *args, **kwargs):
+        seen["compress_rows"] = set(X.index)
+        return compress(pipeline, X, y, *args, **kwargs)
+
+    def spy_train(models, X, y, **kwargs):
+        seen["fit_rows"] = len(y)
+        return train_candidates(models, X, y, **kwargs)
+
+    monkeypatch.setattr(training, "compress_pipeline", spy_compress)
+    monkeypatch.setattr(training, "train_candidates", spy_train)
+    training.main(dataset_path=small_dataset, compress_tolerance=0.01, model_cache=False)
+
+    results = json.loads(next(isolated_training.glob("training_results_*.json")).read_text())
+    stats, compression = results["dataset_statistics"], results["compression"]
+    assert compression["validation_rows"] == len(seen["compress_rows"])
+    # Compression rows come out of the training split and no candidate is fitted on them
+    assert seen["fit_rows"] + compression["validation_rows"] == stats["train_samples"]
+    assert results["best_model"]["f1_macro"] == compression["test_f1_macro_after"]
+    # The whole evaluation block describes the compressed model
+    metrics = results["best_model"]["metrics"]
+    report = metrics["classification_report"]
+    assert report["macro avg"]["f1-score"] == pytest.approx(metrics["f1_macro"])
+    assert report["weighted avg"]["f1-score"] == pytest.approx(metrics["f1_weighted"])
+    assert report["accuracy"] == pytest.approx(metrics["accuracy"])
+    for label, per_class in metrics["per_class_metrics"].items():
+        assert per_class["f1_score"] == pytest.approx(report[label]["f1-score"])
@@ -0,0 +1,104 @@
+# test_model_service.py
+import importlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+
+import model_service
+import train_connection_classifier as training
+
+
+@pytest.fixture
+def served_model(small_dataset, tmp_path, monkeypatch):
+    """Small weighted soft-voting pipeline saved where model_service loads it from."""
+    df, _, _ = training.clean_dataset(pd.read_csv(small_dataset))
+    features = training.FEATURE_NUMERIC + training.CATEGORICAL
+    classes = sorted(df["label"].astype(str).unique())
+    y = df["label"].astype(str).map({label: i for i, label in enumerate(classes)}).to_numpy()
+    preprocessor = training._build_preprocessor().fit(df[features])
+    Xt = preprocessor.transform(df[features])
+    models = training._build_models()
+    fitted = {}
+    for name in ("Random Forest", "LightGBM", "CatBoost"):
+        estimator = models[name].set_params(n_estimators=10)
+        if name == "CatBoost":
+            estimator.set_params(train_dir=str(tmp_path / "catboost_info"))
+        fitted[name] = estimator.fit(Xt, y)
+    voting = training.build_prefit_voting(fitted, y, weights=[0.5, 0.3, 0.2])
+    pipeline = Pipeline([("preprocess", preprocessor), ("voting", voting)])
+
+    model_path, meta_path = tmp_path / "model.pkl", tmp_path / "meta.pkl"
+    joblib.dump(pipeline, model_path)
+    joblib.dump({"features": features, "numeric": training.FEATURE_NUMERIC, "classes": classes}, meta_path)
+    monkeypatch.setattr(model_service, "MODEL_PATH", model_path)
+    monkeypatch.setattr(model_service, "META_PATH", meta_path)
+    monkeypatch.setattr(model_service, "_models", {})
+    return pipeline, df[features]
+
+
+def _member_threads(model):
+    return {type(member).__name__: member.get_params().get("n_jobs") for member in model.steps[-1][1].estimators_}
+
+
+def test_budgets_use_separate_model_copies(served_model):
+    single, _ = model_service._load_model(1)
+    batch, _ = model_service._load_model(4)
+    assert single is not batch
+    assert _member_threads(single) == {"RandomForestClassifier": 1, "LGBMClassifier": 1, "CatBoostClassifier": None}
+    assert _member_threads(batch)["LGBMClassifier"] == 4
+
+
+def test_preprocessing_stays_sequential(served_model):
+    pipeline, _ = served_model
+    pipeline.named_steps["preprocess"].set_params(n_jobs=4)
+    joblib.dump(pipeline, model_service.MODEL_PATH)
+    batch, _ = model_service._load_model(model_service.BATCH_THREADS)
+    assert batch.named_steps["preprocess"].n_jobs is None
+
+
+def test_concurrent_requests_keep_thread_settings(served_model, monkeypatch):
+    _, X = served_model
+    monkeypatch.setattr(model_service, "BATCH_THREADS", 4)
+    rows = X.head(8).to_dict("records")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        calls = [pool.submit(model_service.predict_connection, rows[0]) for _ in range(20)]
+        calls += [pool.submit(model_service.predict_connection_batch, rows) for _ in range(20)]
+        results = [call.result() for call in calls]
+    assert all(result is not None for result in results)
+    single, _ = model_service._load_model(model_service.SINGLE_ROW_THREADS)
+    assert _member_threads(single)["LGBMClassifier"] == model_service.SINGLE_ROW_THREADS
+
+
+def test_weighted_voting_matches_predict_proba(served_model):
+    pipeline, X = served_model
+    expected = pipeline.predict_proba(X.head(20))
+    np.testing.assert_allclose(model_service._predict_proba(pipeline, X.head(20), 1), expected)
+
+
+def test_import_leaves_thread_environment_alone(monkeypatch):
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        monkeypatch.delenv(var, raising=False)
+    importlib.reload(model_service)
+    assert "OMP_NUM_THREADS" not in os.environ
+
+
+def test_non_positive_single_budget_means_library_defaults(monkeypatch):
+    monkeypatch.setenv("ML_THREADS_SINGLE", "0")
+    importlib.reload(model_service)
+    assert model_service.SINGLE_ROW_THREADS == -1
+    monkeypatch.delenv("ML_THREADS_SINGLE")
+    importlib.reload(model_service)
+
+
+def test_library_defaults_leave_thread_environment_alone(served_model, monkeypatch):
+    _, X = served_model
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    monkeypatch.setattr(model_service, "SINGLE_ROW_THREADS", -1)
+    assert model_service.predict_connection(X.iloc[0].to_dict()) is not None
+    assert "OMP_NUM_THREADS" not in os.environ
+    assert _member_threads(model_service._load_model(-1)[0])["LGBMClassifier"] == -1
@@ -0,0 +1,29 @@
+# test_training_scheduler.py
+import pytest
+from catboost import CatBoostClassifier
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from training_scheduler import cpu_budgets, set_thread_budget
+
+
+def test_catboost_thread_count_is_set():
+    estimator = CatBoostClassifier(verbose=0)
+    assert "thread_count" not in estimator.get_params()
+    set_thread_budget(estimator, 3)
+    assert estimator.get_params()["thread_count"] == 3
+
+
+@pytest.mark.parametrize("estimator", [
+    RandomForestClassifier(n_jobs=-1), XGBClassifier(n_jobs=-1), LGBMClassifier(n_jobs=-1),
+])
+def test_n_jobs_is_set(estimator):
+    set_thread_budget(estimator, 2)
+    assert estimator.get_params()["n_jobs"] == 2
+
+
+def test_budgets_use_all_cpus():
+    budgets = cpu_budgets(["a", "b", "c"], total_cpus=8)
+    assert sum(budgets.values()) == 8
+    assert budgets == {"a": 3, "b": 3, "c": 2}
@@ -2,8 +2,11 @@
 
 from pathlib import Path
 from datetime import datetime
+import argparse
+import hashlib
 import json
 import logging
+import os
 import time
 
 import joblib
@@ -20,7 +23,9 @@ from sklearn.ensemble import RandomForestClassifier, VotingClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler, LabelEncoder
+from sklearn.utils import Bunch
 from sklearn.metrics import (
+    log_loss,
     accuracy_score,
     precision_score,
     recall_score,
@@ -33,11 +38,32 @@ from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 from catboost import CatBoostClassifier
 
+from categorical_encoding import CategoricalCodes
+from cross_validation import cross_val_oof, oof_report
+from dataset_schema import content_hash, deduplicate, read_dataset, row_hashes
+from hyperparameter_search import search_hyperparameters
+from model_cache import load_model, model_cache_key, store_model
+from model_compression import compress_pipeline
+from serving_benchmark import benchmark_candidate, select_within_slo, slo_violations
+from training_scheduler import FitResult, cpu_budgets, train_candidates
+
 MODEL_DIR = Path(__file__).parent / "models"
 MODEL_DIR.mkdir(exist_ok=True)
 DATASET_PATH = Path(__file__).parent / "synthetic_SHC_dataset.csv"
 RESULTS_DIR = Path(__file__).parent
 RESULTS_DIR.mkdir(exist_ok=True)
+# Share of the training split held out to learn ensemble weights (--ensemble-weights learned)
+ENSEMBLE_VALIDATION_SIZE = 0.15
+# Fitted preprocessing and transformed matrices, keyed by dataset hash and split;
+# also holds OOF predictions (oof/) and fitted candidates (models/, see model_cache)
+CACHE_DIR = Path(__file__).parent / ".training_cache"
+# Row hashes of the training and test split (incremental_training.py uses them to
+# find new rows and to keep evaluating on the same holdout)
+ROWS_FILE = "connection_classifier_rows.npz"
+# Share of the fit split used as validation set by the hyperparameter search (--search-budget)
+SEARCH_VALIDATION_SIZE = 0.2
+# Share of the training split held out from every candidate to tune compression (--compress-tolerance)
+COMPRESSION_VALIDATION_SIZE = 0.15
 
 # Setup logging
 def setup_logging():
@@ -99,10 +125,44 @@ CATEGORICAL = [
 ]
 
 
-def _build_preprocessor():
+def clean_dataset(df: pd.DataFrame):
+    """
+    Fill the expected NaNs and drop rows missing critical geometry / label.
+
+    Returns (cleaned frame, NaNs filled in shaft_inner_diameter, rows dropped).
+    """
+    nan_count = 0
+    # Handle expected NaNs: shaft_inner_diameter is None for solid shafts
+    if "shaft_inner_diameter" in df.columns:
+        nan_count = int(df["shaft_inner_diameter"].isna().sum())
+        df["shaft_inner_diameter"] = df["shaft_inner_diameter"].fillna(0.0)
+
+    # Basic guard: drop rows missing critical geometry/label
+    required_cols = ["shaft_diameter", "hub_length", "required_torque", "label"]
+    rows_before_drop = len(df)
+    df = df.dropna(subset=required_cols)
+    return df, nan_count, rows_before_drop - len(df)
+
+
+def _build_preprocessor(categorical_encoding: str = "onehot"):
+    """
+    onehot: dense one-hot columns per category (numpy output).
+    native: one integer-code column per categorical feature (pandas output with
+    category dtype) for the libraries' native categorical splits.
+    """
     numeric_transformer = Pipeline(
         steps=[("scaler", StandardScaler())]
     )
+    if categorical_encoding == "native":
+        return ColumnTransformer(
+            transformers=[
+                ("num", numeric_transformer, FEATURE_NUMERIC),
+                ("cat", CategoricalCodes(), CATEGORICAL),
+            ],
+            remainder="drop",
+            verbose_feature_names_out=False,
+        ).set_output(transform="pandas")
+
     categorical_transformer = Pipeline(
         steps=[("ohe", OneHotEncoder(handle_unknown="ignore", sparse_output=False))]
     )
@@ -116,7 +176,160 @@ def _build_preprocessor():
     )
 
 
-def _build_models():
+def _preprocess_cache_key(dataset_sha256: str, test_size: float, random_state: int,
+                          categorical_encoding: str = "onehot") -> str:
+    """Key of the preprocessing cache: dataset content, split and preprocessor configuration."""
+    config = {
+        "dataset_sha256": dataset_sha256,
+        "test_size": test_size,
+        "random_state": random_state,
+        "numeric": FEATURE_NUMERIC,
+        "categorical": CATEGORICAL,
+        "preprocessor": repr(_build_preprocessor(categorical_encoding)),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def fit_preprocessing(X_train: pd.DataFrame, X_test: pd.DataFrame, cache_key: str, logger=None,
+                      categorical_encoding: str = "onehot"):
+    """
+    Fit the preprocessor once and transform the train / test split.
+
+    The fitted preprocessor and both matrices are cached under CACHE_DIR by
+    cache_key (.npy, or Parquet for the native encoding's category columns),
+    so repeated runs on the same dataset and split load them instead of
+    refitting. Returns (fitted preprocessor, Xt_train, Xt_test).
+    """
+    native = categorical_encoding == "native"
+    suffix = ".parquet" if native else ".npy"
+    load = pd.read_parquet if native else np.load
+    cache_dir = CACHE_DIR / f"preprocess_{cache_key[:16]}"
+    files = [cache_dir / "preprocessor.joblib", cache_dir / f"Xt_train{suffix}", cache_dir / f"Xt_test{suffix}"]
+    if all(f.exists() for f in files):
+        if logger:
+            logger.info(f"Loaded cached preprocessing from {cache_dir}")
+        preprocessor, Xt_train, Xt_test = joblib.load(files[0]), load(files[1]), load(files[2])
+        if native:
+            # Parquet returns the codes as plain integers; LightGBM / XGBoost need the
+            # same category dtype the fitted preprocessor produces at serving time
+            dtypes = preprocessor.named_transformers_["cat"].output_dtypes()
+            Xt_train, Xt_test = Xt_train.astype(dtypes), Xt_test.astype(dtypes)
+        return preprocessor, Xt_train, Xt_test
+
+    preprocessor = _build_preprocessor(categorical_encoding)
+    Xt_train = preprocessor.fit_transform(X_train)
+    Xt_test = preprocessor.transform(X_test)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(preprocessor, files[0])
+    if native:
+        # Positional index, as after loading from the cache
+        Xt_train, Xt_test = Xt_train.reset_index(drop=True), Xt_test.reset_index(drop=True)
+        Xt_train.to_parquet(files[1], index=False)
+        Xt_test.to_parquet(files[2], index=False)
+    else:
+        np.save(files[1], Xt_train)
+        np.save(files[2], Xt_test)
+    if logger:
+        logger.info(f"Fitted preprocessing once ({Xt_train.shape[1]} features) and cached it in {cache_dir}")
+    return preprocessor, Xt_train, Xt_test
+
+
+def build_prefit_voting(fitted: dict, y_train: np.ndarray, weights=None) -> VotingClassifier:
+    """
+    Soft-voting ensemble assembled from already fitted base models (no refit).
+
+    Sets the attributes VotingClassifier.fit would set, so predict,
+    predict_proba and model_service's per-estimator path work unchanged.
+    """
+    voting = VotingClassifier(estimators=list(fitted.items()), voting="soft", weights=weights)
+    voting.estimators_ = list(fitted.values())
+    voting.named_estimators_ = Bunch(**fitted)
+    voting.le_ = LabelEncoder().fit(y_train)
+    voting.classes_ = voting.le_.classes_
+    return voting
+
+
+def holdout_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
+    """Headline metrics kept in the model metadata: accuracy, macro P / R / F1, confusion matrix."""
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "precision_macro": float(precision_score(y_true, y_pred, average="macro", zero_division=0)),
+        "recall_macro": float(recall_score(y_true, y_pred, average="macro", zero_division=0)),
+        "f1_macro": float(f1_score(y_true, y_pred, average="macro", zero_division=0)),
+        "confusion_matrix": confusion_matrix(y_true, y_pred).tolist(),
+    }
+
+
+def evaluation_metrics(y_true: np.ndarray, y_pred: np.ndarray, class_names) -> dict:
+    """Full test-split evaluation of a candidate as written to the results JSON."""
+    prec_per_class = precision_score(y_true, y_pred, average=None, zero_division=0)
+    rec_per_class = recall_score(y_true, y_pred, average=None, zero_division=0)
+    f1_per_class = f1_score(y_true, y_pred, average=None, zero_division=0)
+    headline = holdout_metrics(y_true, y_pred)
+    return {
+        "accuracy": headline["accuracy"],
+        "precision_macro": headline["precision_macro"],
+        "recall_macro": headline["recall_macro"],
+        "f1_macro": headline["f1_macro"],
+        "precision_weighted": float(precision_score(y_true, y_pred, average="weighted", zero_division=0)),
+        "recall_weighted": float(recall_score(y_true, y_pred, average="weighted", zero_division=0)),
+        "f1_weighted": float(f1_score(y_true, y_pred, average="weighted", zero_division=0)),
+        "confusion_matrix": headline["confusion_matrix"],
+        "per_class_metrics": {
+            str(class_names[idx]): {
+                "precision": float(prec_per_class[idx]),
+                "recall": float(rec_per_class[idx]),
+                "f1_score": float(f1_per_class[idx]),
+            }
+            for idx in range(len(class_names))
+        },
+        "classification_report": classification_report(
+            y_true, y_pred, target_names=class_names, output_dict=True, zero_division=0
+        ),
+    }
+
+
+def log_evaluation(metrics: dict, logger, prefix: str = "") -> None:
+    """Log the metrics of evaluation_metrics (prefix e.g. "Ensemble ")."""
+    logger.info(f"{prefix}Accuracy: {metrics['accuracy']:.4f}")
+    logger.info(f"{prefix}Precision (macro): {metrics['precision_macro']:.4f}")
+    logger.info(f"{prefix}Recall (macro): {metrics['recall_macro']:.4f}")
+    logger.info(f"{prefix}F1-score (macro): {metrics['f1_macro']:.4f}")
+    logger.info(f"{prefix}Precision (weighted): {metrics['precision_weighted']:.4f}")
+    logger.info(f"{prefix}Recall (weighted): {metrics['recall_weighted']:.4f}")
+    logger.info(f"{prefix}F1-score (weighted): {metrics['f1_weighted']:.4f}")
+    logger.info(f"{prefix}Confusion Matrix:\n{np.asarray(metrics['confusion_matrix'])}")
+    logger.info(f"{prefix}per-class metrics:" if prefix else "Per-class metrics:")
+    for class_name, m in metrics["per_class_metrics"].items():
+        logger.info(f"  {class_name}: Precision={m['precision']:.4f}, "
+                    f"Recall={m['recall']:.4f}, F1={m['f1_score']:.4f}")
+
+
+def learn_ensemble_weights(probas: list, y_val: np.ndarray) -> np.ndarray:
+    """Voting weights minimizing the log loss of the averaged probabilities on a held-out split."""
+    from scipy.optimize import minimize
+
+    probas = np.asarray(probas)
+    labels = np.arange(probas.shape[2])
+
+    def loss(z):
+        # Softmax keeps the weights positive and summing to one
+        w = np.exp(z - z.max())
+        w /= w.sum()
+        return log_loss(y_val, np.tensordot(w, probas, axes=1), labels=labels)
+
+    z = minimize(loss, np.zeros(len(probas)), method="Nelder-Mead").x
+    w = np.exp(z - z.max())
+    return w / w.sum()
+
+
+def _build_models(categorical_encoding: str = "onehot"):
+    # native: XGBoost / LightGBM read the category dtype, CatBoost needs the columns named
+    native = categorical_encoding == "native"
+    xgb_categorical = {"enable_categorical": True} if native else {}
+    # A tuple: CatBoost copies list parameters, which sklearn.clone (CV, search) rejects
+    catboost_categorical = {"cat_features": tuple(CATEGORICAL)} if native else {}
     return {
         "Random Forest": RandomForestClassifier(
             n_estimators=150,
@@ -128,6 +341,7 @@ def _build_models():
             use_label_encoder=False,
             eval_metric="mlogloss",
             random_state=42,
+            **xgb_categorical,
         ),
         "LightGBM": LGBMClassifier(
             n_estimators=150,
@@ -137,6 +351,7 @@ def _build_models():
             n_estimators=150,
             verbose=0,
             random_state=42,
+            **catboost_categorical,
         ),
     }
 
@@ -233,7 +448,18 @@ def save_cm_heatmap(cm, labels, title, out_path):
     plt.close(fig)
 
 
-def main():
+def main(
+    dataset_path: Path = DATASET_PATH,
+    ensemble_weights: str = "equal",
+    cpus: int = None,
+    parallel_models: int = None,
+    search_budget: float = None,
+    cv_folds: int = None,
+    slo: dict = None,
+    categorical_encoding: str = "onehot",
+    model_cache: bool = True,
+    compress_tolerance: float = None,
+):
     # Setup logging
     logger, log_file = setup_logging()
     start_time = time.time()
@@ -248,9 +474,16 @@ def main():
     results = {
         "experiment_info": {
             "timestamp": timestamp,
-            "dataset_path": str(DATASET_PATH),
+            "dataset_path": str(dataset_path),
             "test_size": 0.2,
             "random_state": 42,
+            "ensemble_weights": ensemble_weights,
+            "search_budget_seconds": search_budget,
+            "cv_folds": cv_folds,
+            "slo": slo,
+            "categorical_encoding": categorical_encoding,
+            "model_cache": model_cache,
+            "compress_tolerance": compress_tolerance,
         },
         "dataset_statistics": {},
         "feature_configuration": {
@@ -265,27 +498,29 @@ def main():
     }
     
     logger.info("Loading dataset...")
-    df = pd.read_csv(DATASET_PATH)
-    logger.info(f"Loaded dataset with {len(df)} rows and {len(df.columns)} columns")
+    load_start = time.time()
+    df = read_dataset(dataset_path)
+    logger.info(f"Loaded dataset with {len(df)} rows and {len(df.columns)} columns "
+                f"in {time.time() - load_start:.2f} seconds "
+                f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory)")
     
     # Dataset statistics
     initial_rows = len(df)
     results["dataset_statistics"]["initial_rows"] = initial_rows
     results["dataset_statistics"]["initial_columns"] = len(df.columns)
+
+    # Exact duplicates (0.1-step preference grid, discrete diameters) carry no information
+    df, duplicate_rows = deduplicate(df)
+    dataset_sha256 = content_hash(df)
+    logger.info(f"Dropped {duplicate_rows} exact duplicate rows; dataset sha256 {dataset_sha256[:12]}")
+    results["dataset_statistics"]["duplicate_rows_dropped"] = duplicate_rows
+    results["experiment_info"]["dataset_sha256"] = dataset_sha256
     
-    # Handle expected NaNs: shaft_inner_diameter is None for solid shafts
+    df, nan_count, dropped_rows = clean_dataset(df)
+    rows_after_drop = len(df)
     if "shaft_inner_diameter" in df.columns:
-        nan_count = df["shaft_inner_diameter"].isna().sum()
-        df["shaft_inner_diameter"] = df["shaft_inner_diameter"].fillna(0.0)
         logger.info(f"Filled {nan_count} NaN values in 'shaft_inner_diameter' with 0.0 (solid shafts)")
         results["dataset_statistics"]["filled_nan_shaft_inner_diameter"] = int(nan_count)
-
-    # Basic guard: drop rows missing critical geometry/label
-    required_cols = ["shaft_diameter", "hub_length", "required_torque", "label"]
-    rows_before_drop = len(df)
-    df = df.dropna(subset=required_cols)
-    rows_after_drop = len(df)
-    dropped_rows = rows_before_drop - rows_after_drop
     if dropped_rows > 0:
         logger.warning(f"Dropped {dropped_rows} rows with missing required columns")
     results["dataset_statistics"]["rows_after_cleaning"] = rows_after_drop
@@ -312,6 +547,7 @@ def main():
         X, y, test_size=0.2, stratify=y, random_state=42
     )
     logger.info(f"Train set: {len(X_train)} samples, Test set: {len(X_test)} samples")
+    hashes = pd.Series(row_hashes(df[features + ["label"]]), index=df.index)
     results["dataset_statistics"]["train_samples"] = len(X_train)
     results["dataset_statistics"]["test_samples"] = len(X_test)
     
@@ -320,7 +556,7 @@ def main():
     numeric_stats = X_train[FEATURE_NUMERIC].describe().to_dict()
     categorical_counts = {}
     for cat_feat in CATEGORICAL:
-        categorical_counts[cat_feat] = X_train[cat_feat].value_counts().to_dict()
+        categorical_counts[cat_feat] = X_train[cat_feat].astype(str).value_counts().to_dict()
     results["dataset_statistics"]["numeric_feature_statistics"] = {
         k: {stat: float(v) for stat, v in stats.items()} 
         for k, stats in numeric_stats.items()
@@ -330,8 +566,57 @@ def main():
         for k, counts in categorical_counts.items()
     }
 
-    preprocessor = _build_preprocessor()
-    models = _build_models()
+    # Preprocessing is fitted once; every candidate trains on the same matrices
+    cache_key = _preprocess_cache_key(dataset_sha256, test_size=0.2, random_state=42,
+                                      categorical_encoding=categorical_encoding)
+    preprocessor, Xt_train, Xt_test = fit_preprocessing(X_train, X_test, cache_key, logger,
+                                                        categorical_encoding=categorical_encoding)
+    results["feature_configuration"]["encoded_features"] = int(Xt_train.shape[1])
+    Xt_fit, y_fit = Xt_train, y_train
+    # Key of the rows the candidates are fitted on (the OOF cache must not mix subsets)
+    fit_key = cache_key
+    if compress_tolerance is not None:
+        # Compression is tuned on training rows no candidate is fitted on; the
+        # test split only reports the compressed model
+        fit_rows, compress_rows = train_test_split(
+            np.arange(len(y_train)), test_size=COMPRESSION_VALIDATION_SIZE, stratify=y_train, random_state=42
+        )
+        X_compress, y_compress = X_train.iloc[compress_rows], y_train[compress_rows]
+        Xt_fit = Xt_train.iloc[fit_rows] if hasattr(Xt_train, "iloc") else Xt_train[fit_rows]
+        y_fit = y_train[fit_rows]
+        fit_key = hashlib.sha256(cache_key.encode("utf-8") + np.sort(fit_rows).tobytes()).hexdigest()
+        logger.info(f"Holding out {len(y_compress)} training rows to tune model compression")
+    if ensemble_weights == "learned" and not cv_folds:
+        # Base models do not see the rows the ensemble weights are learned on
+        Xt_fit, Xt_val, y_fit, y_val = train_test_split(
+            Xt_fit, y_fit, test_size=ENSEMBLE_VALIDATION_SIZE, stratify=y_fit, random_state=42
+        )
+        logger.info(f"Holding out {len(y_val)} training rows to learn the ensemble weights")
+    models = _build_models(categorical_encoding)
+
+    if search_budget:
+        logger.info("=" * 80)
+        logger.info(f"HYPERPARAMETER SEARCH ({search_budget:.0f} s budget)")
+        logger.info("=" * 80)
+        Xs_train, Xs_val, ys_train, ys_val = train_test_split(
+            Xt_fit, y_fit, test_size=SEARCH_VALIDATION_SIZE, stratify=y_fit, random_state=42
+        )
+        search_start = time.time()
+        search = search_hyperparameters(
+            models, Xs_train, ys_train, Xs_val, ys_val, time_budget_s=search_budget,
+            n_threads=cpus or os.cpu_count(), logger=logger,
+        )
+        for name, best in search.items():
+            if best["n_estimators"] is not None:
+                models[name].set_params(**best["params"], n_estimators=best["n_estimators"])
+                logger.info(f"{name}: n_estimators={best['n_estimators']} {best['params']} "
+                            f"(validation F1-macro {best['val_f1_macro']:.4f}, {best['trials']} trials)")
+        results["hyperparameter_search"] = {
+            "budget_seconds": float(search_budget),
+            "wall_seconds": float(time.time() - search_start),
+            "validation_size": SEARCH_VALIDATION_SIZE,
+            "models": search,
+        }
     
     # Log model configurations
     for name, estimator in models.items():
@@ -342,198 +627,241 @@ def main():
         results["model_configurations"][name] = model_config
         logger.info(f"{name} configuration: {model_config['type']} with {len(model_config['parameters'])} parameters")
 
-    best_name = None
-    best_score = -1.0
-    best_metrics = {}
-    best_model = None
+    cv = None
+    if cv_folds:
+        # Out-of-fold probabilities on the training split: model selection and
+        # ensemble weights use them instead of the single test split
+        logger.info("=" * 80)
+        logger.info(f"{cv_folds}-FOLD CROSS-VALIDATION")
+        logger.info("=" * 80)
+        cv = cross_val_oof(models, Xt_fit, y_fit, fit_key, CACHE_DIR,
+                           n_splits=cv_folds, random_state=42, total_cpus=cpus, logger=logger)
+        results["cross_validation"] = {"n_splits": cv_folds, "models": {}}
+        for name, oof in cv.items():
+            report = oof_report(y_fit, oof["proba"], oof["folds"])
+            results["cross_validation"]["models"][name] = {
+                **report, "cached": oof["cached"], "fit_seconds": oof["fit_seconds"],
+            }
+            logger.info(f"{name}: CV F1-macro {report['cv_f1_macro_mean']:.4f} "
+                        f"+/- {report['cv_f1_macro_std']:.4f}, OOF log loss {report['oof_log_loss']:.4f}, "
+                        f"ECE {report['oof_expected_calibration_error']:.4f}")
+
     all_model_results = {}
+    # Candidates for the final selection: serving pipeline and selection score
+    pipelines = {}
+    selection_scores = {}
 
     # Train individual models
     logger.info("=" * 80)
     logger.info("TRAINING INDIVIDUAL MODELS")
     logger.info("=" * 80)
     
+    budgets = cpu_budgets(models, cpus, parallel_models)
+    logger.info("CPU budgets (threads): " + ", ".join(f"{name}={n}" for name, n in budgets.items()))
+
+    # Candidates fitted before on the same data, setup, configuration and library
+    # versions are loaded from the model cache instead of being refitted
+    training_setup = {
+        "preprocess_key": cache_key,
+        "ensemble_holdout": ENSEMBLE_VALIDATION_SIZE if ensemble_weights == "learned" and not cv_folds else None,
+    }
+    if compress_tolerance is not None:
+        training_setup["compression_holdout"] = COMPRESSION_VALIDATION_SIZE
+    model_keys = {
+        name: model_cache_key(dataset_sha256, FEATURE_NUMERIC, CATEGORICAL, estimator, training_setup)
+        for name, estimator in models.items()
+    }
+    cached = {}
+    if model_cache:
+        for name, key in model_keys.items():
+            entry = load_model(CACHE_DIR, key)
+            if entry is not None:
+                cached[name] = entry
+                logger.info(f"{name}: model cache hit ({key[:16]}), reusing fitted estimator and test predictions")
+    to_fit = {name: estimator for name, estimator in models.items() if name not in cached}
+
+    sweep_start = time.time()
+    fits = train_candidates(to_fit, Xt_fit, y_fit, total_cpus=cpus, parallel=parallel_models) if to_fit else {}
+    sweep_time = time.time() - sweep_start
+    for name, entry in cached.items():
+        fit = entry["fit"]
+        fits[name] = FitResult(entry["estimator"], fit["threads"], fit["wall_seconds"], fit["cpu_seconds"])
+    fits = {name: fits[name] for name in models}
+    models = {name: fit.estimator for name, fit in fits.items()}
+    logger.info(f"Trained {len(to_fit)} candidates in {sweep_time:.2f} seconds wall time, "
+                f"{len(cached)} loaded from the model cache")
+
     for name, estimator in models.items():
-        logger.info(f"\n--- Training {name} ---")
-        clf = Pipeline(steps=[("preprocess", preprocessor), ("model", estimator)])
-        
-        train_start = time.time()
-        clf.fit(X_train, y_train)
-        train_time = time.time() - train_start
-        logger.info(f"Training completed in {train_time:.2f} seconds")
+        logger.info(f"\n--- Evaluating {name} ---")
+        fit = fits[name]
+        train_time = fit.wall_seconds
+        cache_hit = name in cached
+        logger.info(f"Training took {fit.wall_seconds:.2f} s wall / {fit.cpu_seconds:.2f} s CPU "
+                    f"on {fit.threads} threads" + (" (cached fit)" if cache_hit else ""))
         
-        y_pred = clf.predict(X_test)
-        pred_time = time.time() - train_start - train_time
+        if cache_hit:
+            y_pred = cached[name]["y_pred"]
+            pred_time = cached[name]["fit"]["prediction_seconds"]
+        else:
+            pred_start = time.time()
+            y_pred = estimator.predict(Xt_test)
+            pred_time = time.time() - pred_start
+            if model_cache:
+                entry_path = store_model(CACHE_DIR, model_keys[name], estimator, {
+                    "threads": fit.threads,
+                    "wall_seconds": fit.wall_seconds,
+                    "cpu_seconds": fit.cpu_seconds,
+                    "prediction_seconds": pred_time,
+                }, y_pred)
+                logger.info(f"Stored fitted model in the model cache ({entry_path})")
         
-        # Compute metrics
-        acc = accuracy_score(y_test, y_pred)
-        prec_macro = precision_score(y_test, y_pred, average="macro", zero_division=0)
-        rec_macro = recall_score(y_test, y_pred, average="macro", zero_division=0)
-        f1_macro = f1_score(y_test, y_pred, average="macro", zero_division=0)
-        prec_weighted = precision_score(y_test, y_pred, average="weighted", zero_division=0)
-        rec_weighted = recall_score(y_test, y_pred, average="weighted", zero_division=0)
-        f1_weighted = f1_score(y_test, y_pred, average="weighted", zero_division=0)
-        cm = confusion_matrix(y_test, y_pred)
-
+        metrics = evaluation_metrics(y_test, y_pred, le.classes_)
         cm_path = RESULTS_DIR / f"confusion_matrix_{name.replace(' ', '_')}.png"
         save_cm_heatmap(
-            cm,
+            np.asarray(metrics["confusion_matrix"]),
             labels=le.classes_,
             title=f"Confusion Matrix - {name}",
             out_path=cm_path,
         )
         logger.info(f"Saved confusion matrix heatmap to {cm_path}")
+        log_evaluation(metrics, logger)
 
-        
-        # Per-class metrics
-        prec_per_class = precision_score(y_test, y_pred, average=None, zero_division=0)
-        rec_per_class = recall_score(y_test, y_pred, average=None, zero_division=0)
-        f1_per_class = f1_score(y_test, y_pred, average=None, zero_division=0)
-        
-        # Classification report
-        class_report = classification_report(y_test, y_pred, target_names=le.classes_, output_dict=True, zero_division=0)
-        
-        logger.info(f"Accuracy: {acc:.4f}")
-        logger.info(f"Precision (macro): {prec_macro:.4f}")
-        logger.info(f"Recall (macro): {rec_macro:.4f}")
-        logger.info(f"F1-score (macro): {f1_macro:.4f}")
-        logger.info(f"Precision (weighted): {prec_weighted:.4f}")
-        logger.info(f"Recall (weighted): {rec_weighted:.4f}")
-        logger.info(f"F1-score (weighted): {f1_weighted:.4f}")
-        logger.info(f"Confusion Matrix:\n{cm}")
-        
-        # Log per-class metrics
-        logger.info("Per-class metrics:")
-        for idx, class_name in enumerate(le.classes_):
-            logger.info(f"  {class_name}: Precision={prec_per_class[idx]:.4f}, "
-                       f"Recall={rec_per_class[idx]:.4f}, F1={f1_per_class[idx]:.4f}")
-        
         model_result = {
-            "accuracy": float(acc),
-            "precision_macro": float(prec_macro),
-            "recall_macro": float(rec_macro),
-            "f1_macro": float(f1_macro),
-            "precision_weighted": float(prec_weighted),
-            "recall_weighted": float(rec_weighted),
-            "f1_weighted": float(f1_weighted),
-            "confusion_matrix": cm.tolist(),
-            "per_class_metrics": {
-                str(le.classes_[idx]): {
-                    "precision": float(prec_per_class[idx]),
-                    "recall": float(rec_per_class[idx]),
-                    "f1_score": float(f1_per_class[idx]),
-                }
-                for idx in range(len(le.classes_))
-            },
-            "classification_report": class_report,
+            **metrics,
             "training_time_seconds": float(train_time),
+            "training_cpu_seconds": float(fit.cpu_seconds),
+            "training_threads": int(fit.threads),
             "prediction_time_seconds": float(pred_time),
+            "model_cache_hit": cache_hit,
         }
         
+        selection = metrics["f1_macro"]
+        if cv is not None:
+            model_result["cross_validation"] = results["cross_validation"]["models"][name]
+            selection = model_result["cross_validation"]["cv_f1_macro_mean"]
         all_model_results[name] = model_result
-        
-        if f1_macro > best_score:
-            best_score = f1_macro
-            best_name = name
-            best_model = clf
-            best_metrics = model_result.copy()
-            logger.info(f"*** New best model: {name} (F1-macro: {f1_macro:.4f}) ***")
-
-    # Ensemble voting using the same base estimators
+        # Serving pipeline from the already fitted parts (same inference path as before)
+        pipelines[name] = Pipeline(steps=[("preprocess", preprocessor), ("model", estimator)])
+        selection_scores[name] = selection
+
+    # Ensemble voting over the base models fitted above (no retraining)
     logger.info("\n" + "=" * 80)
-    logger.info("TRAINING ENSEMBLE MODEL")
+    logger.info("BUILDING ENSEMBLE MODEL")
     logger.info("=" * 80)
     
-    estimators = [(name, est) for name, est in models.items()]
-    ensemble = Pipeline(
-        steps=[
-            ("preprocess", preprocessor),
-            ("voting", VotingClassifier(estimators=estimators, voting="soft", n_jobs=-1)),
-        ]
-    )
-    
     train_start = time.time()
-    ensemble.fit(X_train, y_train)
+    weights = None
+    if ensemble_weights == "learned" and cv is not None:
+        weights = learn_ensemble_weights([cv[name]["proba"] for name in models], y_fit)
+    elif ensemble_weights == "learned":
+        weights = learn_ensemble_weights([est.predict_proba(Xt_val) for est in models.values()], y_val)
+    if weights is not None:
+        logger.info("Learned ensemble weights: " + ", ".join(
+            f"{name}={w:.3f}" for name, w in zip(models, weights)))
+    voting = build_prefit_voting(models, y_fit, weights=weights)
     train_time = time.time() - train_start
-    logger.info(f"Ensemble training completed in {train_time:.2f} seconds")
+    logger.info(f"Ensemble assembled from fitted base models in {train_time:.2f} seconds")
+    ensemble = Pipeline(steps=[("preprocess", preprocessor), ("voting", voting)])
     
-    y_pred = ensemble.predict(X_test)
+    y_pred = voting.predict(Xt_test)
     pred_time = time.time() - train_start - train_time
     
-    ensemble_acc = accuracy_score(y_test, y_pred)
-    ensemble_prec_macro = precision_score(y_test, y_pred, average="macro", zero_division=0)
-    ensemble_rec_macro = recall_score(y_test, y_pred, average="macro", zero_division=0)
-    ensemble_f1_macro = f1_score(y_test, y_pred, average="macro", zero_division=0)
-    ensemble_prec_weighted = precision_score(y_test, y_pred, average="weighted", zero_division=0)
-    ensemble_rec_weighted = recall_score(y_test, y_pred, average="weighted", zero_division=0)
-    ensemble_f1_weighted = f1_score(y_test, y_pred, average="weighted", zero_division=0)
-    ensemble_cm = confusion_matrix(y_test, y_pred)
-
+    ensemble_metrics = evaluation_metrics(y_test, y_pred, le.classes_)
     cm_path = RESULTS_DIR / "confusion_matrix_Ensemble.png"
     save_cm_heatmap(
-        ensemble_cm,
+        np.asarray(ensemble_metrics["confusion_matrix"]),
         labels=le.classes_,
         title="Confusion Matrix - Ensemble",
         out_path=cm_path,
     )
     logger.info(f"Saved confusion matrix heatmap to {cm_path}")
+    log_evaluation(ensemble_metrics, logger, prefix="Ensemble ")
 
-        
-    # Per-class metrics for ensemble
-    ensemble_prec_per_class = precision_score(y_test, y_pred, average=None, zero_division=0)
-    ensemble_rec_per_class = recall_score(y_test, y_pred, average=None, zero_division=0)
-    ensemble_f1_per_class = f1_score(y_test, y_pred, average=None, zero_division=0)
-    ensemble_class_report = classification_report(y_test, y_pred, target_names=le.classes_, output_dict=True, zero_division=0)
-    
-    logger.info(f"Ensemble Accuracy: {ensemble_acc:.4f}")
-    logger.info(f"Ensemble Precision (macro): {ensemble_prec_macro:.4f}")
-    logger.info(f"Ensemble Recall (macro): {ensemble_rec_macro:.4f}")
-    logger.info(f"Ensemble F1-score (macro): {ensemble_f1_macro:.4f}")
-    logger.info(f"Ensemble Precision (weighted): {ensemble_prec_weighted:.4f}")
-    logger.info(f"Ensemble Recall (weighted): {ensemble_rec_weighted:.4f}")
-    logger.info(f"Ensemble F1-score (weighted): {ensemble_f1_weighted:.4f}")
-    logger.info(f"Ensemble Confusion Matrix:\n{ensemble_cm}")
-    
-    logger.info("Ensemble per-class metrics:")
-    for idx, class_name in enumerate(le.classes_):
-        logger.info(f"  {class_name}: Precision={ensemble_prec_per_class[idx]:.4f}, "
-                   f"Recall={ensemble_rec_per_class[idx]:.4f}, F1={ensemble_f1_per_class[idx]:.4f}")
-    
     ensemble_result = {
-        "accuracy": float(ensemble_acc),
-        "precision_macro": float(ensemble_prec_macro),
-        "recall_macro": float(ensemble_rec_macro),
-        "f1_macro": float(ensemble_f1_macro),
-        "precision_weighted": float(ensemble_prec_weighted),
-        "recall_weighted": float(ensemble_rec_weighted),
-        "f1_weighted": float(ensemble_f1_weighted),
-        "confusion_matrix": ensemble_cm.tolist(),
-        "per_class_metrics": {
-            str(le.classes_[idx]): {
-                "precision": float(ensemble_prec_per_class[idx]),
-                "recall": float(ensemble_rec_per_class[idx]),
-                "f1_score": float(ensemble_f1_per_class[idx]),
-            }
-            for idx in range(len(le.classes_))
-        },
-        "classification_report": ensemble_class_report,
+        **ensemble_metrics,
         "training_time_seconds": float(train_time),
         "prediction_time_seconds": float(pred_time),
+        "weights": dict(zip(models, map(float, weights))) if weights is not None else None,
     }
     
+    ensemble_selection = ensemble_metrics["f1_macro"]
+    if cv is not None:
+        w = weights if weights is not None else np.full(len(models), 1.0 / len(models))
+        oof_proba = np.tensordot(w, np.asarray([cv[name]["proba"] for name in models]), axes=1)
+        ensemble_result["cross_validation"] = oof_report(y_fit, oof_proba, next(iter(cv.values()))["folds"])
+        results["cross_validation"]["models"]["Ensemble"] = ensemble_result["cross_validation"]
+        ensemble_selection = ensemble_result["cross_validation"]["cv_f1_macro_mean"]
+        logger.info(f"Ensemble: CV F1-macro {ensemble_selection:.4f} "
+                    f"+/- {ensemble_result['cross_validation']['cv_f1_macro_std']:.4f}")
     all_model_results["Ensemble"] = ensemble_result
-    
-    if ensemble_f1_macro > best_score:
-        best_score = ensemble_f1_macro
-        best_name = "Ensemble"
-        best_model = ensemble
-        best_metrics = ensemble_result.copy()
-        logger.info(f"*** New best model: Ensemble (F1-macro: {ensemble_f1_macro:.4f}) ***")
+    pipelines["Ensemble"] = ensemble
+    selection_scores["Ensemble"] = ensemble_selection
+
+    # Serving cost of every candidate; selection takes the best score within the SLOs
+    logger.info("\n" + "=" * 80)
+    logger.info("SERVING BENCHMARK")
+    logger.info("=" * 80)
+    slo = slo or {}
+    benchmarks = {}
+    for name, pipeline in pipelines.items():
+        bench = benchmark_candidate(pipeline, X_test)
+        bench["slo_violations"] = slo_violations(bench, slo)
+        benchmarks[name] = bench
+        all_model_results[name]["serving_benchmark"] = bench
+        rss = f"{bench['loaded_rss_mb']:.0f} MB" if bench["loaded_rss_mb"] is not None else "n/a"
+        logger.info(f"{name}: p50 {bench['single_row_p50_ms']:.2f} ms, p99 {bench['single_row_p99_ms']:.2f} ms, "
+                    f"{bench['batch_rows_per_second']:.0f} rows/s, {bench['serialized_mb']:.1f} MB on disk, "
+                    f"{rss} RSS loaded" + (f" - violates {sorted(bench['slo_violations'])}"
+                                           if bench["slo_violations"] else ""))
+
+    best_name, slo_met = select_within_slo(selection_scores, benchmarks, slo)
+    if not slo_met:
+        logger.warning("No candidate meets the SLOs; keeping the best model overall")
+    best_model = pipelines[best_name]
+    best_metrics = all_model_results[best_name].copy()
+    best_score = best_metrics["f1_macro"]
+    best_selection = selection_scores[best_name]
+    results["serving_benchmark"] = {
+        "slo": slo,
+        "selected": best_name,
+        "slo_met": slo_met,
+        "models": benchmarks,
+    }
 
     logger.info("\n" + "=" * 80)
     logger.info(f"SELECTED BEST MODEL: {best_name} (F1-macro: {best_score:.4f})")
     logger.info("=" * 80)
 
+    best_benchmark = benchmarks[best_name]
+    if compress_tolerance is not None:
+        # Smallest / fastest variant of the selected model within the F1 tolerance
+        logger.info("\n" + "=" * 80)
+        logger.info(f"MODEL COMPRESSION (F1-macro tolerance {compress_tolerance})")
+        logger.info("=" * 80)
+        test_f1_before = best_score
+        best_model, steps = compress_pipeline(best_model, X_compress, y_compress, compress_tolerance, logger)
+        selected = next(step for step in steps if step.get("selected"))
+        # Every test-split metric of the saved report describes the compressed model
+        pred_start = time.time()
+        y_pred = best_model.predict(X_test)
+        best_metrics.update(evaluation_metrics(y_test, y_pred, le.classes_),
+                            prediction_time_seconds=float(time.time() - pred_start))
+        best_score = best_metrics["f1_macro"]
+        logger.info(f"Compressed model on the test split: F1-macro {test_f1_before:.4f} -> {best_score:.4f}")
+        log_evaluation(best_metrics, logger, prefix="Compressed ")
+        # Benchmarked on the compression rows; the latency / size numbers do not depend on them
+        best_benchmark = {k: v for k, v in selected.items()
+                          if k not in ("step", "changes", "selected", "f1_macro", "accuracy")}
+        best_metrics["serving_benchmark"] = best_benchmark
+        results["compression"] = {
+            "tolerance": float(compress_tolerance),
+            "validation_rows": int(len(y_compress)),
+            # Per-step F1 / accuracy are on the compression validation rows
+            "steps": steps,
+            "test_f1_macro_before": float(test_f1_before),
+            "test_f1_macro_after": float(best_score),
+        }
+
     # Save feature importance plot for best model
         # Feature importance (thesis Figure 4.5)
     fi_path = RESULTS_DIR / f"feature_importance_{best_name.replace(' ', '_')}.png"
@@ -549,6 +877,10 @@ def main():
     results["best_model"] = {
         "name": best_name,
         "f1_macro": float(best_score),
+        "selection_metric": "cv_f1_macro_mean" if cv is not None else "test_f1_macro",
+        "selection_score": float(best_selection),
+        "slo_met": slo_met,
+        "compressed": compress_tolerance is not None,
         "metrics": best_metrics,
     }
     
@@ -557,6 +889,9 @@ def main():
         "total_training_time_seconds": float(total_time),
         "total_training_time_minutes": float(total_time / 60),
         "models_trained": len(all_model_results),
+        "candidate_sweep_wall_seconds": float(sweep_time),
+        "model_cache_hits": sorted(cached),
+        "cpu_budgets": budgets,
         "best_model_name": best_name,
         "best_f1_macro": float(best_score),
     }
@@ -586,10 +921,32 @@ def main():
             },
             "classes": le.classes_.tolist(),
             "label_mapping": label_mapping,
+            "dataset_sha256": dataset_sha256,
+            "categorical_encoding": categorical_encoding,
+            "serving_benchmark": best_benchmark,
+            "slo": slo,
+            **({"compression": results["compression"]} if "compression" in results else {}),
+            # Options of this run; incremental_training.py repeats them for a full retrain
+            "training_options": {
+                "ensemble_weights": ensemble_weights,
+                "cpus": cpus,
+                "parallel_models": parallel_models,
+                "search_budget": search_budget,
+                "cv_folds": cv_folds,
+                "slo": slo,
+                "categorical_encoding": categorical_encoding,
+                "model_cache": model_cache,
+                "compress_tolerance": compress_tolerance,
+            },
         },
         meta_path,
     )
     logger.info(f"Saved metadata to {meta_path}")
+    np.savez(
+        MODEL_DIR / ROWS_FILE,
+        train=hashes.loc[X_train.index].to_numpy(),
+        holdout=hashes.loc[X_test.index].to_numpy(),
+    )
     
     # Save detailed results to JSON
     with open(results_path, 'w', encoding='utf-8') as f:
@@ -605,5 +962,51 @@ def main():
     logger.info(f"Metadata file: {meta_path}")
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Train the shaft-hub connection classifier.")
+    parser.add_argument("--dataset", type=Path, default=DATASET_PATH,
+                        help="CSV file, compact .parquet file or Parquet part directory")
+    parser.add_argument("--ensemble-weights", choices=["equal", "learned"], default="equal",
+                        help=f"learned: fit soft-voting weights on {ENSEMBLE_VALIDATION_SIZE:.0%} "
+                             "of the training split held out from the base models")
+    parser.add_argument("--cpus", type=int, default=None,
+                        help="total CPU budget for candidate training (default: all cores)")
+    parser.add_argument("--parallel-models", type=int, default=None,
+                        help="candidates trained at the same time (default: as many as CPUs allow)")
+    parser.add_argument("--categorical-encoding", choices=["onehot", "native"], default="onehot",
+                        help="native: integer category codes for the libraries' own categorical splits "
+                             "instead of dense one-hot columns")
+    parser.add_argument("--cv-folds", type=int, default=None, metavar="K",
+                        help="select the best model by stratified K-fold CV on the training split "
+                             "(out-of-fold predictions are cached and reused for ensemble weights)")
+    parser.add_argument("--slo-p99-ms", type=float, default=None,
+                        help="maximum single-row p99 latency of the selected model")
+    parser.add_argument("--slo-rss-mb", type=float, default=None,
+                        help="maximum RSS of a serving process after loading the selected model")
+    parser.add_argument("--slo-size-mb", type=float, default=None,
+                        help="maximum serialized size of the selected model")
+    parser.add_argument("--no-model-cache", action="store_true",
+                        help="refit every candidate instead of reusing fitted models from the cache")
+    parser.add_argument("--compress-tolerance", type=float, default=None, metavar="F1",
+                        help="compress the selected model (fewer voters / trees, shallower forest, "
+                             f"float32 values) while macro F1 on {COMPRESSION_VALIDATION_SIZE:.0%} of the "
+                             "training split, held out from every candidate, drops by at most F1")
+    parser.add_argument("--search-budget", type=float, default=None, metavar="SECONDS",
+                        help="tune every model with successive halving within this wall-clock budget")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = _parse_args()
+    main(
+        dataset_path=args.dataset,
+        ensemble_weights=args.ensemble_weights,
+        cpus=args.cpus,
+        parallel_models=args.parallel_models,
+        search_budget=args.search_budget,
+        cv_folds=args.cv_folds,
+        categorical_encoding=args.categorical_encoding,
+        model_cache=not args.no_model_cache,
+        compress_tolerance=args.compress_tolerance,
+        slo={"p99_ms": args.slo_p99_ms, "rss_mb": args.slo_rss_mb, "size_mb": args.slo_size_mb},
+    )
\ No newline at end of file
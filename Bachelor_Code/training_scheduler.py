@@ -0,0 +1,112 @@
+# training_scheduler.py
+"""
+Parallel candidate-model training with per-model CPU budgets
+
+Left alone, the libraries either oversubscribe (Random Forest with n_jobs=-1
+next to three OpenMP pools) or leave cores idle (one model at a time). The
+scheduler runs up to `parallel` candidates at once in a process pool and gives
+each a thread budget (n_jobs / thread_count plus a threadpoolctl limit for
+BLAS/OpenMP), so the sum of the budgets matches the machine.
+
+Every fit reports its wall time and CPU time (all threads of the worker
+process); CPU / wall is the parallelism the model actually achieved.
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+@dataclass
+class FitResult:
+    estimator: Any
+    threads: int
+    wall_seconds: float
+    cpu_seconds: float
+
+
+def _parallelism(n_models: int, total_cpus: int, parallel: Optional[int]) -> int:
+    return max(1, min(parallel or n_models, n_models, total_cpus))
+
+
+def cpu_budgets(names, total_cpus: Optional[int] = None, parallel: Optional[int] = None) -> Dict[str, int]:
+    """
+    Threads per candidate so that concurrently running fits use total_cpus.
+
+    parallel defaults to min(#candidates, total_cpus); leftover cores go to the
+    candidates listed first.
+    """
+    names = list(names)
+    total_cpus = total_cpus or os.cpu_count() or 1
+    parallel = _parallelism(len(names), total_cpus, parallel)
+    base, extra = divmod(total_cpus, parallel)
+    return {name: base + (1 if i % parallel < extra else 0) for i, name in enumerate(names)}
+
+
+def set_thread_budget(estimator, n_threads: int) -> None:
+    """Set the library's own thread count (CatBoost thread_count, otherwise n_jobs)."""
+    # CatBoost's get_params() omits parameters that were never set, so detect it by type
+    if type(estimator).__module__.startswith("catboost"):
+        estimator.set_params(thread_count=n_threads)
+    elif "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=n_threads)
+
+
+def _fit_with_budget(estimator, X, y, n_threads: int, fit_params: Optional[Dict] = None) -> FitResult:
+    """Fit one estimator within its thread budget (runs in a worker process)."""
+    set_thread_budget(estimator, n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        threadpool_limits = None
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if threadpool_limits is not None:
+        with threadpool_limits(limits=n_threads):
+            estimator.fit(X, y, **(fit_params or {}))
+    else:
+        estimator.fit(X, y, **(fit_params or {}))
+    return FitResult(
+        estimator=estimator,
+        threads=n_threads,
+        wall_seconds=time.perf_counter() - wall_start,
+        cpu_seconds=time.process_time() - cpu_start,
+    )
+
+
+def train_candidates(
+    models: Dict[str, Any],
+    X: np.ndarray,
+    y: np.ndarray,
+    total_cpus: Optional[int] = None,
+    parallel: Optional[int] = None,
+    fit_params: Optional[Dict[str, Dict]] = None,
+) -> Dict[str, FitResult]:
+    """
+    Fit all candidates, up to `parallel` at a time, each within its CPU budget.
+
+    Runs in-process when only one candidate fits at a time. Otherwise uses a
+    loky process pool, which memory-maps large arrays instead of copying them
+    into every worker. Returns {name: FitResult} in the order of `models`.
+    """
+    total_cpus = total_cpus or os.cpu_count() or 1
+    budgets = cpu_budgets(models, total_cpus, parallel)
+    n_parallel = _parallelism(len(models), total_cpus, parallel)
+    fit_params = fit_params or {}
+
+    if n_parallel == 1:
+        return {
+            name: _fit_with_budget(est, X, y, budgets[name], fit_params.get(name))
+            for name, est in models.items()
+        }
+
+    from joblib import Parallel, delayed
+
+    results = Parallel(n_jobs=n_parallel, backend="loky")(
+        delayed(_fit_with_budget)(est, X, y, budgets[name], fit_params.get(name))
+        for name, est in models.items()
+    )
+    return dict(zip(models, results))